@@ -0,0 +1,172 @@
+# backend/admission.py
+"""
+Meeting-quota admission control.
+
+Each session may hold MEETING_LIMIT meetings, counted in user_sessions.meeting_count. The UI asks
+before any model call is made:
+  * check() answers on every interaction from an in-memory cache of session counts, so a known
+    session costs no database round trip. Entries older than ADMISSION_CACHE_TTL seconds are read
+    again, which picks up meetings taken by other app processes.
+  * admit() takes a meeting with one atomic upsert that only increments while the count is under
+    the limit (database.ADMIT_MEETING, "... RETURNING meeting_count"). Concurrent requests, in this
+    or any other process, cannot both take the last meeting. A session found at its limit is
+    cached, so repeated attempts are rejected from memory.
+  * refund() gives back a meeting that failed before producing anything. The cache is updated at
+    once. The decrement is written with the next batch of the write-behind queue
+    (backend/write_queue.py).
+A limit of 0 admits everything but still counts the meetings.
+
+Known limitation: there are no accounts, so by default the quota is counted per session ID, which
+lives in the page URL (?session=...). A user who drops or changes it starts a fresh quota.
+MEETING_QUOTA_KEY=client counts meetings per client address instead (quota_key()), which the user
+cannot reset, but which everyone behind the same proxy or NAT shares.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from backend import database
+from config import settings
+
+MEETING_LIMIT = settings.MEETING_LIMIT
+QUOTA_KEY = settings.MEETING_QUOTA_KEY
+CACHE_TTL = settings.ADMISSION_CACHE_TTL
+CACHE_MAX_ENTRIES = settings.ADMISSION_CACHE_MAX_ENTRIES
+# Stands in for "no limit" in the upsert's WHERE clause
+_UNLIMITED = 2 ** 62
+
+
+class QuotaExceeded(Exception):
+    """The session has used all its meetings; the message is fit to show a user."""
+
+
+class AdmissionControl:
+    """Per-session meeting counts, cached in memory in front of user_sessions."""
+
+    def __init__(self, limit=MEETING_LIMIT, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.limit = limit
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # session_id -> (meeting count, time.monotonic() when it was read)
+        self._counts = OrderedDict()
+        # Sessions with a refund still waiting in the write-behind queue
+        self._refunding = set()
+        self._stats = {"admitted": 0, "rejected": 0, "refunded": 0, "cache_hits": 0, "db_reads": 0}
+
+    def _cached(self, session_id):
+        with self._lock:
+            entry = self._counts.get(session_id)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                return None
+            self._counts.move_to_end(session_id)
+            self._stats["cache_hits"] += 1
+            return entry[0]
+
+    def _remember(self, session_id, count):
+        with self._lock:
+            self._counts[session_id] = (count, time.monotonic())
+            self._counts.move_to_end(session_id)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def meeting_count(self, session_id):
+        """The session's meeting count, from the cache when it is fresh."""
+        count = self._cached(session_id)
+        if count is None:
+            self._count("db_reads")
+            count = database.get_meeting_count(session_id)
+            self._remember(session_id, count)
+        return count
+
+    def remaining(self, session_id):
+        """Meetings the session may still hold; None when there is no limit."""
+        if not self.limit:
+            return None
+        return max(self.limit - self.meeting_count(session_id), 0)
+
+    def check(self, session_id):
+        """Whether the session may start another meeting. Cheap enough to call on every interaction."""
+        return not self.limit or self.meeting_count(session_id) < self.limit
+
+    def admit(self, session_id):
+        """Takes one meeting of the session's quota and returns its new count; raises QuotaExceeded."""
+        if self.limit:
+            cached = self._cached(session_id)
+            if cached is not None and cached >= self.limit:
+                self._reject()
+        if session_id in self._refunding:
+            # The database must see the refund before it judges this meeting
+            from backend.write_queue import get_write_queue
+
+            get_write_queue().flush()
+            with self._lock:
+                self._refunding.discard(session_id)
+        count = database.admit_meeting(session_id, self.limit or _UNLIMITED)
+        if count is None:
+            self._remember(session_id, self.limit)
+            self._reject()
+        self._remember(session_id, count)
+        self._count("admitted")
+        return count
+
+    def quota_message(self):
+        return f"This session has used all {self.limit} of its meetings. Join the waitlist to get more."
+
+    def _reject(self):
+        self._count("rejected")
+        raise QuotaExceeded(self.quota_message())
+
+    def refund(self, session_id):
+        """Gives back one meeting, e.g. when the meeting failed before the user got anything."""
+        from backend.write_queue import enqueue
+
+        with self._lock:
+            entry = self._counts.get(session_id)
+            if entry is not None:
+                self._counts[session_id] = (max(entry[0] - 1, 0), entry[1])
+            self._stats["refunded"] += 1
+            self._refunding.add(session_id)
+        enqueue(database.REFUND_MEETING, (session_id,))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, cached_sessions=len(self._counts))
+
+
+gate = AdmissionControl()
+
+
+def quota_key(session_id, client_address=None):
+    """The key a session's meetings are counted under: its client address with MEETING_QUOTA_KEY=client."""
+    if QUOTA_KEY == "client" and client_address:
+        return f"client:{client_address}"
+    return session_id
+
+
+def check(session_id):
+    return gate.check(session_id)
+
+
+def admit(session_id):
+    return gate.admit(session_id)
+
+
+def refund(session_id):
+    gate.refund(session_id)
+
+
+def remaining(session_id):
+    return gate.remaining(session_id)
+
+
+def quota_message():
+    return gate.quota_message()
+
+
+def stats():
+    return gate.stats()
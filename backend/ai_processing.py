@@ -1,18 +1,27 @@
 # backend/ai_processing.py
-from openai import OpenAI
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
-client = OpenAI()
-import json
-import os
+from backend import llm_client, tracing
+from backend.meeting_report import (REPORT_FORMAT, RESOLUTION_FORMAT, ExpertTurn, MeetingReport,
+                                    ReportStreamParser)
+from backend.prompts import PromptTemplate
+from config import settings
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Meeting engines:
+#   "single"     - one large completion writes every expert's turn and the resolutions in sequence.
+#   "map_reduce" - one short completion per expert runs concurrently, then one synthesis call
+#                  writes the resolutions from those turns. Wall-clock time is bounded by the
+#                  slowest turn plus the synthesis instead of the whole transcript.
+MEETING_ENGINES = ("single", "map_reduce")
+DEFAULT_MEETING_ENGINE = settings.MEETING_ENGINE
+# Each expert's turn is kept short so the parallel fan-out stays fast
+EXPERT_TURN_MAX_TOKENS = 400
+# Starts the text (or a report's error) returned when a meeting could not be generated
+DISCUSSION_ERROR = "Error generating expert discussion"
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in the environment!")
 
-
-def generate_expert_discussion(context, experts):
+def generate_expert_discussion(context, experts, engine=None, structured=False):
     """
     Generates a simulated expert discussion and meeting conclusion based on the user's context.
     The output will include:
@@ -49,23 +58,177 @@ def generate_expert_discussion(context, experts):
     of each identified role.
 
     Tailor your final output based on the decision type (strategic vs. operational/tactical) inferred from the context.
+
+    `engine` selects how the meeting is generated (see MEETING_ENGINES); it defaults to
+    DEFAULT_MEETING_ENGINE.
+    With structured=True the model answers in JSON constrained by the report schema and a
+    MeetingReport is returned instead of text; on failure the report carries only `error`.
     """
-    prompt = f"""
-You are a panel of experts wearing multiple hats – including seasoned business consultants, technical experts, successful entrepreneurs (mentors), and specialized consultants – gathered in a meeting to help a small business owner or aspiring founder make a critical decision.
-The user's context is:
-{json.dumps(context, indent=2)}
+    engine = _resolve_engine(engine)
+    with tracing.span("discussion", engine=engine, structured=structured):
+        if structured:
+            return _generate_report(context, experts, engine)
+        try:
+            if engine == "map_reduce":
+                turns = _run_expert_turns(context, experts)
+                synthesis = llm_client.complete(_synthesis_messages(context, turns),
+                                                call_site="meeting_synthesis")
+                return _format_turns(turns) + synthesis
+            discussion = llm_client.complete(_discussion_messages(context, experts),
+                                             call_site="expert_discussion")
+            return discussion
+        except Exception as e:
+            return f"{DISCUSSION_ERROR}: {e}"
 
-The experts present are: {', '.join(experts)}.
 
-First, determine whether the decision is strategic (long-term, high impact) or operational/tactical (short-term, execution-focused), and then simulate a sequential discussion where each expert states their individual, specialized perspective on the problem. 
-The experts debate potential strategies, just as in a real brainstorming meeting.
-Use real-world analogies, neutral comparisons, and "what-if" forecasts to highlight both risks and opportunities.
-Incorporate geographic details from the context into your analysis so that regional nuances enhance your recommendations.
+async def generate_expert_discussion_async(context, experts, engine=None, structured=False):
+    """Async counterpart of generate_expert_discussion, built on the shared async client."""
+    import asyncio  # deferred: only the async path needs it
 
-After the discussion, produce a final meeting conclusion in the following format:
+    engine = _resolve_engine(engine)
+    with tracing.span("discussion", engine=engine, structured=structured):
+        try:
+            if engine == "map_reduce":
+                texts = await asyncio.gather(*(
+                    llm_client.acomplete(_expert_turn_messages(context, experts, expert),
+                                         call_site="expert_turn", max_tokens=EXPERT_TURN_MAX_TOKENS)
+                    for expert in experts
+                ))
+                turns = list(zip(experts, texts))
+                if structured:
+                    reply = await llm_client.acomplete(_synthesis_messages(context, turns, structured=True),
+                                                       call_site="meeting_synthesis",
+                                                       response_format=RESOLUTION_FORMAT)
+                    return MeetingReport.from_json(reply, turns=_report_turns(turns))
+                synthesis = await llm_client.acomplete(_synthesis_messages(context, turns),
+                                                       call_site="meeting_synthesis")
+                return _format_turns(turns) + synthesis
+            if structured:
+                reply = await llm_client.acomplete(_discussion_messages(context, experts, structured=True),
+                                                   call_site="expert_discussion", response_format=REPORT_FORMAT)
+                return MeetingReport.from_json(reply)
+            return await llm_client.acomplete(_discussion_messages(context, experts),
+                                              call_site="expert_discussion")
+        except Exception as e:
+            if structured:
+                return MeetingReport(error=f"{DISCUSSION_ERROR}: {e}")
+            return f"{DISCUSSION_ERROR}: {e}"
+
+
+def stream_expert_discussion(context, experts, engine=None):
+    """
+    Streaming variant of generate_expert_discussion.
+    Yields the discussion text chunk by chunk as the model produces it, so the UI can render
+    the meeting while it is still being generated. Concatenating every chunk gives the same
+    text that generate_expert_discussion would return.
+    With the map_reduce engine each expert's turn is yielded, in panel order, as soon as it
+    is ready, followed by the streamed synthesis.
+    """
+    engine = _resolve_engine(engine)
+    with tracing.span("discussion", engine=engine):
+        try:
+            if engine == "map_reduce":
+                turns = []
+                with ThreadPoolExecutor(max_workers=max(len(experts), 1)) as pool:
+                    futures = [pool.submit(contextvars.copy_context().run, _complete_expert_turn,
+                                           context, experts, expert)
+                               for expert in experts]
+                    for expert, future in zip(experts, futures):
+                        turn = (expert, future.result())
+                        turns.append(turn)
+                        yield _format_turns([turn])
+                yield from llm_client.stream(_synthesis_messages(context, turns),
+                                             call_site="meeting_synthesis")
+                return
+            yield from llm_client.stream(_discussion_messages(context, experts),
+                                         call_site="expert_discussion")
+        except Exception as e:
+            yield f"{DISCUSSION_ERROR}: {e}"
+
+
+def stream_meeting_report(context, experts, engine=None):
+    """
+    Structured counterpart of stream_expert_discussion.
+    Yields each ExpertTurn and StrategicOption as soon as its JSON object is complete, then the
+    finished MeetingReport as the last item. On failure the last item is a MeetingReport that
+    carries only `error`.
+    """
+    engine = _resolve_engine(engine)
+    with tracing.span("discussion", engine=engine, structured=True):
+        try:
+            parser = ReportStreamParser()
+            turns = None
+            if engine == "map_reduce":
+                turns = []
+                with ThreadPoolExecutor(max_workers=max(len(experts), 1)) as pool:
+                    futures = [pool.submit(contextvars.copy_context().run, _complete_expert_turn,
+                                           context, experts, expert)
+                               for expert in experts]
+                    for expert, future in zip(experts, futures):
+                        turn = ExpertTurn(expert, future.result().strip())
+                        turns.append(turn)
+                        yield turn
+                chunks = llm_client.stream(_synthesis_messages(context, [(t.expert, t.text) for t in turns],
+                                                               structured=True),
+                                           call_site="meeting_synthesis", response_format=RESOLUTION_FORMAT)
+            else:
+                chunks = llm_client.stream(_discussion_messages(context, experts, structured=True),
+                                           call_site="expert_discussion", response_format=REPORT_FORMAT)
+            for chunk in chunks:
+                yield from parser.feed(chunk)
+            yield parser.finish(turns=turns)
+        except Exception as e:
+            yield MeetingReport(error=f"{DISCUSSION_ERROR}: {e}")
+
+
+def _generate_report(context, experts, engine):
+    try:
+        if engine == "map_reduce":
+            turns = _run_expert_turns(context, experts)
+            reply = llm_client.complete(_synthesis_messages(context, turns, structured=True),
+                                        call_site="meeting_synthesis", response_format=RESOLUTION_FORMAT)
+            return MeetingReport.from_json(reply, turns=_report_turns(turns))
+        reply = llm_client.complete(_discussion_messages(context, experts, structured=True),
+                                    call_site="expert_discussion", response_format=REPORT_FORMAT)
+        return MeetingReport.from_json(reply)
+    except Exception as e:
+        return MeetingReport(error=f"{DISCUSSION_ERROR}: {e}")
+
+
+def _resolve_engine(engine):
+    engine = engine or DEFAULT_MEETING_ENGINE
+    if engine not in MEETING_ENGINES:
+        raise ValueError(f"Unknown meeting engine {engine!r}; expected one of {MEETING_ENGINES}")
+    return engine
+
+
+def _complete_expert_turn(context, experts, expert):
+    return llm_client.complete(_expert_turn_messages(context, experts, expert),
+                               call_site="expert_turn", max_tokens=EXPERT_TURN_MAX_TOKENS)
 
-Meeting Resolutions:
-"Here are our recommendations for approaches to help you achieve {context.get('objective', 'your goal')} (Present 2-3 clear, varied strategic options in bullet points below.):
+
+def _run_expert_turns(context, experts):
+    """Map step: generates every expert's turn concurrently and returns (expert, text) pairs in panel order."""
+    with ThreadPoolExecutor(max_workers=max(len(experts), 1)) as pool:
+        # Each turn runs in a copy of the caller's context so its trace span nests under the meeting
+        futures = [pool.submit(contextvars.copy_context().run, _complete_expert_turn, context, experts, expert)
+                   for expert in experts]
+        texts = [future.result() for future in futures]
+    return list(zip(experts, texts))
+
+
+def _format_turns(turns):
+    """Renders expert turns as "Role: text" paragraphs, the same shape the single engine produces."""
+    return "".join(f"{expert}: {text.strip()}\n\n" for expert, text in turns)
+
+
+def _report_turns(turns):
+    return [ExpertTurn(expert, text.strip()) for expert, text in turns]
+
+
+# The "Meeting Resolutions" format shared by the single-call prompt and the map-reduce synthesis
+_RESOLUTIONS_SPEC = """Meeting Resolutions:
+"Here are our recommendations for approaches to help you achieve [the user's objective] (Present 2-3 clear, varied strategic options in bullet points below.):
    1. [Strategic Choice 1]
    2. [Strategic Choice 2]
    3. [Strategic Choice 3]
@@ -80,22 +243,136 @@ with links at the bottom (do not make any of the data up). Also, mention what wo
 4. A description of the value system and personality traits of a person who would choose this option (for example, risk-taking, conservative, community-oriented, religious, etc.).
 5. Draw a 2v2 decision quadrant table of impact vs risk for all strategic options.
 6. Highlight the preferred option with a top-down explanation of its expected impact.
+"""
 
+# Precompiled prompts: the static instructions are the system message, identical on every call, and
+# the user message carries only the compact context and the per-call parts (see backend/prompts.py).
+DISCUSSION_PROMPT = PromptTemplate("expert_discussion", system=f"""
+You are a panel of experts wearing multiple hats – including seasoned business consultants, technical experts, successful entrepreneurs (mentors), and specialized consultants – gathered in a meeting to help a small business owner or aspiring founder make a critical decision.
+The user's context and the experts present are given in the next message.
 
+First, determine whether the decision is strategic (long-term, high impact) or operational/tactical (short-term, execution-focused), and then simulate a sequential discussion where each expert states their individual, specialized perspective on the problem. 
+The experts debate potential strategies, just as in a real brainstorming meeting.
+Use real-world analogies, neutral comparisons, and "what-if" forecasts to highlight both risks and opportunities.
+Incorporate geographic details from the context into your analysis so that regional nuances enhance your recommendations.
+
+After the discussion, produce a final meeting conclusion in the following format:
+
+{_RESOLUTIONS_SPEC}
 Output the final result as a clear, structured meeting conclusion with both the sequential discussion and the formatted recommendations section. 
 Ensure the output is concise (no more than one page) and structured to help the user quickly grasp the trade-offs and make an informed decision.
+""", user="""
+The user's context is:
+{context}
+
+The experts present are: {experts}.
+""")
+
+EXPERT_TURN_PROMPT = PromptTemplate("expert_turn", system="""
+You are one member of a panel of experts gathered in a meeting to help a small business owner or aspiring founder make a critical decision.
+The next message tells you which expert you are, who else is on the panel, and the user's context.
+
+Speaking only from your specialized perspective, state whether you see this decision as strategic (long-term, high impact) or operational/tactical (short-term, execution-focused), then give your view on the problem.
+Use real-world analogies, neutral comparisons, and "what-if" forecasts to highlight both risks and opportunities, and take the geographic details of the context into account.
+Do not speak for the other experts and do not write the final recommendations. Keep your turn under 200 words.
+""", user="""
+You are the {expert} on a panel of experts ({experts}).
+The user's context is:
+{context}
+""")
+
+SYNTHESIS_PROMPT = PromptTemplate("meeting_synthesis", system=f"""
+You are the chair of a panel of experts gathered in a meeting to help a small business owner or aspiring founder make a critical decision.
+Each expert has already given their perspective; the next message holds the user's context and those perspectives.
+
+Weigh these perspectives against each other and produce the final meeting conclusion in the following format:
+
+{_RESOLUTIONS_SPEC}
+Output only the formatted recommendations section, starting with "Meeting Resolutions:".
+Ensure the output is concise (no more than one page) and structured to help the user quickly grasp the trade-offs and make an informed decision.
+""", user="""
+The user's context is:
+{context}
+
+The experts' perspectives:
+{discussion}
+""")
+
+# The structured counterpart of _RESOLUTIONS_SPEC; the JSON schema itself is sent as the response format
+_REPORT_SPEC = """
+- "decision_type": "strategic" or "operational".
+- "options": 2-3 clear, varied strategic options to help the user achieve their objective. For each give a short "title", a "description", the "upside" and the "downside" with evidentiary data and facts (do not make any of the data up), what would need to happen for it to fail ("fails_if"), and its "impact" and "risk", each "high" or "low".
+- "preferred_option": the title of the preferred option.
+- "recommendation": a top-down explanation of the preferred option's expected impact and the leadership style required to execute it.
 """
-    try:
-        response = client.chat.completions.create(model="gpt-4",
-        messages=[{"role": "system", "content": prompt}])
-        discussion = response.choices[0].message.content
-        return discussion
-    except Exception as e:
-        return f"Error generating expert discussion: {e}"
+
+STRUCTURED_DISCUSSION_PROMPT = PromptTemplate("expert_discussion_report", system=f"""
+You are a panel of experts wearing multiple hats – including seasoned business consultants, technical experts, successful entrepreneurs (mentors), and specialized consultants – gathered in a meeting to help a small business owner or aspiring founder make a critical decision.
+The user's context and the experts present are given in the next message.
+
+First, determine whether the decision is strategic (long-term, high impact) or operational/tactical (short-term, execution-focused), and then simulate a sequential discussion where each expert states their individual, specialized perspective on the problem.
+The experts debate potential strategies, just as in a real brainstorming meeting.
+Use real-world analogies, neutral comparisons, and "what-if" forecasts to highlight both risks and opportunities.
+Incorporate geographic details from the context into your analysis so that regional nuances enhance your recommendations.
+
+Return the meeting as a JSON object with:
+- "turns": the discussion in speaking order, one {{"expert", "text"}} object per contribution.{_REPORT_SPEC}
+Ensure the whole meeting is concise (no more than one page) and helps the user quickly grasp the trade-offs and make an informed decision.
+""", user=DISCUSSION_PROMPT.user)
+
+STRUCTURED_SYNTHESIS_PROMPT = PromptTemplate("meeting_synthesis_report", system=f"""
+You are the chair of a panel of experts gathered in a meeting to help a small business owner or aspiring founder make a critical decision.
+Each expert has already given their perspective; the next message holds the user's context and those perspectives.
+
+Weigh these perspectives against each other and return the final meeting conclusion as a JSON object with:{_REPORT_SPEC}
+Ensure the conclusion is concise (no more than one page) and helps the user quickly grasp the trade-offs and make an informed decision.
+""", user=SYNTHESIS_PROMPT.user)
+
+FOLLOWUP_PROMPT = PromptTemplate("followup", system="""
+You are a panel of experts wearing multiple hats – including seasoned business consultants, technical experts, successful entrepreneurs (mentors), and specialized consultants – gathered in a meeting to help a small business owner or aspiring founder make critical decisions.
+An expert meeting has already taken place and recommendations have been provided. The next message holds the user's context, the experts present, a summary of the meeting's conclusions, and an additional follow-up question from the user.
+
+Based on the previous discussion and this extra follow-up question, determine which expert's perspective is most relevant.
+Respond directly in that expert's voice with a concise answer addressing the follow-up question, including any pertinent risk-reward considerations, scenario analyses, and real-world analogies.
+Use second-person language where appropriate and keep your response brief and actionable.
+**Return your answer in the following format: "ExpertRole: Your answer here."**
+""", user="""
+The user's context is:
+{context}
+
+The experts present are: {experts}.
+
+Meeting summary:
+{summary}
+
+Follow-up question:
+"{question}"
+""")
+
+# Stands in for the meeting summary when a follow-up is asked without a MeetingMemory
+_NO_SUMMARY = "Not available; answer from the context alone."
+
+
+def _discussion_messages(context, experts, structured=False):
+    """Builds the single-call meeting prompt shared by the blocking and streaming discussion calls."""
+    template = STRUCTURED_DISCUSSION_PROMPT if structured else DISCUSSION_PROMPT
+    return template.render(context, experts=", ".join(experts))
+
+
+def _expert_turn_messages(context, experts, expert):
+    """Builds the map-step prompt asking one panel member for their individual perspective."""
+    return EXPERT_TURN_PROMPT.render(context, expert=expert, experts=", ".join(experts))
+
+
+def _synthesis_messages(context, turns, structured=False):
+    """Builds the reduce-step prompt that turns the experts' individual views into the meeting resolutions."""
+    discussion = "\n\n".join(f"{expert}: {text.strip()}" for expert, text in turns)
+    template = STRUCTURED_SYNTHESIS_PROMPT if structured else SYNTHESIS_PROMPT
+    return template.render(context, discussion=discussion)
 
 
 # NEW: Function to generate an extra follow-up response based on the user's additional question.
-def generate_extra_followup_response(extra_question, context, experts):
+def generate_extra_followup_response(extra_question, context, experts, memory=None):
     """
     Generates a targeted response to an extra follow-up question by identifying the most relevant expert perspective
     from the previous discussion and responding directly in that expert's voice.
@@ -106,29 +383,50 @@ def generate_extra_followup_response(extra_question, context, experts):
 
     The answer should be formatted as:
         "<Expert Role>: <Answer>"
+
+    `memory` is the MeetingMemory of the meeting being followed up (backend/meeting_memory.py). It
+    supplies the panel and a compact digest of the discussion, so the answer is grounded in what the
+    meeting concluded without resending the transcript.
     """
-    prompt = f"""
-You are a panel of experts wearing multiple hats – including seasoned business consultants, technical experts, successful entrepreneurs (mentors), and specialized consultants – gathered in a meeting to help a small business owner or aspiring founder make critical decisions.
-The user's context is:
-{json.dumps(context, indent=2)}
+    messages = _followup_messages(extra_question, context, experts, memory)
+    with tracing.span("followup"):
+        try:
+            extra_response = llm_client.complete(messages, call_site="followup")
+            return extra_response
+        except Exception as e:
+            return f"Error generating extra follow-up response: {e}"
 
-The experts present are: {', '.join(experts)}.
 
-An expert meeting has already taken place and recommendations have been provided.
-Now, the user has asked an additional follow-up question:
-"{extra_question}"
+async def generate_extra_followup_response_async(extra_question, context, experts, memory=None):
+    """Async counterpart of generate_extra_followup_response, built on the shared async client."""
+    messages = _followup_messages(extra_question, context, experts, memory)
+    with tracing.span("followup"):
+        try:
+            return await llm_client.acomplete(messages, call_site="followup")
+        except Exception as e:
+            return f"Error generating extra follow-up response: {e}"
 
-Based on the previous discussion and this extra follow-up question, determine which expert's perspective is most relevant.
-Respond directly in that expert's voice with a concise answer addressing the follow-up question, including any pertinent risk-reward considerations, scenario analyses, and real-world analogies.
-Use second-person language where appropriate and keep your response brief and actionable.
-**Return your answer in the following format: "ExpertRole: Your answer here."**
-"""
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "system", "content": prompt}]
-        )
-        extra_response = response.choices[0].message.content
-        return extra_response
-    except Exception as e:
-        return f"Error generating extra follow-up response: {e}"
+
+def stream_extra_followup_response(extra_question, context, experts, memory=None):
+    """
+    Streaming variant of generate_extra_followup_response.
+    Yields the "<Expert Role>: <Answer>" reply chunk by chunk as the model produces it.
+    """
+    messages = _followup_messages(extra_question, context, experts, memory)
+    with tracing.span("followup"):
+        try:
+            yield from llm_client.stream(messages, call_site="followup")
+        except Exception as e:
+            yield f"Error generating extra follow-up response: {e}"
+
+
+def _followup_messages(extra_question, context, experts, memory=None):
+    """
+    Builds the follow-up prompt shared by the blocking and streaming follow-up calls.
+    With a MeetingMemory, the panel and the digest of the discussion come from it.
+    """
+    if memory is not None:
+        experts = memory.experts
+    summary = memory.digest if memory is not None and memory.digest else _NO_SUMMARY
+    return FOLLOWUP_PROMPT.render(context, experts=", ".join(experts), summary=summary,
+                                  question=extra_question.strip())
@@ -0,0 +1,164 @@
+# backend/analytics.py
+"""
+Usage analytics, read from the rollup tables that database.initialize_db() maintains.
+
+Triggers on expert_selections and waitlist update the daily rollups in the same transaction as
+every insert, so nothing here scans the raw history or splits selected_experts strings. A query
+reads a few rollup rows for each day in its range. Its cost depends on the number of days asked
+about, not on the number of meetings held. Days are UTC dates ('YYYY-MM-DD'). A range is the
+`days` days ending at `until` (today by default), and it includes both ends. A meeting is one
+expert_selections row.
+
+    python -m backend.analytics --days 7   # prints a JSON report
+"""
+import argparse
+import datetime
+import json
+
+from backend.database import get_pool
+
+DEFAULT_DAYS = 7
+TOP_EXPERTS = 10
+
+
+def _day_range(days, until):
+    """(first day, last day) as ISO strings for the `days` days ending at until."""
+    if until is None:
+        until = datetime.datetime.now(datetime.timezone.utc).date()
+    elif isinstance(until, str):
+        until = datetime.date.fromisoformat(until)
+    return (until - datetime.timedelta(days=days - 1)).isoformat(), until.isoformat()
+
+
+def _days(first, last):
+    day, last = datetime.date.fromisoformat(first), datetime.date.fromisoformat(last)
+    while day <= last:
+        yield day.isoformat()
+        day += datetime.timedelta(days=1)
+
+
+def top_experts(days=DEFAULT_DAYS, until=None, limit=TOP_EXPERTS):
+    """The most selected experts over the range, as [(expert, selections)], most selected first."""
+    first, last = _day_range(days, until)
+    with get_pool().connection() as conn:
+        return conn.execute("""
+            SELECT expert, SUM(selections) AS total FROM daily_expert_counts
+            WHERE day BETWEEN ? AND ?
+            GROUP BY expert ORDER BY total DESC, expert LIMIT ?
+        """, (first, last, limit)).fetchall()
+
+
+def top_experts_by_week(weeks=4, until=None, limit=5):
+    """
+    The most selected experts of each of the last `weeks` seven-day periods ending at until, as
+    {first day of the period: [(expert, selections)]}, oldest period first.
+    """
+    last = datetime.date.fromisoformat(_day_range(1, until)[1])
+    periods = {}
+    for week in range(weeks - 1, -1, -1):
+        end = last - datetime.timedelta(days=7 * week)
+        periods[_day_range(7, end)[0]] = top_experts(7, end, limit)
+    return periods
+
+
+def expert_trend(expert, days=DEFAULT_DAYS, until=None):
+    """One expert's selections per day over the range, as [(day, selections)] with every day listed."""
+    first, last = _day_range(days, until)
+    with get_pool().connection() as conn:
+        counts = dict(conn.execute(
+            "SELECT day, selections FROM daily_expert_counts WHERE day BETWEEN ? AND ? AND expert = ?",
+            (first, last, expert)).fetchall())
+    return [(day, counts.get(day, 0)) for day in _days(first, last)]
+
+
+def activity(days=DEFAULT_DAYS, until=None):
+    """
+    Meetings, active sessions and meetings per session for each day of the range, as
+    [(day, meetings, sessions, meetings_per_session)] with every day listed.
+    """
+    first, last = _day_range(days, until)
+    with get_pool().connection() as conn:
+        rows = {day: (meetings, sessions) for day, meetings, sessions in conn.execute(
+            "SELECT day, meetings, sessions FROM daily_activity WHERE day BETWEEN ? AND ?", (first, last))}
+    result = []
+    for day in _days(first, last):
+        meetings, sessions = rows.get(day, (0, 0))
+        result.append((day, meetings, sessions, meetings / sessions if sessions else 0.0))
+    return result
+
+
+def meetings_per_session(days=DEFAULT_DAYS, until=None):
+    """Average meetings per active session over the range. A session active on two days counts twice."""
+    first, last = _day_range(days, until)
+    with get_pool().connection() as conn:
+        meetings, sessions = conn.execute(
+            "SELECT SUM(meetings), SUM(sessions) FROM daily_activity WHERE day BETWEEN ? AND ?",
+            (first, last)).fetchone()
+    return meetings / sessions if sessions else 0.0
+
+
+def session_meetings(session_id, days=DEFAULT_DAYS, until=None):
+    """The session's meetings over the range, as [(day, meetings)] for the days it held any."""
+    first, last = _day_range(days, until)
+    with get_pool().connection() as conn:
+        return conn.execute(
+            "SELECT day, meetings FROM daily_session_meetings WHERE day BETWEEN ? AND ? AND session_id = ?",
+            (first, last, session_id)).fetchall()
+
+
+def waitlist_growth(days=DEFAULT_DAYS, until=None):
+    """
+    Waitlist signups per day over the range, as [(day, signups, priority_signups, total)] with every
+    day listed. total is the size of the waitlist at the end of that day.
+    """
+    first, last = _day_range(days, until)
+    with get_pool().connection() as conn:
+        total = conn.execute("SELECT coalesce(SUM(signups), 0) FROM daily_waitlist WHERE day < ?",
+                             (first,)).fetchone()[0]
+        rows = {day: (signups, priority) for day, signups, priority in conn.execute(
+            "SELECT day, signups, priority_signups FROM daily_waitlist WHERE day BETWEEN ? AND ?", (first, last))}
+    result = []
+    for day in _days(first, last):
+        signups, priority = rows.get(day, (0, 0))
+        total += signups
+        result.append((day, signups, priority, total))
+    return result
+
+
+def recent_meetings_with(expert, limit=20):
+    """The latest meetings the expert was selected for, as [(selection id, session_id, timestamp)]."""
+    with get_pool().connection() as conn:
+        return conn.execute("""
+            SELECT s.id, s.session_id, s.timestamp
+            FROM selection_experts e JOIN expert_selections s ON s.id = e.selection_id
+            WHERE e.expert = ?
+            ORDER BY e.selection_id DESC LIMIT ?
+        """, (expert, limit)).fetchall()
+
+
+def report(days=DEFAULT_DAYS, until=None):
+    """The headline numbers for the range as one dict."""
+    daily = activity(days, until)
+    return {
+        "days": [daily[0][0], daily[-1][0]],
+        "meetings": sum(row[1] for row in daily),
+        "meetings_per_session": round(meetings_per_session(days, until), 3),
+        "top_experts": top_experts(days, until),
+        "activity": daily,
+        "waitlist": waitlist_growth(days, until),
+    }
+
+
+def main(argv=None):
+    from backend.database import initialize_db
+
+    parser = argparse.ArgumentParser(description="Print usage analytics as JSON.")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="length of the range in days")
+    parser.add_argument("--until", help="last day of the range, YYYY-MM-DD (default: today, UTC)")
+    args = parser.parse_args(argv)
+    initialize_db()
+    print(json.dumps(report(args.days, args.until), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# backend/batch.py
+"""
+Batch meetings: one meeting per line of a JSONL file, run on a bounded worker pool.
+
+Each input line is a JSON object with an "id" and a "context" dict of Secretary fields, e.g.
+
+    {"id": "client-42", "context": {"problem": "...", "objective": "...", "geography": "Lagos"}}
+
+A line without "context" uses its other keys as the context; a line without "id" is named after
+its line number. Every job runs select_experts and generate_expert_discussion within the meeting
+deadline (backend/deadlines.py), and its result is appended to the output JSONL as soon as it
+finishes. Successful meetings are also kept in the transcript store under their ID. A malformed
+line is written as an error result for its ID and the batch goes on. A rerun with the same output
+skips every ID that already has a successful result, so a crashed batch resumes where it stopped
+and retries only its failures.
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backend import deadlines, tracing
+from backend.database import initialize_db
+from backend.ai_processing import DISCUSSION_ERROR, generate_expert_discussion
+from backend.expert_manager import select_experts
+from backend.logger import log_transcript
+from backend.meeting_report import MeetingReport
+
+DEFAULT_WORKERS = 4
+# Progress is reported after this many finished meetings
+PROGRESS_EVERY = 25
+
+
+def read_jobs(path):
+    """
+    Yields (id, context, error) for each line of the input file, skipping blank lines.
+    A malformed line yields its id (or line-N) with context None and what is wrong with it, so
+    one bad line is reported in the output instead of stopping the batch.
+    """
+    with open(path, encoding="utf-8") as lines:
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            job_id = f"line-{number}"
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield job_id, None, f"{path}:{number}: not a JSON object ({e})"
+                continue
+            if not isinstance(record, dict):
+                yield job_id, None, f"{path}:{number}: expected a JSON object"
+                continue
+            job_id = str(record.get("id", job_id))
+            context = record.get("context")
+            if context is None:
+                context = {key: value for key, value in record.items() if key != "id"}
+            if not isinstance(context, dict):
+                yield job_id, None, f"{path}:{number}: context must be a JSON object"
+                continue
+            yield job_id, context, None
+
+
+def completed_ids(path):
+    """IDs with a successful result in an existing output file. A torn last line is ignored."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    # A torn line can end inside a multi-byte character
+    with open(path, encoding="utf-8", errors="replace") as lines:
+        for line in lines:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(result, dict) and "id" in result and not result.get("error"):
+                done.add(result["id"])
+    return done
+
+
+def _ends_mid_line(path):
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return False
+    with open(path, "rb") as output:
+        output.seek(-1, os.SEEK_END)
+        return output.read(1) != b"\n"
+
+
+def run_meeting(job_id, context, engine=None, structured=False):
+    """Runs one meeting and returns its result record; failures are recorded, not raised."""
+    started = time.perf_counter()
+    result = {"id": job_id}
+    with tracing.meeting(job_id), deadlines.scope():
+        try:
+            experts = select_experts(context)
+            result["experts"] = experts
+            discussion = generate_expert_discussion(context, experts, engine=engine, structured=structured)
+            if isinstance(discussion, MeetingReport):
+                result["report"] = discussion.to_dict()
+                error = discussion.error
+                if not error:
+                    log_transcript(None, job_id, context, experts, report=discussion)
+            else:
+                result["discussion"] = discussion
+                # The discussion functions report failures in their return value
+                error = discussion if discussion.startswith(DISCUSSION_ERROR) else None
+                if not error:
+                    log_transcript(None, job_id, context, experts, discussion)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    if error:
+        result["error"] = error
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * q // 100) - 1)] if ordered else 0.0
+
+
+class BatchStats:
+    """Counts and latencies of one batch run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.skipped = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.latencies = []
+
+    def add(self, result):
+        # Malformed input lines never ran, so they have no latency
+        if "seconds" in result:
+            self.latencies.append(result["seconds"])
+        if result.get("error"):
+            self.failed += 1
+        else:
+            self.succeeded += 1
+
+    @property
+    def finished(self):
+        return self.succeeded + self.failed
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "finished": self.finished,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "seconds": round(elapsed, 3),
+            "meetings_per_second": round(self.finished / elapsed, 3) if elapsed else 0.0,
+            "p50_seconds": _percentile(self.latencies, 50),
+            "p95_seconds": _percentile(self.latencies, 95),
+        }
+
+
+def run_batch(input_path, output_path, workers=DEFAULT_WORKERS, engine=None, structured=False, log=sys.stderr):
+    """
+    Runs every pending job of input_path and appends the results to output_path. At most
+    `workers` meetings run at once, and at most twice that many jobs are read ahead, so memory
+    stays flat however large the input is. Returns BatchStats.summary().
+    """
+    initialize_db()
+    done = completed_ids(output_path)
+    stats = BatchStats()
+    seen = set()
+    torn = _ends_mid_line(output_path)
+    with open(output_path, "a", encoding="utf-8") as output, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        if torn:
+            # A crash can leave a torn last line; start the new results on a fresh one
+            output.write("\n")
+
+        def record(result):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            stats.add(result)
+            if log and stats.finished % PROGRESS_EVERY == 0:
+                print(f"{stats.finished} meetings finished, {stats.failed} failed", file=log)
+
+        def write(futures):
+            for future in futures:
+                record(future.result())
+
+        pending = set()
+        try:
+            for job_id, context, error in read_jobs(input_path):
+                if job_id in done or job_id in seen:
+                    stats.skipped += 1
+                    continue
+                seen.add(job_id)
+                if error:
+                    record({"id": job_id, "error": error})
+                    continue
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    write(finished)
+                pending.add(pool.submit(run_meeting, job_id, context, engine, structured))
+        finally:
+            # Meetings already submitted are paid for; keep their results even if reading the input failed
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(finished)
+    return stats.summary()
@@ -0,0 +1,261 @@
+# backend/context_extraction.py
+"""
+Pulls Secretary fields out of free-form user messages.
+
+Users often describe their role, goal, location and limits in one go. extract_fields() finds those
+parts with local regex heuristics, so the Secretary can skip the questions that are already
+answered. Every rule is conservative and carries a confidence. A field is only filled when its rule
+reaches MIN_CONFIDENCE, e.g. a location needs a cue such as "based in" or a name from a small
+gazetteer, so "leads come from Instagram" is no location. Anything uncertain is left for the
+Secretary to ask about. When settings.SECRETARY_MODEL_EXTRACTION is on, extract_fields_with_model()
+makes one cheap model call for whatever the heuristics missed in a long message.
+"""
+import json
+import re
+
+from config import settings
+
+# Shorter messages rarely hold more than the one answer they were asked for
+MODEL_MIN_WORDS = 12
+
+_CLAUSE_RE = re.compile(r"[^.;!?\n]+")
+# Contrasting clauses usually change topic ("I want to grow, but my budget is tight")
+_CONTRAST_RE = re.compile(r",?\s+\b(?:but|although|though|however|whereas)\b\s+", re.IGNORECASE)
+
+# A field is only filled when its rule is at least this confident; otherwise the Secretary asks
+MIN_CONFIDENCE = settings.SECRETARY_MIN_CONFIDENCE
+
+_ROLE = (r"(?:co-?)?(?:owner|founder|ceo|cto|coo|cfo|manager|director|head|freelancer|consultant|partner|"
+         r"entrepreneur|shareholder|investor|employee|lead|president|proprietor)s?")
+# The role noun phrase: up to two modifiers, the role and an optional "of/at/for/in ..." attachment.
+# The attachment stops at a comma or at a word that starts a new clause ("As CEO I need to ...").
+_PERSONA_RE = re.compile(
+    rf"\b(i am|i'm|i work as|my role is|as)\s+(?:a|an|the)?\s*"
+    rf"((?:(?!(?:a|an|the|my|our|his|her|their)\s)[a-z][\w-]*\s+){{0,2}}?{_ROLE}\b)([^,;]*)",
+    re.IGNORECASE)
+_ATTACHMENT_RE = re.compile(r"\s+(?:of|at|for|in)\s", re.IGNORECASE)
+_CLAUSE_START_RE = re.compile(r"\b(?:i|we|and|but|who|which|that|because|so|to)\b", re.IGNORECASE)
+# A role phrase longer than this is probably a whole sentence
+_PERSONA_MAX_WORDS = 10
+_OBJECTIVE_RE = re.compile(
+    r"\b(i want to|i'd like to|i would like to|we want to|we'd like to|my goal is(?: to)?|our goal is(?: to)?|"
+    r"the goal is(?: to)?|my objective is(?: to)?|aim(?:ing)? to|hoping to|looking to|plan(?:ning)? to|"
+    r"need to)\s+(.+)", re.IGNORECASE)
+# "I need to decide whether ..." states a decision at least as often as a goal
+_WEAK_OBJECTIVE_CUES = {"need to"}
+_CONSTRAINT_RE = re.compile(
+    r"\b(budget|limited|only have|can't afford|cannot afford|deadline|short on|shortage|lack of|"
+    r"constraint|constrained|restricted|tight|no more than|at most)\b", re.IGNORECASE)
+_SCENARIO_RE = re.compile(
+    r"\b(because|due to|ever since|since|after|recently|last (?:year|month|quarter|week)|started when)\b",
+    re.IGNORECASE)
+_PROBLEM_RE = re.compile(
+    r"\b(problem|challenge|struggl\w*|declin\w*|dropp\w*|falling|losing|issue|difficult\w*|can't|cannot)\b",
+    re.IGNORECASE)
+# "based in Nairobi, Kenya", "in Lagos": capitalized words after a location cue. After a bare
+# preposition the place must be in _GAZETTEER, since "from Instagram" or "in Q3" are not places.
+# Capitalized runs are found first and the one or two words before each are looked up as the cue.
+_CAPITALIZED_RE = re.compile(r"\b[A-Z][\w'-]+(?:(?:,\s*|\s+)[A-Z][\w'-]+)*")
+_WEAK_LOCATION_CUES = {"in", "from", "across", "around", "throughout"}
+_LOCATION_CUES = {f"{verb} {preposition}"
+                  for verb in ("based", "located", "headquartered", "operate", "operating", "sell", "sells",
+                               "selling", "expand", "expanding", "launch", "launching", "live", "we're", "are")
+                  for preposition in ("in", "into", "to")}
+_NOT_PLACES = {
+    "January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+    "November", "December", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday",
+    "Sunday", "I", "We", "My", "Our", "The", "This", "That", "Q1", "Q2", "Q3", "Q4",
+}
+# Platforms and companies people sell on or through, which follow "from" and "in" like places do
+_BRANDS = {
+    "airbnb", "alibaba", "amazon", "apple", "ebay", "etsy", "facebook", "google", "instagram", "jumia",
+    "linkedin", "microsoft", "netflix", "pinterest", "reddit", "shopify", "snapchat", "spotify",
+    "telegram", "tiktok", "twitter", "uber", "walmart", "whatsapp", "youtube",
+}
+_GAZETTEER = frozenset(name.strip().lower() for name in """
+    Africa, Asia, Europe, North America, South America, Latin America, Middle East, Oceania, Australia,
+    Caribbean, Scandinavia, West Africa, East Africa, Southern Africa, North Africa, Southeast Asia, EU,
+    Algeria, Angola, Argentina, Austria, Bangladesh, Belgium, Benin, Botswana, Brazil, Bulgaria,
+    Burkina Faso, Cameroon, Canada, Chile, China, Colombia, Congo, Costa Rica, Croatia, Czechia,
+    Denmark, Dominican Republic, Ecuador, Egypt, Ethiopia, Finland, France, Gambia, Germany, Ghana,
+    Greece, Guatemala, Guinea, Hungary, India, Indonesia, Iran, Iraq, Ireland, Israel, Italy,
+    Ivory Coast, Jamaica, Japan, Jordan, Kenya, Korea, South Korea, Kuwait, Lebanon, Liberia, Libya,
+    Madagascar, Malawi, Malaysia, Mali, Mexico, Morocco, Mozambique, Namibia, Nepal, Netherlands,
+    New Zealand, Niger, Nigeria, Norway, Pakistan, Peru, Philippines, Poland, Portugal, Qatar,
+    Romania, Russia, Rwanda, Saudi Arabia, Senegal, Sierra Leone, Singapore, Somalia, South Africa,
+    Spain, Sri Lanka, Sudan, Sweden, Switzerland, Tanzania, Thailand, Togo, Tunisia, Turkey, Uganda,
+    Ukraine, United Arab Emirates, UAE, United Kingdom, UK, Britain, England, Scotland, Wales,
+    United States, USA, US, America, Venezuela, Vietnam, Zambia, Zimbabwe,
+    Abuja, Accra, Addis Ababa, Amsterdam, Atlanta, Bangalore, Bangkok, Barcelona, Beijing, Berlin,
+    Boston, Cairo, Cape Town, Casablanca, Chicago, Dakar, Dallas, Dar es Salaam, Delhi, Dubai, Dublin,
+    Durban, Ibadan, Istanbul, Jakarta, Johannesburg, Kampala, Kano, Karachi, Kigali, Kinshasa, Kumasi,
+    Lagos, Lima, Lisbon, London, Los Angeles, Lusaka, Madrid, Manchester, Manila, Melbourne,
+    Mexico City, Miami, Milan, Mombasa, Montreal, Moscow, Mumbai, Nairobi, New York, Paris,
+    Port Harcourt, Rome, San Francisco, Sao Paulo, Seattle, Seoul, Shanghai, Singapore, Sydney,
+    Texas, California, Florida, Tokyo, Toronto, Vancouver, Warsaw, Zurich
+""".split(","))
+
+
+def _clauses(text):
+    return [clause.strip(" ,") for sentence in _CLAUSE_RE.findall(text)
+            for clause in _CONTRAST_RE.split(sentence) if clause.strip(" ,")]
+
+
+def _known_place(place):
+    """Whether any comma-separated part of place starts with a gazetteer name."""
+    for part in place.split(","):
+        words = part.split()
+        if any(" ".join(words[:length]).lower() in _GAZETTEER for length in range(len(words), 0, -1)):
+            return True
+    return False
+
+
+def _place(clause):
+    """(place, confidence) for the location the clause names most clearly, or None."""
+    best = None
+    for match in _CAPITALIZED_RE.finditer(clause):
+        before = clause[max(0, match.start() - 40):match.start()].lower().split()
+        if before and before[-1] == "the":
+            before.pop()
+        if " ".join(before[-2:]) in _LOCATION_CUES:
+            cued = True
+        elif before and before[-1] in _WEAK_LOCATION_CUES:
+            cued = False
+        else:
+            continue
+        words = match.group().replace(",", " ").split()
+        while words and words[0] in _NOT_PLACES:
+            words.pop(0)
+        if not words or any(word.lower() in _BRANDS for word in words):
+            continue
+        place = match.group()[match.group().index(words[0]):]
+        if _known_place(place):
+            confidence = 1.0 if cued else 0.9
+        else:
+            confidence = 0.8 if cued else 0.3
+        if best is None or confidence > best[1]:
+            best = (place, confidence)
+    return best
+
+
+def _persona(clause):
+    match = _PERSONA_RE.search(clause)
+    if not match:
+        return None
+    role, rest = match.group(2), match.group(3)
+    if _ATTACHMENT_RE.match(rest):
+        role += _CLAUSE_START_RE.split(rest, 1)[0]
+    role = role.strip()
+    confidence = 0.8 if match.group(1).lower() == "as" else 0.9
+    if len(role.split()) > _PERSONA_MAX_WORDS:
+        confidence = 0.5
+    return role, confidence
+
+
+def _objective(clause):
+    match = _OBJECTIVE_RE.search(clause)
+    if not match:
+        return None
+    return match.group(2).strip(), 0.6 if match.group(1).lower() in _WEAK_OBJECTIVE_CUES else 0.9
+
+
+def _clause_field(clause, pattern, weak):
+    """(clause, confidence) when the clause has one of pattern's cues; weak cues alone are not enough."""
+    match = pattern.search(clause)
+    if not match:
+        return None
+    while match and weak.fullmatch(match.group(1).lower()):
+        match = pattern.search(clause, match.end())
+    return clause, 0.6 if match is None else 0.8
+
+
+# Fields picked out of a clause, other than the location
+_PHRASE_FIELDS = (("persona", _persona), ("objective", _objective))
+# Whole-clause fields in the order they are tried, with the cues that are not enough on their own
+_CLAUSE_FIELDS = (
+    ("constraints", _CONSTRAINT_RE, re.compile(r"(?!)")),
+    ("scenario", _SCENARIO_RE, re.compile(r"because|since|after")),
+    ("problem", _PROBLEM_RE, re.compile(r"issue|difficult\w*|can't|cannot")),
+)
+
+
+def extract_candidates(text, fields):
+    """
+    Returns {field: (value, confidence)} for each of `fields` the message seems to state, with the
+    confidence of the rule that found it, from 0 to 1.
+    The location, role and goal are picked out of a clause. The constraints, scenario and problem
+    take a whole clause, so they are only considered for clauses that gave neither role nor goal.
+    """
+    # Fields still worth looking for: wanted, and not yet found confidently
+    pending = set(fields)
+    found = {}
+
+    def offer(field, candidate):
+        if field not in found or candidate[1] > found[field][1]:
+            found[field] = candidate
+            if candidate[1] >= MIN_CONFIDENCE:
+                pending.discard(field)
+
+    for clause in _clauses(text):
+        if "geography" in pending:
+            place = _place(clause)
+            if place:
+                offer("geography", place)
+        used = False
+        for field, rule in _PHRASE_FIELDS:
+            if field in pending:
+                candidate = rule(clause)
+                if candidate:
+                    offer(field, candidate)
+                    used = True
+        if used:
+            continue
+        for field, pattern, weak in _CLAUSE_FIELDS:
+            if field in pending:
+                candidate = _clause_field(clause, pattern, weak)
+                if candidate:
+                    offer(field, candidate)
+                    break
+    return found
+
+
+def extract_fields(text, fields, min_confidence=MIN_CONFIDENCE):
+    """
+    Returns {field: value} for each of `fields` that the message clearly states: those found with at
+    least min_confidence. Anything less certain is left for the Secretary to ask about.
+    """
+    return {field: value for field, (value, confidence) in extract_candidates(text, fields).items()
+            if confidence >= min_confidence}
+
+
+_EXTRACTION_PROMPT = """
+Extract the following fields from the user's message about their business situation, if it states them:
+{fields}
+
+Return a JSON object with only the fields the message clearly states, each as a short phrase in the user's words.
+Return {{}} if it states none of them.
+"""
+
+
+def extract_fields_with_model(text, fields):
+    """
+    Asks a small model for the fields the heuristics could not find. Returns {} for short
+    messages and whenever the reply is not a usable JSON object.
+    """
+    if not fields or len(text.split()) < MODEL_MIN_WORDS:
+        return {}
+    # Imported here so the Secretary stays cheap to import when model extraction is off
+    from backend import llm_client
+
+    prompt = _EXTRACTION_PROMPT.format(fields="\n".join(f"- {field}" for field in fields))
+    try:
+        reply = llm_client.complete([{"role": "system", "content": prompt}, {"role": "user", "content": text}],
+                                    call_site="secretary_extract", max_tokens=200,
+                                    response_format={"type": "json_object"})
+        extracted = json.loads(reply)
+    except Exception:
+        return {}
+    if not isinstance(extracted, dict):
+        return {}
+    return {field: str(value).strip() for field, value in extracted.items()
+            if field in fields and isinstance(value, (str, int, float)) and str(value).strip()}
@@ -1,91 +1,712 @@
+import json
+import queue
+import re
 import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from backend import tracing
+from config import settings
+
+DB_NAME = settings.DB_NAME
+
+# Connection pool tuning
+POOL_SIZE = 8
+POOL_TIMEOUT = 10.0  # seconds to wait for a free connection
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 128
+
+# Applied to every new connection. WAL lets readers proceed while a writer commits, and
+# synchronous=NORMAL is safe under WAL while skipping an fsync per transaction.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections to one database file.
+    Connections are created lazily up to `size`, configured with PRAGMAS, and reused. Each one
+    keeps its own prepared-statement cache, so repeated queries skip re-parsing.
+    """
+
+    def __init__(self, db_name=DB_NAME, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._acquisitions = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._transactions = 0
+        self._rollbacks = 0
+
+    def _connect(self):
+        # isolation_level=None: statements autocommit unless run inside transaction()
+        conn = sqlite3.connect(self.db_name, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                started = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No database connection available after {self.timeout}s")
+                with self._lock:
+                    self._waits += 1
+                    self._wait_time += time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self._acquisitions += 1
+        return conn
+
+    def _release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection for autocommit statements."""
+        started = time.perf_counter()
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+            tracing.record(db_calls=1, db_time=time.perf_counter() - started)
+
+    @contextmanager
+    def transaction(self, immediate=True):
+        """
+        Borrows a connection and runs the block in one transaction, committing on success and
+        rolling back on error. `immediate` takes the write lock up front (BEGIN IMMEDIATE), so
+        concurrent writers wait on busy_timeout instead of failing midway.
+        """
+        started = time.perf_counter()
+        conn = self._acquire()
+        try:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                with self._lock:
+                    self._rollbacks += 1
+                raise
+            conn.execute("COMMIT")
+            with self._lock:
+                self._transactions += 1
+        finally:
+            self._release(conn)
+            tracing.record(db_calls=1, db_time=time.perf_counter() - started)
+
+    def stats(self):
+        """Returns a snapshot of pool usage counters."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "acquisitions": self._acquisitions,
+                "waits": self._waits,
+                "wait_time": self._wait_time,
+                "transactions": self._transactions,
+                "rollbacks": self._rollbacks,
+            }
+
+    def close(self):
+        """Closes every idle connection."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name=None):
+    """Returns the shared pool for db_name (defaults to DB_NAME)."""
+    db_name = db_name or DB_NAME
+    pool = _pools.get(db_name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_name)
+            if pool is None:
+                pool = _pools[db_name] = ConnectionPool(db_name)
+    return pool
+
+
+def transaction():
+    """Runs a block in one transaction on the application database."""
+    return get_pool().transaction()
+
+
+def pool_stats():
+    """Returns usage counters of the application database pool."""
+    return get_pool().stats()
 
-DB_NAME = "app_data.sqlite"
 
 def initialize_db():
     """Initialize the database with tables for user sessions, expert selections, and waitlist."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    # User Sessions Table (Tracking Meeting Limits)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_sessions (
-            session_id TEXT PRIMARY KEY,
-            meeting_count INTEGER DEFAULT 0
-        )
-    """)
+    with transaction() as conn:
+        # User Sessions Table (Tracking Meeting Limits)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_sessions (
+                session_id TEXT PRIMARY KEY,
+                meeting_count INTEGER DEFAULT 0
+            )
+        """)
+
+        # Expert Selections Table
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS expert_selections (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                user_input TEXT,
+                selected_experts TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Signatures of the expert_selections contexts, for the similar-context index
+        # (see backend/similarity_index.py)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS context_signatures (
+                selection_id INTEGER PRIMARY KEY,
+                problem INTEGER,
+                objective INTEGER,
+                fingerprint INTEGER NOT NULL
+            )
+        """)
+
+        # Waitlist Table
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS waitlist (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT UNIQUE NOT NULL,
+                priority_access BOOLEAN DEFAULT 0,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Meeting jobs run by the worker pool (see backend/jobs.py)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS meeting_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                payload TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                heartbeat REAL,
+                watched_at REAL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                finished_at DATETIME
+            )
+        """)
+        # At most one unfinished job per session, however many processes enqueue
+        conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS meeting_jobs_active_session
+            ON meeting_jobs (session_id) WHERE status IN ('queued', 'running')
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS meeting_jobs_status ON meeting_jobs (status, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS meeting_jobs_session ON meeting_jobs (session_id, id)")
+
+        # Live job worker processes, so the UI can tell whether it needs to start some
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_workers (
+                worker_id TEXT PRIMARY KEY,
+                pid INTEGER,
+                heartbeat REAL
+            )
+        """)
+
+        # Meeting transcripts (see save_transcript). The text is kept in compressed blobs; only the
+        # title and the panel stay readable for listings.
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS meeting_transcripts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                meeting_id TEXT UNIQUE NOT NULL,
+                session_id TEXT,
+                title TEXT,
+                experts TEXT,
+                codec TEXT NOT NULL,
+                context BLOB NOT NULL,
+                discussion BLOB NOT NULL,
+                report BLOB,
+                followups BLOB,
+                followup_count INTEGER NOT NULL DEFAULT 0,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS meeting_transcripts_session ON meeting_transcripts (session_id, id)")
+        # Full-text index over the transcripts, keyed by meeting_transcripts.id. It is contentless:
+        # it holds only the index, and the text itself stays compressed in meeting_transcripts.
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS meeting_transcripts_fts USING fts5(
+                context, panel, discussion, followups,
+                content='', tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """)
+
+        # Analytics (see backend/analytics.py)
+        conn.execute("CREATE INDEX IF NOT EXISTS expert_selections_session ON expert_selections (session_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS expert_selections_timestamp ON expert_selections (timestamp)")
+        # expert_selections.selected_experts split into one row per expert
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS selection_experts (
+                selection_id INTEGER NOT NULL REFERENCES expert_selections (id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                expert TEXT NOT NULL,
+                PRIMARY KEY (selection_id, position)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS selection_experts_expert ON selection_experts (expert, selection_id)")
+        # Daily rollups, keyed by UTC day ('YYYY-MM-DD'). Meetings are expert_selections rows; an
+        # unknown session is counted under ''.
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_expert_counts (
+                day TEXT NOT NULL,
+                expert TEXT NOT NULL,
+                selections INTEGER NOT NULL,
+                PRIMARY KEY (day, expert)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_session_meetings (
+                day TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                meetings INTEGER NOT NULL,
+                PRIMARY KEY (day, session_id)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS daily_session_meetings_session "
+                     "ON daily_session_meetings (session_id, day)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_activity (
+                day TEXT PRIMARY KEY,
+                meetings INTEGER NOT NULL,
+                sessions INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_waitlist (
+                day TEXT PRIMARY KEY,
+                signups INTEGER NOT NULL,
+                priority_signups INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        # The triggers keep the rollups current on every insert, whichever code path writes the row
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS expert_selections_rollup AFTER INSERT ON expert_selections
+            BEGIN
+                INSERT INTO selection_experts (selection_id, position, expert)
+                SELECT NEW.id, key, trim(value) FROM json_each({_expert_list("NEW.selected_experts")})
+                WHERE trim(value) != '';
+                INSERT INTO daily_expert_counts (day, expert, selections)
+                SELECT date(NEW.timestamp), expert, 1 FROM selection_experts WHERE selection_id = NEW.id
+                ON CONFLICT (day, expert) DO UPDATE SET selections = selections + 1;
+                INSERT INTO daily_session_meetings (day, session_id, meetings)
+                VALUES (date(NEW.timestamp), coalesce(NEW.session_id, ''), 1)
+                ON CONFLICT (day, session_id) DO UPDATE SET meetings = meetings + 1;
+                -- A session counts once per day: when its first meeting of the day was just recorded
+                INSERT INTO daily_activity (day, meetings, sessions)
+                SELECT date(NEW.timestamp), 1, meetings = 1 FROM daily_session_meetings
+                WHERE day = date(NEW.timestamp) AND session_id = coalesce(NEW.session_id, '')
+                ON CONFLICT (day) DO UPDATE SET meetings = meetings + 1, sessions = sessions + excluded.sessions;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS waitlist_rollup AFTER INSERT ON waitlist
+            BEGIN
+                INSERT INTO daily_waitlist (day, signups, priority_signups)
+                VALUES (date(NEW.timestamp), 1, coalesce(NEW.priority_access, 0) != 0)
+                ON CONFLICT (day) DO UPDATE SET signups = signups + 1,
+                                                priority_signups = priority_signups + excluded.priority_signups;
+            END
+        """)
+
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
 
-    # Expert Selections Table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS expert_selections (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            user_input TEXT,
-            selected_experts TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
 
-    # Waitlist Table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS waitlist (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            priority_access BOOLEAN DEFAULT 0,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
+def _expert_list(column):
+    """
+    SQL turning a comma-joined selected_experts column into a JSON array for json_each(). Anything
+    that would not make valid JSON becomes an empty list rather than failing the insert.
+    """
+    array = rf"""'["' || replace(replace(replace({column}, '\', '\\'), '"', '\"'), ',', '","') || '"]'"""
+    return f"CASE WHEN json_valid({array}) THEN {array} ELSE '[]' END"
+
+
+def _backfill_analytics(conn):
+    """Builds the analytics tables from the expert_selections and waitlist rows written before they existed."""
+    conn.execute(f"""
+        INSERT INTO selection_experts (selection_id, position, expert)
+        SELECT s.id, e.key, trim(e.value)
+        FROM expert_selections s, json_each({_expert_list("s.selected_experts")}) e
+        WHERE trim(e.value) != ''
+    """)
+    conn.execute("""
+        INSERT INTO daily_expert_counts (day, expert, selections)
+        SELECT date(s.timestamp), e.expert, COUNT(*)
+        FROM selection_experts e JOIN expert_selections s ON s.id = e.selection_id
+        GROUP BY 1, 2
+    """)
+    conn.execute("""
+        INSERT INTO daily_session_meetings (day, session_id, meetings)
+        SELECT date(timestamp), coalesce(session_id, ''), COUNT(*) FROM expert_selections GROUP BY 1, 2
+    """)
+    conn.execute("""
+        INSERT INTO daily_activity (day, meetings, sessions)
+        SELECT day, SUM(meetings), COUNT(*) FROM daily_session_meetings GROUP BY day
+    """)
+    conn.execute("""
+        INSERT INTO daily_waitlist (day, signups, priority_signups)
+        SELECT date(timestamp), COUNT(*), SUM(coalesce(priority_access, 0) != 0) FROM waitlist GROUP BY 1
     """)
 
-    conn.commit()
-    conn.close()
 
-def get_session(session_id):
-    """Retrieve the session info, create one if it doesn't exist."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+def _drop_context_fingerprints(conn):
+    """Drops the whole-context fingerprints the similar-context index kept before context_signatures."""
+    conn.execute("DROP TABLE IF EXISTS context_fingerprints")
 
-    # Check if the session exists
-    cursor.execute("SELECT * FROM user_sessions WHERE session_id = ?", (session_id,))
-    session = cursor.fetchone()
 
-    # If session doesn't exist, create a new one
-    if not session:
-        cursor.execute("INSERT INTO user_sessions (session_id, meeting_count) VALUES (?, ?)", (session_id, 0))
-        conn.commit()
-        session = (session_id, 0)  # Default values
+# One-time data migrations, run in order by initialize_db(). PRAGMA user_version records how many
+# have been applied to a database file.
+MIGRATIONS = (
+    _backfill_analytics,
+    _drop_context_fingerprints,
+)
+
+def get_session(session_id):
+    """Retrieve the session info, create one if it doesn't exist."""
+    with transaction() as conn:
+        # Create the session if it doesn't exist; concurrent callers cannot race on the insert
+        conn.execute("INSERT OR IGNORE INTO user_sessions (session_id, meeting_count) VALUES (?, ?)", (session_id, 0))
+        session = conn.execute("SELECT * FROM user_sessions WHERE session_id = ?", (session_id,)).fetchone()
 
-    conn.close()
     return session  # Returns tuple (session_id, meeting_count)
 
 def update_meeting_count(session_id):
     """Increment the meeting count for a given session."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    with get_pool().connection() as conn:
+        conn.execute("UPDATE user_sessions SET meeting_count = meeting_count + 1 WHERE session_id = ?", (session_id,))
+
+# Meeting quota (see backend/admission.py). One statement creates the session if needed and takes a
+# meeting only while the count is under the limit, so two processes cannot both take the last one.
+ADMIT_MEETING = """
+    INSERT INTO user_sessions (session_id, meeting_count) VALUES (?, 1)
+    ON CONFLICT(session_id) DO UPDATE SET meeting_count = meeting_count + 1
+    WHERE meeting_count < ?
+    RETURNING meeting_count
+"""
+REFUND_MEETING = "UPDATE user_sessions SET meeting_count = MAX(meeting_count - 1, 0) WHERE session_id = ?"
+
+def admit_meeting(session_id, limit):
+    """Atomically takes one meeting of the session's quota. Returns the new count, or None at the limit."""
+    with get_pool().connection() as conn:
+        rows = conn.execute(ADMIT_MEETING, (session_id, limit)).fetchall()
+    return rows[0][0] if rows else None
 
-    cursor.execute("UPDATE user_sessions SET meeting_count = meeting_count + 1 WHERE session_id = ?", (session_id,))
-    conn.commit()
-    conn.close()
+def get_meeting_count(session_id):
+    """Returns the number of meetings the session has held (0 for an unknown session)."""
+    with get_pool().connection() as conn:
+        row = conn.execute("SELECT meeting_count FROM user_sessions WHERE session_id = ?", (session_id,)).fetchone()
+    return row[0] if row else 0
+
+# Insert statements shared by the synchronous helpers below and the write-behind queue
+INSERT_EXPERT_SELECTION = """
+    INSERT INTO expert_selections (session_id, user_input, selected_experts)
+    VALUES (?, ?, ?)
+"""
+# Signing up twice with the same email is a no-op rather than an error
+INSERT_WAITLIST = "INSERT OR IGNORE INTO waitlist (email, priority_access) VALUES (?, ?)"
 
 def save_expert_selection(session_id, user_input, experts_selected):
     """Save expert selection to the database."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO expert_selections (session_id, user_input, selected_experts)
-        VALUES (?, ?, ?)
-    """, (session_id, user_input, ", ".join(experts_selected)))
-    conn.commit()
-    conn.close()
+    with get_pool().connection() as conn:
+        conn.execute(INSERT_EXPERT_SELECTION, (session_id, user_input, ", ".join(experts_selected)))
 
 def save_waitlist(email: str, priority_access: bool = False):
     """Save a new waitlist entry with the user's email and priority access flag."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO waitlist (email, priority_access) VALUES (?, ?)", (email, int(priority_access)))
-        conn.commit()
+        with get_pool().connection() as conn:
+            conn.execute(INSERT_WAITLIST, (email, int(priority_access)))
     except Exception as e:
         print("Error saving waitlist entry:", e)
-    finally:
-        conn.close()
\ No newline at end of file
+
+
+# Meeting transcripts. A meeting's context, discussion, structured report and follow-ups are each
+# kept as a compressed blob: zstd when the zstandard package is installed (or TRANSCRIPT_COMPRESSION
+# asks for it), zlib otherwise. Every row records its codec, so rows written either way stay readable.
+# The text is indexed in the contentless meeting_transcripts_fts table. Removing a row from that
+# index needs the text it was indexed with, so save_transcript and add_followup decompress the old row
+# before they replace it.
+TRANSCRIPT_PAGE_SIZE = 20
+TITLE_LENGTH = 120
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+_zstandard = None
+_SEARCH_TERM_RE = re.compile(r"\w+")
+
+_TRANSCRIPT_SUMMARY = "t.id, t.meeting_id, t.session_id, t.title, t.experts, t.followup_count, t.created_at"
+_TRANSCRIPT_INDEXED = "id, codec, context, experts, discussion, followups"
+INSERT_TRANSCRIPT = """
+    INSERT INTO meeting_transcripts (meeting_id, session_id, title, experts, codec, context, discussion, report,
+                                     size, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    RETURNING id
+"""
+INDEX_TRANSCRIPT = """
+    INSERT INTO meeting_transcripts_fts (rowid, context, panel, discussion, followups) VALUES (?, ?, ?, ?, ?)
+"""
+UNINDEX_TRANSCRIPT = """
+    INSERT INTO meeting_transcripts_fts (meeting_transcripts_fts, rowid, context, panel, discussion, followups)
+    VALUES ('delete', ?, ?, ?, ?, ?)
+"""
+
+
+def _zstd():
+    global _zstandard
+    if _zstandard is None:
+        try:
+            import zstandard
+        except ImportError:
+            zstandard = False
+        _zstandard = zstandard
+    return _zstandard
+
+
+def transcript_codec():
+    """The codec new transcripts are compressed with: "zstd" or "zlib"."""
+    choice = settings.TRANSCRIPT_COMPRESSION
+    if choice == "zlib" or (choice == "auto" and not _zstd()):
+        return "zlib"
+    if not _zstd():
+        raise RuntimeError("TRANSCRIPT_COMPRESSION=zstd needs the zstandard package")
+    return "zstd"
+
+
+def compress_text(text, codec):
+    data = text.encode("utf-8")
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress_text(blob, codec):
+    if codec == "zstd":
+        if not _zstd():
+            raise RuntimeError("This transcript is zstd-compressed; install the zstandard package to read it")
+        data = _zstd().ZstdDecompressor().decompress(blob)
+    else:
+        data = zlib.decompress(blob)
+    return data.decode("utf-8")
+
+
+def _context_text(context):
+    return "\n".join(f"{field}: {value}" for field, value in context.items() if value)
+
+
+def _followups_text(followups):
+    return "\n".join(f"{followup['question']}\n{followup['answer']}" for followup in followups)
+
+
+def _unindex(conn, row):
+    """Removes a meeting_transcripts row, selected as _TRANSCRIPT_INDEXED, from the full-text index."""
+    row_id, codec, context, panel, discussion, followups = row
+    followups = json.loads(decompress_text(followups, codec)) if followups else []
+    conn.execute(UNINDEX_TRANSCRIPT, (row_id, _context_text(json.loads(decompress_text(context, codec))), panel,
+                                      decompress_text(discussion, codec), _followups_text(followups)))
+
+
+def save_transcript(session_id, meeting_id, context, experts, discussion, report=None):
+    """
+    Stores a finished meeting and indexes its text; returns the transcript's ID. `discussion` is the
+    meeting text (MeetingReport.to_text() for a structured meeting, whose to_dict() goes in `report`).
+    Saving a meeting_id again replaces that transcript, follow-ups included.
+    """
+    codec = transcript_codec()
+    context_json = json.dumps(context, ensure_ascii=False)
+    report_json = json.dumps(report, ensure_ascii=False) if report is not None else None
+    panel = ", ".join(experts)
+    title = (context.get("problem") or discussion)[:TITLE_LENGTH]
+    size = sum(len(text.encode("utf-8")) for text in (context_json, discussion, report_json or ""))
+    now = time.time()
+    with transaction() as conn:
+        old = conn.execute(f"SELECT {_TRANSCRIPT_INDEXED} FROM meeting_transcripts WHERE meeting_id = ?",
+                           (meeting_id,)).fetchone()
+        if old is not None:
+            _unindex(conn, old)
+            conn.execute("DELETE FROM meeting_transcripts WHERE id = ?", (old[0],))
+        row_id = conn.execute(INSERT_TRANSCRIPT, (
+            meeting_id, session_id, title, panel, codec, compress_text(context_json, codec),
+            compress_text(discussion, codec), compress_text(report_json, codec) if report_json else None,
+            size, now, now)).fetchone()[0]
+        conn.execute(INDEX_TRANSCRIPT, (row_id, _context_text(context), panel, discussion, ""))
+    return row_id
+
+
+def add_followup(meeting_id, question, answer, role=None):
+    """Appends a follow-up question and its answer to a stored meeting; False if there is none."""
+    with transaction() as conn:
+        row = conn.execute(f"SELECT {_TRANSCRIPT_INDEXED} FROM meeting_transcripts WHERE meeting_id = ?",
+                           (meeting_id,)).fetchone()
+        if row is None:
+            return False
+        row_id, codec, context, panel, discussion, followups = row
+        followups = json.loads(decompress_text(followups, codec)) if followups else []
+        _unindex(conn, row)
+        followups.append({"question": question, "answer": answer, "role": role})
+        followups_json = json.dumps(followups, ensure_ascii=False)
+        added = len(json.dumps(followups[-1], ensure_ascii=False).encode("utf-8"))
+        conn.execute("""
+            UPDATE meeting_transcripts
+            SET followups = ?, followup_count = ?, size = size + ?, updated_at = ?
+            WHERE id = ?
+        """, (compress_text(followups_json, codec), len(followups), added, time.time(), row_id))
+        conn.execute(INDEX_TRANSCRIPT, (row_id, _context_text(json.loads(decompress_text(context, codec))), panel,
+                                        decompress_text(discussion, codec), _followups_text(followups)))
+    return True
+
+
+def _transcript_summary(row):
+    row_id, meeting_id, session_id, title, experts, followup_count, created_at = row
+    return {"id": row_id, "meeting_id": meeting_id, "session_id": session_id, "title": title,
+            "experts": experts.split(", ") if experts else [], "followup_count": followup_count,
+            "created_at": created_at}
+
+
+def get_transcript(meeting_id, parts=("context", "discussion", "report", "followups")):
+    """
+    A stored meeting as a dict: its summary fields plus the requested parts, or None. Only the blobs
+    of the requested parts are read and decompressed.
+    """
+    blobs = "".join(f", t.{part}" for part in parts)
+    with get_pool().connection() as conn:
+        row = conn.execute(f"SELECT {_TRANSCRIPT_SUMMARY}, t.codec{blobs} FROM meeting_transcripts t "
+                           "WHERE t.meeting_id = ?", (meeting_id,)).fetchone()
+    if row is None:
+        return None
+    transcript = _transcript_summary(row[:7])
+    codec = row[7]
+    for part, blob in zip(parts, row[8:]):
+        if part == "discussion":
+            transcript[part] = decompress_text(blob, codec)
+        else:
+            transcript[part] = json.loads(decompress_text(blob, codec)) if blob else None
+    if "followups" in transcript and transcript["followups"] is None:
+        transcript["followups"] = []
+    return transcript
+
+
+def latest_transcript(session_id, parts=("context", "discussion", "report", "followups")):
+    """The session's most recent stored meeting (see get_transcript), or None."""
+    with get_pool().connection() as conn:
+        row = conn.execute("SELECT meeting_id FROM meeting_transcripts WHERE session_id = ? ORDER BY id DESC LIMIT 1",
+                           (session_id,)).fetchone()
+    return get_transcript(row[0], parts) if row else None
+
+
+def transcript_query(text):
+    """Turns free text into an FTS5 query matching meetings that contain every word; None if there are none."""
+    terms = _SEARCH_TERM_RE.findall(text)
+    return " ".join(f'"{term}"' for term in terms) or None
+
+
+def _transcript_page(conn, sql, params, limit):
+    rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+    results = [_transcript_summary(row) for row in rows[:limit]]
+    return results, (results[-1]["id"] if len(rows) > limit else None)
+
+
+def list_transcripts(session_id, before=None, limit=TRANSCRIPT_PAGE_SIZE):
+    """
+    One page of the session's stored meetings, newest first, as (summaries, cursor). Pass the cursor
+    back as `before` for the next page; it is None on the last one.
+    """
+    sql = f"SELECT {_TRANSCRIPT_SUMMARY} FROM meeting_transcripts t WHERE t.session_id = ?"
+    params = [session_id]
+    if before is not None:
+        sql += " AND t.id < ?"
+        params.append(before)
+    with get_pool().connection() as conn:
+        return _transcript_page(conn, sql + " ORDER BY t.id DESC LIMIT ?", params, limit)
+
+
+def search_transcripts(text, session_id=None, before=None, limit=TRANSCRIPT_PAGE_SIZE):
+    """
+    One page of the stored meetings whose context, panel, discussion or follow-ups contain every word
+    of `text`, newest first, as (summaries, cursor) like list_transcripts. `session_id` limits the
+    search to one session. Pages are keyed on the transcript ID rather than an offset, so a deep page
+    costs the same as the first one.
+    """
+    query = transcript_query(text)
+    if query is None:
+        return [], None
+    if session_id is None:
+        # Walks the index's matches newest first; FTS5 serves "rowid < ? ORDER BY rowid DESC" itself
+        key = "f.rowid"
+        sql = (f"SELECT {_TRANSCRIPT_SUMMARY} FROM meeting_transcripts_fts f "
+               "JOIN meeting_transcripts t ON t.id = f.rowid WHERE f.meeting_transcripts_fts MATCH ?")
+        params = [query]
+    else:
+        # A session holds few meetings: walk them and look each one up in the index
+        key = "t.id"
+        sql = (f"SELECT {_TRANSCRIPT_SUMMARY} FROM meeting_transcripts t "
+               "CROSS JOIN meeting_transcripts_fts f ON f.rowid = t.id "
+               "WHERE t.session_id = ? AND f.meeting_transcripts_fts MATCH ?")
+        params = [session_id, query]
+    if before is not None:
+        sql += f" AND {key} < ?"
+        params.append(before)
+    with get_pool().connection() as conn:
+        return _transcript_page(conn, sql + f" ORDER BY {key} DESC LIMIT ?", params, limit)
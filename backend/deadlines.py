@@ -0,0 +1,223 @@
+# backend/deadlines.py
+"""
+Per-meeting deadlines and cancellation for model calls.
+
+The UI, the job workers and batch mode open a scope() around each meeting (MEETING_DEADLINE
+seconds). The scope lives in a contextvar, so it reaches every model call made under it,
+including the expert turns that ai_processing fans out to threads with copy_context():
+  * backend/llm_client.py caps each request's timeout at the time left, and checks the deadline
+    between streamed chunks. A stream past its deadline, or one that is cancelled, closes its HTTP
+    response, so the provider stops generating.
+  * backend/resilience.py does not queue for rate-limit capacity or back off before a retry
+    beyond the deadline. A cancelled call wakes from those waits at once.
+  * cancel() stops a meeting nobody is waiting for any more, e.g. a job whose page went away
+    (backend/jobs.py). Callbacks registered with on_cancel() run at that moment, so in-flight
+    responses are closed rather than read to the end.
+  * A streamed call shared by several meetings runs under a Deadline of its own (context_for()).
+    Each meeting checks its own deadline between chunks, and the shared call is only closed
+    when the last one stops reading.
+Past its deadline a call raises DeadlineExceeded; once cancelled it raises Cancelled. Without a
+scope, nothing changes: calls keep only their model tier's timeout.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from config import settings
+
+MEETING_DEADLINE = settings.MEETING_DEADLINE
+
+
+class DeadlineExceeded(TimeoutError):
+    """The meeting ran out of time; the message is fit to show a user."""
+
+    def __init__(self, message="The meeting took too long to generate; please try again."):
+        super().__init__(message)
+
+
+class Cancelled(Exception):
+    """The meeting was cancelled, e.g. because nobody is waiting for it any more."""
+
+
+class Deadline:
+    """An absolute expiry time (None for none) and a cancellation flag, shared by every call under a scope."""
+
+    def __init__(self, seconds=None, parent=None):
+        expires = time.monotonic() + seconds if seconds else None
+        if parent is not None and parent.expires is not None:
+            expires = parent.expires if expires is None else min(expires, parent.expires)
+        self.expires = expires
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def remaining(self):
+        """Seconds left, or None when there is no expiry."""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="The meeting was cancelled."):
+        """Cancels every call under this deadline and runs its on_cancel callbacks."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def check(self):
+        """Raises Cancelled or DeadlineExceeded when calls under this deadline must stop."""
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+        if self.expires is not None and time.monotonic() >= self.expires:
+            raise DeadlineExceeded()
+
+    def wait(self, seconds):
+        """Sleeps for seconds; raises at once if the deadline passes first or the call is cancelled."""
+        remaining = self.remaining()
+        if remaining is not None and seconds > remaining:
+            self._event.wait(remaining)
+            self.check()
+            # Woken at the deadline
+            raise DeadlineExceeded()
+        self._event.wait(seconds)
+        self.check()
+
+    def add_callback(self, callback):
+        """Runs callback when this deadline is cancelled, or at once if it already is."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+
+def current():
+    """The Deadline of the innermost scope(), or None."""
+    return _current.get()
+
+
+@contextmanager
+def scope(seconds=MEETING_DEADLINE):
+    """
+    Runs the block under a deadline `seconds` from now (0 or None for none), yielding its Deadline.
+    Inside another scope the earlier expiry wins, and cancelling the outer scope cancels this one.
+    """
+    parent = _current.get()
+    deadline = Deadline(seconds, parent)
+    if parent is not None:
+        parent.add_callback(deadline.cancel)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # A generator closed from another context; just restore the parent there
+            _current.set(parent)
+        if parent is not None:
+            parent.remove_callback(deadline.cancel)
+
+
+def context_for(deadline):
+    """
+    A copy of the current context with `deadline` in place of the current one, for work that
+    outlives any single caller, e.g. a model call shared by several meetings (backend/singleflight.py).
+    """
+    context = contextvars.copy_context()
+    context.run(_current.set, deadline)
+    return context
+
+
+def remaining():
+    """Seconds left under the current deadline, or None."""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def check():
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def stopped():
+    """Whether calls under the current deadline must stop: it has passed or it was cancelled."""
+    deadline = _current.get()
+    if deadline is None:
+        return False
+    left = deadline.remaining()
+    return deadline.cancelled or left == 0.0
+
+
+def timeout(limit=None):
+    """The request timeout to use: limit capped at the time left. Raises when there is none left."""
+    deadline = _current.get()
+    if deadline is None:
+        return limit
+    deadline.check()
+    left = deadline.remaining()
+    if left is None:
+        return limit
+    return left if limit is None else min(limit, left)
+
+
+def sleep(seconds):
+    """time.sleep() that honours the current deadline and wakes when the call is cancelled."""
+    deadline = _current.get()
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.wait(seconds)
+
+
+async def asleep(seconds):
+    """Async counterpart of sleep(); a cancellation is noticed when the sleep ends."""
+    import asyncio
+
+    deadline = _current.get()
+    if deadline is None:
+        await asyncio.sleep(seconds)
+        return
+    left = deadline.remaining()
+    await asyncio.sleep(seconds if left is None else min(seconds, left))
+    deadline.check()
+    if left is not None and seconds > left:
+        raise DeadlineExceeded()
+
+
+@contextmanager
+def on_cancel(callback):
+    """Runs callback (e.g. closing a response) if the current deadline is cancelled during the block."""
+    deadline = _current.get()
+    if deadline is None:
+        yield
+        return
+    deadline.add_callback(callback)
+    try:
+        yield
+    finally:
+        deadline.remove_callback(callback)
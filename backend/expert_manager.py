@@ -1,20 +1,13 @@
 # backend/expert_manager.py
-import os
-from openai import OpenAI
-import logging
+import re
+import threading
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-# Ensure the logs directory exists
-os.makedirs("logs", exist_ok=True)
-
-logging.basicConfig(filename="logs/expert_selection.log", level=logging.INFO, format="%(asctime)s - %(message)s")
-
-# Retrieve the OpenAI API key from environment variables
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in the environment!")
+from backend import llm_client, tracing
+from backend.database import DB_NAME
+from backend.expert_scorer import CONFIDENCE_THRESHOLD, ExpertScorer, load_history
+from backend.prompts import PromptTemplate
+from backend.similarity_index import find_similar_panel
+from config import settings
 
 EXPERT_CATEGORIES = [
     "Business Strategy Expert",
@@ -28,40 +21,129 @@ EXPERT_CATEGORIES = [
     "Industry-Specific Advisor"
 ]
 
+def _log():
+    # Expert selections are logged to logs/expert_selection.log; the file is opened on first use
+    return settings.get_file_logger("expert_selection", "expert_selection.log")
+
+
+DEFAULT_EXPERTS = ["Business Strategy Expert", "Financial Expert", "Technical Expert"]
+
+# Leading list markers the model likes to add ("1.", "-", "*")
+_LIST_MARKER_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_scorer():
+    """Returns the local expert scorer, tuned from the expert_selections history on first use."""
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                scorer = ExpertScorer(EXPERT_CATEGORIES)
+                learned_from = scorer.tune(load_history(DB_NAME))
+                _log().info(f"Expert scorer tuned from {learned_from} past selections")
+                _scorer = scorer
+    return _scorer
+
+
 def select_experts(user_context):
     """
-    Uses OpenAI to determine the most relevant experts for the user's situation.
+    Determines the most relevant experts for the user's situation.
+    The local scorer answers when it is confident enough; otherwise OpenAI picks the panel.
     Ensures at least 3 experts are selected.
     """
-    prompt = f"""
-Based on the following business context:
-{user_context}
+    with tracing.span("select_experts"):
+        ranked, experts = _select_locally(user_context)
+        if experts:
+            return experts
+        try:
+            experts_text = llm_client.complete(SELECTION_PROMPT.render(user_context),
+                                               call_site="select_experts")
+            tracing.annotate(source="model")
+            return _finalize_selection(user_context, experts_text, ranked)
+        except Exception as e:
+            _log().error(f"Error selecting experts: {e}")
+            tracing.annotate(source="fallback", error=type(e).__name__)
+            # Fallback: Use the local ranking (or a default set) if the OpenAI call fails
+            return _pad_experts(ranked[:3], []) if ranked else list(DEFAULT_EXPERTS)
+
+
+async def select_experts_async(user_context):
+    """Async counterpart of select_experts, built on the shared async client."""
+    with tracing.span("select_experts"):
+        ranked, experts = _select_locally(user_context)
+        if experts:
+            return experts
+        try:
+            experts_text = await llm_client.acomplete(SELECTION_PROMPT.render(user_context),
+                                                      call_site="select_experts")
+            tracing.annotate(source="model")
+            return _finalize_selection(user_context, experts_text, ranked)
+        except Exception as e:
+            _log().error(f"Error selecting experts: {e}")
+            tracing.annotate(source="fallback", error=type(e).__name__)
+            return _pad_experts(ranked[:3], []) if ranked else list(DEFAULT_EXPERTS)
 
-Please select between 3 to 5 experts from the following categories that would be most helpful:
+
+def _select_locally(user_context):
+    """
+    Reuses the panel of a near-duplicate past context when there is one, else runs the local scorer.
+    Returns (ranking, experts): the scorer's pick, which is kept for padding, and the same pick, or
+    an empty list when the confidence is below CONFIDENCE_THRESHOLD and the model should decide
+    instead.
+    """
+    similar = find_similar_panel(user_context, DB_NAME)
+    if similar:
+        tracing.annotate(source="similar")
+        return similar, similar
+    experts, confidence = get_scorer().select(user_context)
+    tracing.annotate(confidence=round(confidence, 3))
+    if confidence < CONFIDENCE_THRESHOLD:
+        _log().info(f"Local expert scorer confidence {confidence:.2f} below threshold, asking the model")
+        return experts, []
+    _log().info(f"User Context: {user_context}")
+    _log().info(f"Selected Experts (local, confidence {confidence:.2f}): {experts}")
+    tracing.annotate(source="scorer")
+    return experts, experts
+
+
+# The category list is static, so it sits in the cached system prefix; only the context varies
+SELECTION_PROMPT = PromptTemplate("select_experts", system=f"""
+Please select between 3 to 5 experts from the following categories that would be most helpful for the business context in the next message:
 {", ".join(EXPERT_CATEGORIES)}
 
 Return only a list of expert roles, one per line.
-"""
-    try:
-        response = client.chat.completions.create(model="gpt-4",
-        messages=[{"role": "system", "content": prompt}])
-        experts_text = response.choices[0].message.content
-        experts = [line.strip() for line in experts_text.splitlines() if line.strip() in EXPERT_CATEGORIES]
-
-        # Fallback: Ensure at least 3 experts are selected
-        while len(experts) < 3:
-            for expert in EXPERT_CATEGORIES:
-                if expert not in experts:
-                    experts.append(expert)
-                    if len(experts) >= 3:
-                        break
-
-        # Log expert selection
-        logging.info(f"User Context: {user_context}")
-        logging.info(f"Selected Experts: {experts}")
-
-        return experts
-    except Exception as e:
-        logging.error(f"Error selecting experts: {e}")
-        # Fallback: Return a default set of experts if OpenAI call fails
-        return ["Business Strategy Expert", "Financial Expert", "Technical Expert"]
\ No newline at end of file
+""", user="""
+Based on the following business context:
+{context}
+""")
+
+
+def _pad_experts(experts, ranked):
+    """Pads the panel to at least 3 experts, preferring the local ranking over list order."""
+    for expert in list(ranked) + EXPERT_CATEGORIES:
+        if len(experts) >= 3:
+            break
+        if expert not in experts:
+            experts.append(expert)
+    return experts
+
+
+def _finalize_selection(user_context, experts_text, ranked=()):
+    """Parses the model's reply into known expert roles, padding to at least 3, and logs the result."""
+    experts = []
+    for line in experts_text.splitlines():
+        name = _LIST_MARKER_RE.sub("", line).strip().strip("*").strip()
+        if name in EXPERT_CATEGORIES and name not in experts:
+            experts.append(name)
+
+    # Fallback: Ensure at least 3 experts are selected
+    experts = _pad_experts(experts, ranked)
+
+    # Log expert selection
+    _log().info(f"User Context: {user_context}")
+    _log().info(f"Selected Experts: {experts}")
+
+    return experts
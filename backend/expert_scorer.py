@@ -0,0 +1,223 @@
+# backend/expert_scorer.py
+"""
+In-process expert selector.
+
+Ranks the EXPERT_CATEGORIES against the Secretary's six context fields with weighted keyword
+matching, so most meetings can pick their panel locally instead of spending a model round trip.
+Seed keyword weights are hand-written below. tune() adds weights learned from past selections
+in the `expert_selections` table: a term's lift for a category, log(P(category | term) / P(category)).
+Every ranking comes with a confidence score. select_experts falls back to the model when the
+confidence is too low.
+"""
+import json
+import logging
+import math
+import re
+import sqlite3
+from collections import Counter, defaultdict
+
+from backend.database import get_pool
+from config import settings
+
+# Below this confidence select_experts asks the model instead
+CONFIDENCE_THRESHOLD = settings.EXPERT_SCORER_THRESHOLD
+# How many recent expert_selections rows tune() learns from
+TUNING_ROW_LIMIT = 20000
+# Terms seen in fewer past contexts than this are ignored when tuning
+TUNING_MIN_COUNT = 3
+
+# How much a keyword hit in each Secretary field counts towards a category
+FIELD_WEIGHTS = {
+    "problem": 1.0,
+    "objective": 0.8,
+    "constraints": 0.6,
+    "scenario": 0.5,
+    "persona": 0.4,
+    "geography": 0.3,
+}
+
+SEED_KEYWORDS = {
+    "Business Strategy Expert": {
+        "strategy": 2.0, "strategic": 2.0, "growth": 1.5, "expand": 1.5, "expansion": 1.5,
+        "compete": 1.2, "competitor": 1.2, "competition": 1.2, "pivot": 1.5, "market": 0.8,
+        "business": 0.5, "model": 0.8, "scale": 1.2, "acquisition": 1.2, "partnership": 1.0,
+    },
+    "Financial Expert": {
+        "budget": 1.5, "cash": 1.8, "cashflow": 2.0, "revenue": 1.5, "profit": 1.5, "cost": 1.2,
+        "price": 1.2, "pricing": 1.5, "loan": 2.0, "investor": 1.8, "investment": 1.8,
+        "funding": 2.0, "raise": 1.0, "capital": 1.8, "debt": 1.8, "margin": 1.5, "money": 1.2,
+        "financial": 2.0, "finance": 2.0, "valuation": 2.0, "tax": 1.0,
+    },
+    "Legal Consultant": {
+        "legal": 2.0, "law": 1.8, "lawsuit": 2.0, "contract": 1.8, "license": 1.5, "licensing": 1.5,
+        "regulation": 1.8, "regulatory": 1.8, "compliance": 1.8, "liability": 1.8, "permit": 1.5,
+        "trademark": 2.0, "patent": 2.0, "intellectual": 1.2, "lawyer": 2.0, "dispute": 1.5,
+        "incorporate": 1.2, "llc": 1.5, "tax": 0.6,
+    },
+    "Technical Expert": {
+        "software": 2.0, "app": 1.8, "website": 1.5, "platform": 1.2, "technology": 1.8,
+        "tech": 1.5, "technical": 2.0, "data": 1.0, "ai": 1.5, "automation": 1.5, "automate": 1.5,
+        "system": 1.0, "develop": 1.2, "developer": 1.8, "engineering": 1.5, "cloud": 1.8,
+        "security": 1.2, "digital": 1.0, "online": 0.8, "ecommerce": 1.2,
+    },
+    "Marketing Specialist": {
+        "marketing": 2.0, "brand": 1.8, "branding": 1.8, "customer": 1.2, "customers": 1.2,
+        "advertising": 1.8, "ads": 1.5, "social": 1.2, "media": 1.0, "campaign": 1.5,
+        "sales": 1.2, "audience": 1.5, "engagement": 1.5, "awareness": 1.5, "seo": 1.8,
+        "promotion": 1.5, "launch": 1.0, "acquire": 0.8, "retention": 1.2,
+    },
+    "Project Manager": {
+        "project": 1.8, "deadline": 1.8, "timeline": 1.8, "schedule": 1.5, "milestone": 1.8,
+        "deliver": 1.2, "delivery": 1.2, "plan": 1.0, "planning": 1.2, "coordinate": 1.5,
+        "execution": 1.2, "scope": 1.5, "roadmap": 1.5, "launch": 0.8,
+    },
+    "Operations Consultant": {
+        "operations": 2.0, "operational": 2.0, "process": 1.5, "efficiency": 1.8, "supply": 1.8,
+        "inventory": 1.8, "logistics": 2.0, "staff": 1.2, "staffing": 1.5, "vendor": 1.5,
+        "supplier": 1.8, "workflow": 1.5, "production": 1.5, "manufacturing": 1.8,
+        "warehouse": 1.8, "quality": 1.0, "capacity": 1.5,
+    },
+    "Leadership Coach": {
+        "leadership": 2.0, "leader": 1.5, "team": 1.2, "employee": 1.2, "employees": 1.2,
+        "hire": 1.2, "hiring": 1.2, "culture": 1.8, "conflict": 1.5, "cofounder": 1.8,
+        "partner": 0.8, "motivation": 1.5, "morale": 1.8, "burnout": 1.8, "manage": 1.0,
+        "management": 1.0, "delegate": 1.5, "founder": 0.6,
+    },
+    "Industry-Specific Advisor": {
+        "restaurant": 1.8, "retail": 1.5, "healthcare": 1.8, "clinic": 1.5, "farm": 1.8,
+        "agriculture": 1.8, "construction": 1.8, "real": 0.6, "estate": 1.2, "hospitality": 1.8,
+        "education": 1.5, "school": 1.2, "fashion": 1.5, "food": 1.2, "beauty": 1.5,
+        "salon": 1.8, "fitness": 1.5, "industry": 1.5, "niche": 1.0, "nonprofit": 1.5,
+    },
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _context_fields(user_context):
+    """Returns the context as a field -> text dict; a plain string is treated as the problem."""
+    if isinstance(user_context, dict):
+        return {field: str(value) for field, value in user_context.items() if value}
+    if isinstance(user_context, str):
+        try:
+            parsed = json.loads(user_context)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict):
+            return {field: str(value) for field, value in parsed.items() if value}
+        return {"problem": user_context}
+    return {"problem": str(user_context)}
+
+
+class ExpertScorer:
+    """Keyword-weighted ranking of expert categories with a confidence score."""
+
+    def __init__(self, categories, keywords=SEED_KEYWORDS, field_weights=FIELD_WEIGHTS):
+        self.categories = list(categories)
+        self.field_weights = dict(field_weights)
+        self.seed_keywords = keywords
+        self._index = {}
+        self._build_index({})
+
+    def _build_index(self, learned):
+        # term -> [(category position, weight)], so scoring is one dict lookup per token
+        index = defaultdict(list)
+        for position, category in enumerate(self.categories):
+            weights = dict(self.seed_keywords.get(category, {}))
+            for term, weight in learned.get(category, {}).items():
+                weights[term] = weights.get(term, 0.0) + weight
+            for term, weight in weights.items():
+                if weight > 0:
+                    index[term].append((position, weight))
+        self._index = dict(index)
+
+    def rank(self, user_context):
+        """
+        Scores every category against the context.
+        Returns (ranked categories with positive scores, their scores, number of keyword hits).
+        """
+        scores = [0.0] * len(self.categories)
+        hits = 0
+        for field, text in _context_fields(user_context).items():
+            field_weight = self.field_weights.get(field, 0.3)
+            for token in _tokens(text):
+                postings = self._index.get(token)
+                if postings is None and token.endswith("s"):
+                    postings = self._index.get(token[:-1])
+                if postings:
+                    hits += 1
+                    for position, weight in postings:
+                        scores[position] += field_weight * weight
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        ranked = [self.categories[i] for i in order if scores[i] > 0]
+        return ranked, [scores[i] for i in order if scores[i] > 0], hits
+
+    def select(self, user_context, min_experts=3, max_experts=5):
+        """
+        Picks 3-5 experts for the context.
+        Returns (experts, confidence). The confidence is in [0, 1]. It grows with the amount of
+        keyword evidence and with the share of the total score the chosen panel accounts for.
+        """
+        ranked, scores, hits = self.rank(user_context)
+        if len(ranked) < min_experts:
+            return ranked, 0.0
+        # Keep every category scoring at least half the leader's score, within the panel size bounds
+        count = sum(1 for score in scores if score >= scores[0] / 2)
+        count = max(min_experts, min(max_experts, count))
+        share = sum(scores[:count]) / sum(scores)
+        coverage = min(1.0, hits / 6)
+        return ranked[:count], coverage * share
+
+    def tune(self, rows):
+        """
+        Learns extra keyword weights from past (user_input, selected_experts) rows.
+        Weights are rebuilt from scratch on each call, so tuning is repeatable.
+        """
+        term_counts = Counter()
+        pair_counts = defaultdict(Counter)
+        category_counts = Counter()
+        total = 0
+        for user_input, selected in rows:
+            experts = [name.strip() for name in (selected or "").split(",") if name.strip() in self.categories]
+            if not experts:
+                continue
+            total += 1
+            terms = set()
+            for text in _context_fields(user_input).values():
+                terms.update(_tokens(text))
+            term_counts.update(terms)
+            for expert in experts:
+                category_counts[expert] += 1
+                pair_counts[expert].update(terms)
+        learned = {}
+        for category in self.categories:
+            prior = category_counts[category] / total if total else 0.0
+            if not prior:
+                continue
+            weights = {}
+            for term, count in pair_counts[category].items():
+                if term_counts[term] < TUNING_MIN_COUNT:
+                    continue
+                lift = math.log((count / term_counts[term]) / prior)
+                if lift > 0:
+                    weights[term] = lift
+            learned[category] = weights
+        self._build_index(learned)
+        return total
+
+
+def load_history(db_path, limit=TUNING_ROW_LIMIT):
+    """Reads the most recent expert_selections rows as (user_input, selected_experts) pairs."""
+    try:
+        with get_pool(db_path).connection() as conn:
+            return conn.execute("""
+                SELECT user_input, selected_experts FROM expert_selections
+                ORDER BY id DESC LIMIT ?
+            """, (limit,)).fetchall()
+    except sqlite3.OperationalError as e:
+        logging.warning(f"Could not load expert selection history: {e}")
+        return []
@@ -0,0 +1,297 @@
+# backend/fake_llm.py
+"""
+Offline stand-in for the OpenAI chat completions API.
+
+Serves POST /v1/chat/completions (blocking and streamed) from a local HTTP server. Replies are
+canned and shaped like the real ones for each call site, so the whole app can run without
+credentials or network access. Latency, token rate and failures are configurable, which makes
+the server usable for reproducible benchmarks and load tests:
+
+    python -m backend.fake_llm --port 8600 --latency 0.3 --tokens-per-second 80 --failure-rate 0.05
+
+and point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8600/v1 OPENAI_API_KEY=sk-fake.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_EXPERT_RE = re.compile(r"You are the (.+?) on a panel")
+
+_SELECTION_REPLY = "Business Strategy Expert\nFinancial Expert\nMarketing Specialist"
+
+_TURN_REPLY = (
+    "This looks like a strategic decision. Cash runway and customer demand should drive the choice; "
+    "similar businesses that tested demand cheaply before committing capital recovered faster."
+)
+
+_RESOLUTIONS_REPLY = """Meeting Resolutions:
+"Here are our recommendations for approaches to help you achieve your goal:
+   1. Focus on your most profitable customer segment
+   2. Partner with a complementary local business
+   3. Pilot a low-cost digital channel
+
+Here are our analysis of each choice and the additional insights you need to help you make the best decision."
+
+Preferred option: Focus on your most profitable customer segment, because it needs the least capital and shows results within one quarter.
+"""
+
+_DISCUSSION_REPLY = (
+    "Business Strategy Expert: This is a strategic decision; start from where you can win.\n"
+    "Financial Expert: Protect cash flow first and stage every investment.\n"
+    "Marketing Specialist: Double down on the customers who already love you.\n\n"
+    + _RESOLUTIONS_REPLY
+)
+
+_RESOLUTION_DOCUMENT = {
+    "decision_type": "strategic",
+    "options": [
+        {"title": "Focus on your most profitable customer segment",
+         "description": "Concentrate sales and service on the customers with the best margins.",
+         "upside": "Needs the least capital and shows results within one quarter.",
+         "downside": "Revenue from other segments may shrink.",
+         "fails_if": "The segment turns out to be too small to grow into.", "impact": "high", "risk": "low"},
+        {"title": "Partner with a complementary local business",
+         "description": "Share customers and costs with a business that serves the same people.",
+         "upside": "Reaches new customers without new fixed costs.",
+         "downside": "Depends on a partner you do not control.",
+         "fails_if": "The partner's customers do not overlap with yours.", "impact": "high", "risk": "high"},
+        {"title": "Pilot a low-cost digital channel",
+         "description": "Test online ordering with a small budget before scaling it.",
+         "upside": "Cheap to try and easy to stop.",
+         "downside": "Small pilots rarely move revenue on their own.",
+         "fails_if": "Customers keep buying only in person.", "impact": "low", "risk": "low"},
+    ],
+    "preferred_option": "Focus on your most profitable customer segment",
+    "recommendation": "Start with the segment focus: it is reversible and its results show within one quarter.",
+}
+
+_RESOLUTION_JSON = json.dumps(_RESOLUTION_DOCUMENT)
+
+_REPORT_JSON = json.dumps({
+    "turns": [
+        {"expert": "Business Strategy Expert", "text": "This is a strategic decision; start from where you can win."},
+        {"expert": "Financial Expert", "text": "Protect cash flow first and stage every investment."},
+        {"expert": "Marketing Specialist", "text": "Double down on the customers who already love you."},
+    ],
+    **_RESOLUTION_DOCUMENT,
+})
+
+_FOLLOWUP_REPLY = "Financial Expert: Start with the option you can reverse cheaply, and review it after 90 days."
+
+
+def canned_reply(messages):
+    """Picks a reply shaped like what the real model returns for the prompt's call site."""
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    if "Please select between 3 to 5 experts" in prompt:
+        return _SELECTION_REPLY
+    if "Extract the following fields" in prompt:
+        return "{}"
+    if "Return the meeting as a JSON object" in prompt:
+        return _REPORT_JSON
+    if "return the final meeting conclusion as a JSON object" in prompt:
+        return _RESOLUTION_JSON
+    match = _EXPERT_RE.search(prompt)
+    if match:
+        return f"{_TURN_REPLY} ({match.group(1)})"
+    if "follow-up question" in prompt:
+        return _FOLLOWUP_REPLY
+    if "Each expert has already given their perspective" in prompt:
+        return _RESOLUTIONS_REPLY
+    return _DISCUSSION_REPLY
+
+
+def _tokens(text):
+    # Roughly one token per word plus its trailing whitespace, which is close enough for timing
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class FakeLLMConfig:
+    """Behaviour knobs shared by every request the server handles."""
+
+    def __init__(self, latency=0.0, tokens_per_second=0.0, failure_rate=0.0, failure_status=500,
+                 seed=None, reply=canned_reply, model_latency=None, slow_rate=0.0, slow_latency=0.0):
+        self.latency = latency
+        # Per-model latency overriding `latency`, e.g. {"gpt-4": 0.8, "gpt-4o-mini": 0.1}
+        self.model_latency = dict(model_latency or {})
+        # A fraction of requests stalls this much longer, giving the latency a tail
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.reply = reply
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.stalls = 0
+
+    def latency_for(self, model):
+        return self.model_latency.get(model, self.latency)
+
+    def stall(self):
+        """Extra seconds this request waits: slow_latency for a slow_rate fraction of requests."""
+        if not self.slow_rate:
+            return 0.0
+        with self._lock:
+            slow = self._random.random() < self.slow_rate
+            self.stalls += slow
+        return self.slow_latency if slow else 0.0
+
+    def should_fail(self):
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+            return fail
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes on a kept-alive connection. With Nagle on, the body
+    # waits for the client's delayed ACK, which adds ~40 ms to every request after the first.
+    disable_nagle_algorithm = True
+    config = FakeLLMConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up, e.g. a stream cancelled at its deadline (backend/deadlines.py)
+            pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        config = self.config
+        latency = config.latency_for(request.get("model")) + config.stall()
+        if latency:
+            time.sleep(latency)
+        if config.should_fail():
+            status = config.failure_status
+            self._send_json(status, {"error": {"message": "Injected failure", "type": "fake_llm_error",
+                                               "code": str(status)}})
+            return
+        messages = request.get("messages", [])
+        text = config.reply(messages)
+        tokens = _tokens(text)
+        prompt_tokens = sum(len(_tokens(str(m.get("content", "")))) for m in messages)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.get("model", "gpt-4")
+        delay = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+        if request.get("stream"):
+            include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                     "total_tokens": prompt_tokens + len(tokens)}
+            self._stream(completion_id, model, tokens, delay, usage if include_usage else None)
+            return
+        if delay:
+            time.sleep(delay * len(tokens))
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                      "total_tokens": prompt_tokens + len(tokens)},
+        })
+
+    def _stream(self, completion_id, model, tokens, delay, usage=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta, finish_reason=None):
+            return json.dumps({"id": completion_id, "object": "chat.completion.chunk",
+                               "created": int(time.time()), "model": model,
+                               "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]})
+
+        send(chunk({"role": "assistant", "content": ""}))
+        for token in tokens:
+            if delay:
+                time.sleep(delay)
+            send(chunk({"content": token}))
+        send(chunk({}, "stop"))
+        if usage:
+            # Like the real API, the usage chunk comes last and carries no choices
+            send(json.dumps({"id": completion_id, "object": "chat.completion.chunk",
+                             "created": int(time.time()), "model": model, "choices": [], "usage": usage}))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_server(host="127.0.0.1", port=0, config=None):
+    """
+    Starts the fake server on a daemon thread and returns (server, base_url).
+    Pass port=0 to pick a free port. Call server.shutdown() to stop it.
+    """
+    handler = type("FakeLLMHandler", (_Handler,), {"config": config or FakeLLMConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an offline OpenAI-compatible stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="0 sends everything at once")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--failure-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that stall")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="extra seconds a stalled request waits")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    config = FakeLLMConfig(args.latency, args.tokens_per_second, args.failure_rate, args.failure_status, args.seed,
+                           slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    server = ThreadingHTTPServer((args.host, args.port), type("FakeLLMHandler", (_Handler,), {"config": config}))
+    print(f"Fake LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+# backend/jobs.py
+"""
+Durable meeting jobs and the worker pool that runs them.
+
+The UI does not generate meetings inside the Streamlit script. It enqueues a job in the
+meeting_jobs table of the application database and polls it. Worker processes
+(python -m backend.jobs) run select_experts and the discussion, so a rerun or a widget interaction
+neither cancels nor repeats the work, and no server thread is held for the length of a meeting.
+  * enqueue() is deduplicated by session. While a session has a queued or running job, enqueuing
+    again returns that job, and says it queued nothing. A partial unique index enforces this
+    across processes.
+  * A worker claims the oldest queued job with one atomic UPDATE ... RETURNING, so two workers
+    never run the same job. While it runs, the worker writes the text streamed so far to the job's
+    progress every JOB_POLL_INTERVAL seconds. A heartbeat thread renews its lease every
+    LEASE_RENEW_INTERVAL for as long as the meeting runs, including a long expert selection or a
+    slow first chunk that produce no output.
+  * A job whose worker stopped reporting for JOB_LEASE_SECONDS (a crashed or killed worker) is
+    queued again, and fails after JOB_MAX_ATTEMPTS attempts.
+  * Each meeting runs under the meeting deadline (backend/deadlines.py). The UI records every poll
+    (poll()). When no page has polled a running job for JOB_ABANDON_SECONDS, the worker cancels its
+    model calls instead of paying for a meeting nobody will read.
+A pool started by the UI (ensure_workers(), JOB_AUTOSTART_WORKERS) is detached from it and keeps
+running after the UI exits; it logs to AUTOSTART_LOG under LOG_DIR. Stop it with SIGTERM, e.g.
+pkill -f "backend.jobs": running meetings are finished first.
+Jobs live in SQLite, so they survive UI restarts: a reloaded page finds its session's job with
+latest_job(). A meeting that fails before producing anything is refunded to the quota it was
+charged to (backend/admission.py).
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+
+from backend.database import get_pool, initialize_db
+from config import settings
+
+POLL_INTERVAL = settings.JOB_POLL_INTERVAL
+LEASE_SECONDS = settings.JOB_LEASE_SECONDS
+MAX_ATTEMPTS = settings.JOB_MAX_ATTEMPTS
+ABANDON_SECONDS = settings.JOB_ABANDON_SECONDS
+# A running job's lease is renewed this often, so a few missed renewals still keep it
+LEASE_RENEW_INTERVAL = LEASE_SECONDS / 4
+# Workers record that they are alive this often; the UI treats a silent pool as gone after 3 beats
+WORKER_HEARTBEAT = 5.0
+# The UI starts at most one pool per this many seconds
+AUTOSTART_COOLDOWN = 30.0
+# Where a pool started by the UI logs, under LOG_DIR
+AUTOSTART_LOG = "meeting_jobs.log"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_COLUMNS = "id, session_id, status, payload, progress, result, error, attempts"
+
+
+def _log():
+    return logging.getLogger("meeting_jobs")
+
+
+def _configure_logging(log_file=None):
+    if log_file:
+        # A pool started by the UI has no terminal to log to
+        settings.get_file_logger("meeting_jobs", log_file)
+    else:
+        logging.basicConfig(level=logging.INFO, format=settings.LOG_FORMAT)
+
+
+class LeaseLost(Exception):
+    """The job was given to another worker after this one stopped reporting."""
+
+
+@dataclass(slots=True)
+class Job:
+    id: int
+    session_id: str
+    status: str
+    payload: dict
+    progress: dict
+    result: dict = None
+    error: str = None
+    attempts: int = 0
+
+    @classmethod
+    def from_row(cls, row):
+        job_id, session_id, status, payload, progress, result, error, attempts = row
+        return cls(job_id, session_id, status, json.loads(payload), json.loads(progress) if progress else {},
+                   json.loads(result) if result else None, error, attempts)
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def quota_key(self):
+        """The key the meeting was charged to (see admission.quota_key)."""
+        return self.payload.get("quota_key") or self.session_id
+
+    @property
+    def meeting_id(self):
+        """The ID the meeting's transcript is stored under (see database.save_transcript)."""
+        return self.payload.get("meeting_id") or f"job-{self.id}"
+
+
+def enqueue(session_id, context, experts=None, engine=None, structured=False, meeting_id=None, quota_key=None):
+    """
+    Queues a meeting for session_id and returns (job ID, True). When the session already has a
+    queued or running job, nothing is queued and (that job's ID, False) is returned, so a caller
+    that charged a meeting for it can give it back.
+    """
+    payload = json.dumps({"context": context, "experts": experts, "engine": engine,
+                          "structured": structured, "meeting_id": meeting_id, "quota_key": quota_key})
+    with get_pool().transaction() as conn:
+        rows = conn.execute("""
+            INSERT OR IGNORE INTO meeting_jobs (session_id, payload, watched_at) VALUES (?, ?, ?) RETURNING id
+        """, (session_id, payload, time.time())).fetchall()
+        if rows:
+            return rows[0][0], True
+        return conn.execute("SELECT id FROM meeting_jobs WHERE session_id = ? AND status IN (?, ?)",
+                            (session_id, QUEUED, RUNNING)).fetchone()[0], False
+
+
+def get_job(job_id):
+    with get_pool().connection() as conn:
+        row = conn.execute(f"SELECT {_COLUMNS} FROM meeting_jobs WHERE id = ?", (job_id,)).fetchone()
+    return Job.from_row(row) if row else None
+
+
+def poll(job_id):
+    """get_job() for a page that is waiting on the job; the poll keeps the job from being abandoned."""
+    with get_pool().connection() as conn:
+        row = conn.execute(f"UPDATE meeting_jobs SET watched_at = ? WHERE id = ? RETURNING {_COLUMNS}",
+                           (time.time(), job_id)).fetchone()
+    return Job.from_row(row) if row else None
+
+
+def latest_job(session_id):
+    """The session's most recent job, or None."""
+    with get_pool().connection() as conn:
+        row = conn.execute(f"SELECT {_COLUMNS} FROM meeting_jobs WHERE session_id = ? ORDER BY id DESC LIMIT 1",
+                           (session_id,)).fetchone()
+    return Job.from_row(row) if row else None
+
+
+def _recover_stale(conn, now):
+    conn.execute("""
+        UPDATE meeting_jobs SET status = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+        WHERE status = ? AND heartbeat < ? AND attempts >= ?
+    """, (FAILED, "The worker running this meeting stopped", RUNNING, now - LEASE_SECONDS, MAX_ATTEMPTS))
+    conn.execute("UPDATE meeting_jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat < ?",
+                 (QUEUED, RUNNING, now - LEASE_SECONDS))
+
+
+def claim(worker_id):
+    """Takes the oldest queued job for worker_id and returns it, or None when the queue is empty."""
+    now = time.time()
+    with get_pool().transaction() as conn:
+        _recover_stale(conn, now)
+        row = conn.execute(f"""
+            UPDATE meeting_jobs SET status = ?, worker = ?, heartbeat = ?, attempts = attempts + 1, progress = NULL
+            WHERE id = (SELECT id FROM meeting_jobs WHERE status = ? ORDER BY id LIMIT 1)
+            RETURNING {_COLUMNS}
+        """, (RUNNING, worker_id, now, QUEUED)).fetchone()
+    return Job.from_row(row) if row else None
+
+
+def report_progress(job_id, worker_id, progress):
+    """
+    Stores the job's progress and renews the lease; raises LeaseLost when the job is no longer ours.
+    Returns when a page last polled the job (time.time()).
+    """
+    with get_pool().connection() as conn:
+        row = conn.execute("""
+            UPDATE meeting_jobs SET progress = ?, heartbeat = ? WHERE id = ? AND worker = ? AND status = ?
+            RETURNING watched_at
+        """, (json.dumps(progress), time.time(), job_id, worker_id, RUNNING)).fetchone()
+    if row is None:
+        raise LeaseLost(f"Job {job_id} is no longer held by {worker_id}")
+    return row[0]
+
+
+def renew_lease(job_id, worker_id):
+    """
+    Renews the lease without touching the progress; raises LeaseLost when the job is no longer ours.
+    Returns when a page last polled the job (time.time()).
+    """
+    with get_pool().connection() as conn:
+        row = conn.execute("""
+            UPDATE meeting_jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = ? RETURNING watched_at
+        """, (time.time(), job_id, worker_id, RUNNING)).fetchone()
+    if row is None:
+        raise LeaseLost(f"Job {job_id} is no longer held by {worker_id}")
+    return row[0]
+
+
+def finish(job_id, worker_id, result, error=None):
+    """Records the job's outcome; returns False when the job had already been given to another worker."""
+    with get_pool().connection() as conn:
+        return bool(conn.execute("""
+            UPDATE meeting_jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND worker = ? AND status = ?
+        """, (FAILED if error else DONE, json.dumps(result) if result is not None else None, error,
+              job_id, worker_id, RUNNING)).rowcount)
+
+
+class _Progress:
+    """
+    Collects a running meeting's output and writes it to the job at most every POLL_INTERVAL.
+    Used as a context manager, it also renews the job's lease from a heartbeat thread while the
+    meeting runs. Cancels the meeting's deadline once no page has polled the job for
+    ABANDON_SECONDS, or when the lease was lost to another worker.
+    """
+
+    def __init__(self, job, worker_id, deadline):
+        self.job = job
+        self.worker_id = worker_id
+        self.deadline = deadline
+        self.experts = None
+        self.parts = []
+        self.items = []
+        self._written = 0.0
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def __enter__(self):
+        self._heartbeat = threading.Thread(target=self._renew, name=f"meeting-job-{self.job.id}-lease", daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._heartbeat.join()
+
+    def _renew(self):
+        while not self._stop.wait(LEASE_RENEW_INTERVAL):
+            try:
+                self._check_watched(renew_lease(self.job.id, self.worker_id))
+            except LeaseLost as e:
+                # Another worker runs the job now; stop paying for this copy
+                self.deadline.cancel(str(e))
+                return
+            except Exception as e:
+                _log().error(f"Could not renew the lease of meeting job {self.job.id}: {e}")
+
+    def _check_watched(self, watched_at):
+        if ABANDON_SECONDS and watched_at and time.time() - watched_at > ABANDON_SECONDS:
+            self.deadline.cancel("Nobody is waiting for this meeting any more.")
+
+    def write(self, force=False):
+        now = time.monotonic()
+        if force or now - self._written >= POLL_INTERVAL:
+            progress = {"experts": self.experts, "text": "".join(self.parts), "items": self.items}
+            self._check_watched(report_progress(self.job.id, self.worker_id, progress))
+            self._written = now
+
+
+def run_job(job, worker_id):
+    """Generates one claimed meeting, streaming its progress into the job, and records the outcome."""
+    from backend import admission, deadlines, tracing
+    from backend.ai_processing import DISCUSSION_ERROR, stream_expert_discussion, stream_meeting_report
+    from backend.expert_manager import select_experts
+    from backend.logger import log_interaction, log_transcript
+    from backend.meeting_report import ExpertTurn, MeetingReport
+
+    payload = job.payload
+    refund = False
+    try:
+        with tracing.meeting(payload.get("meeting_id")), deadlines.scope() as deadline, \
+                _Progress(job, worker_id, deadline) as progress:
+            context = payload["context"]
+            experts = payload.get("experts") or select_experts(context)
+            # Selection history feeds the local expert scorer's tuning
+            log_interaction(job.session_id, json.dumps(context), experts)
+            progress.experts = experts
+            progress.write(force=True)
+            if payload.get("structured"):
+                report = MeetingReport(error="The meeting ended without a report.")
+                for event in stream_meeting_report(context, experts, payload.get("engine")):
+                    if isinstance(event, MeetingReport):
+                        report = event
+                        continue
+                    progress.items.append({"kind": "turn" if isinstance(event, ExpertTurn) else "option",
+                                           **event.to_dict()})
+                    progress.write()
+                result = {"experts": experts, "report": report.to_dict()}
+                error = report.error
+                refund = error is not None
+            else:
+                for chunk in stream_expert_discussion(context, experts, payload.get("engine")):
+                    progress.parts.append(chunk)
+                    progress.write()
+                discussion = "".join(progress.parts)
+                result = {"experts": experts, "discussion": discussion}
+                refund = discussion.startswith(DISCUSSION_ERROR)
+                error = discussion if refund else None
+            if deadline.cancelled:
+                # Stopped because its page went away; the text generated so far stays with the job
+                error, refund = deadline.reason, True
+    except LeaseLost as e:
+        _log().warning(str(e))
+        return
+    except Exception as e:
+        _log().exception(f"Meeting job {job.id} failed")
+        result, error, refund = None, f"{type(e).__name__}: {e}", True
+    if not finish(job.id, worker_id, result, error):
+        return
+    if refund:
+        # The user got no meeting, so it does not count against the quota
+        admission.refund(job.quota_key)
+    elif "report" in result:
+        log_transcript(job.session_id, job.meeting_id, context, experts, report=report)
+    else:
+        log_transcript(job.session_id, job.meeting_id, context, experts, discussion)
+
+
+def _register(worker_id):
+    with get_pool().connection() as conn:
+        conn.execute("INSERT OR REPLACE INTO job_workers (worker_id, pid, heartbeat) VALUES (?, ?, ?)",
+                     (worker_id, os.getpid(), time.time()))
+
+
+def _unregister(worker_id):
+    with get_pool().connection() as conn:
+        conn.execute("DELETE FROM job_workers WHERE worker_id = ?", (worker_id,))
+
+
+def live_workers():
+    """Number of worker processes that reported within the last three heartbeats."""
+    with get_pool().connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM job_workers WHERE heartbeat > ?",
+                            (time.time() - 3 * WORKER_HEARTBEAT,)).fetchone()[0]
+
+
+def _work_loop(worker_id, stop):
+    while not stop.is_set():
+        try:
+            job = claim(worker_id)
+        except Exception as e:
+            _log().error(f"Could not claim a meeting job: {e}")
+            job = None
+        if job is None:
+            stop.wait(POLL_INTERVAL)
+            continue
+        run_job(job, worker_id)
+
+
+def work(threads=settings.JOB_WORKER_THREADS, stop=None, log_file=None):
+    """
+    Runs `threads` job loops in this process until stop is set (or SIGINT/SIGTERM arrives when
+    called from the main thread). A running meeting is finished before its loop exits. log_file
+    (under LOG_DIR) receives the log instead of stderr.
+    """
+    import signal
+
+    _configure_logging(log_file)
+    stop = stop or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+    initialize_db()
+    process_id = f"{socket.gethostname()}:{os.getpid()}"
+    loops = [threading.Thread(target=_work_loop, args=(f"{process_id}:{i}", stop), name=f"meeting-job-{i}")
+             for i in range(threads)]
+    for loop in loops:
+        loop.start()
+    try:
+        while not stop.is_set():
+            _register(process_id)
+            stop.wait(WORKER_HEARTBEAT)
+    finally:
+        for loop in loops:
+            loop.join()
+        _unregister(process_id)
+        from backend.write_queue import get_write_queue
+
+        get_write_queue().flush()
+
+
+def run_pool(processes=settings.JOB_WORKER_PROCESSES, threads=settings.JOB_WORKER_THREADS, log_file=None):
+    """Runs `processes` worker processes of `threads` job loops each until interrupted."""
+    import multiprocessing
+    import signal
+
+    context = multiprocessing.get_context("spawn")
+    pool = [context.Process(target=work, args=(threads, None, log_file), name=f"meeting-worker-{i}")
+            for i in range(processes)]
+    for process in pool:
+        process.start()
+    # Passed on to the workers, which finish their running meetings before they exit
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in pool])
+    try:
+        for process in pool:
+            process.join()
+    except KeyboardInterrupt:
+        # The workers got the same SIGINT and finish their running meetings
+        for process in pool:
+            process.join()
+
+
+_autostart_lock = threading.Lock()
+_autostarted_at = 0.0
+
+
+def ensure_workers():
+    """
+    Starts a detached worker pool when JOB_AUTOSTART_WORKERS is on and no worker is alive, so the
+    UI works without a separately managed pool. Returns True when a pool was started.
+    The pool outlives the UI. Its log, and anything it prints, goes to AUTOSTART_LOG under LOG_DIR,
+    which also records its process ID for stopping it.
+    """
+    global _autostarted_at
+    if not settings.JOB_AUTOSTART_WORKERS or live_workers():
+        return False
+    with _autostart_lock:
+        if time.monotonic() - _autostarted_at < AUTOSTART_COOLDOWN:
+            return False
+        _autostarted_at = time.monotonic()
+    import subprocess
+    import sys
+
+    # Same working directory and environment as the UI, so the pool opens the same databases
+    path = os.pathsep.join(filter(None, (REPO_ROOT, os.environ.get("PYTHONPATH"))))
+    log = settings.get_file_logger("meeting_jobs", AUTOSTART_LOG)
+    # Crashes outside the log (e.g. an import error) land in the same file
+    with open(os.path.join(settings.LOG_DIR, AUTOSTART_LOG), "ab") as output:
+        pool = subprocess.Popen([sys.executable, "-m", "backend.jobs", "--log-file", AUTOSTART_LOG],
+                                env={**os.environ, "PYTHONPATH": path}, start_new_session=True,
+                                stdin=subprocess.DEVNULL, stdout=output, stderr=output)
+    log.info(f"Started a meeting worker pool, pid {pool.pid}; stop it with kill {pool.pid}")
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the meeting job worker pool.")
+    parser.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+    parser.add_argument("--threads", type=int, default=settings.JOB_WORKER_THREADS, help="meetings per process")
+    parser.add_argument("--log-file", help="log to this file under LOG_DIR instead of stderr")
+    args = parser.parse_args(argv)
+    _configure_logging(args.log_file)
+    run_pool(args.processes, args.threads, args.log_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# backend/llm_cache.py
+"""
+Persistent completion cache in front of the shared LLM client.
+
+Entries are keyed on the model, the whitespace-normalized messages and the request parameters,
+stored in a local SQLite file and evicted least-recently-used once the cache grows past its size
+bound. Access times are only kept to within ACCESS_REFRESH_SECONDS, so most hits are plain reads.
+Each call site has its own time-to-live. Set LLM_CACHE_DISABLED=1 (or pass use_cache=False to the
+client) to bypass the cache entirely.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+
+from backend.database import get_pool
+from config import settings
+
+CACHE_DB = settings.LLM_CACHE_DB
+CACHE_MAX_ENTRIES = settings.LLM_CACHE_MAX_ENTRIES
+CACHE_DISABLED = settings.LLM_CACHE_DISABLED
+
+# Time-to-live in seconds per call site
+DEFAULT_TTL = 60 * 60
+CALL_SITE_TTLS = {
+    "select_experts": 7 * 24 * 60 * 60,
+    "expert_discussion": 24 * 60 * 60,
+    "expert_turn": 24 * 60 * 60,
+    "meeting_synthesis": 24 * 60 * 60,
+    "followup": 60 * 60,
+    "secretary_extract": 7 * 24 * 60 * 60,
+}
+
+# Eviction runs once every this many writes rather than on each one
+_EVICT_EVERY = 50
+# A hit only rewrites an entry's last_access when the stored one is older than this many seconds,
+# so a hot entry costs one write per interval instead of a write lock on every read
+ACCESS_REFRESH_SECONDS = 60
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize(text):
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def make_key(model, messages, params):
+    """Hashes the model, normalized messages and parameters into a stable cache key."""
+    payload = {
+        "model": model,
+        "messages": [{"role": m["role"], "content": _normalize(m["content"])} for m in messages],
+        "params": params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """SQLite-backed completion cache with per-entry expiry, LRU eviction and hit/miss counters."""
+
+    def __init__(self, path=CACHE_DB, max_entries=CACHE_MAX_ENTRIES, enabled=not CACHE_DISABLED):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _pool(self):
+        pool = get_pool(self.path)
+        if not self._initialized:
+            with pool.connection() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS completions (
+                        key TEXT PRIMARY KEY,
+                        call_site TEXT,
+                        response TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions (last_access)")
+            self._initialized = True
+        return pool
+
+    def get(self, key):
+        """Returns the cached completion text for key, or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._pool().connection() as conn:
+            row = conn.execute("SELECT response, expires_at, last_access FROM completions WHERE key = ?",
+                               (key,)).fetchone()
+            if row and row[1] > now:
+                if now - row[2] > ACCESS_REFRESH_SECONDS:
+                    conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            elif row:
+                conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                row = None
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def set(self, key, response, call_site=None, ttl=None):
+        """Stores a completion under key, expiring after the call site's TTL unless ttl is given."""
+        if not self.enabled:
+            return
+        if ttl is None:
+            ttl = CALL_SITE_TTLS.get(call_site, DEFAULT_TTL)
+        now = time.time()
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % _EVICT_EVERY == 0
+        with self._pool().transaction() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO completions (key, call_site, response, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, call_site, response, now + ttl, now))
+            if evict:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        conn.execute("DELETE FROM completions WHERE expires_at <= ?", (time.time(),))
+        # Keep only the max_entries most recently used rows
+        conn.execute("""
+            DELETE FROM completions WHERE key IN (
+                SELECT key FROM completions ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def clear(self):
+        """Removes every cached completion."""
+        with self._pool().connection() as conn:
+            conn.execute("DELETE FROM completions")
+
+    def stats(self):
+        """Returns hit/miss counters for this process and the number of stored entries."""
+        entries = 0
+        if self.enabled:
+            with self._pool().connection() as conn:
+                entries = conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+cache = CompletionCache()
@@ -0,0 +1,536 @@
+# backend/llm_client.py
+"""
+Shared OpenAI client layer used by every backend module.
+
+complete(), stream() and their async counterparts send a chat completion through one pooled,
+keep-alive client per process (per event loop for async). Each call is served from the completion
+cache or joined to an identical call in flight when possible, routed by its call site to a model
+tier, rate limited and retried, bounded by the meeting's deadline, and traced.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+import weakref
+
+from backend import deadlines, model_router, resilience, singleflight, tracing
+from backend.llm_cache import cache, make_key
+from config import settings
+
+# Connection pool and concurrency limits (see config/settings.py)
+MAX_CONNECTIONS = settings.LLM_MAX_CONNECTIONS
+MAX_KEEPALIVE_CONNECTIONS = settings.LLM_MAX_KEEPALIVE_CONNECTIONS
+KEEPALIVE_EXPIRY = settings.LLM_KEEPALIVE_EXPIRY
+MAX_CONCURRENT_REQUESTS = settings.LLM_MAX_CONCURRENT_REQUESTS
+HEDGE_CALL_SITES = frozenset(filter(None, (site.strip() for site in settings.LLM_HEDGE_CALL_SITES.split(","))))
+HEDGE = settings.LLM_HEDGE and bool(HEDGE_CALL_SITES)
+
+_client_lock = threading.Lock()
+_sync_client = None
+_sync_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+# httpx async connections are bound to the loop that opened them, so each loop gets its own client
+_async_clients = weakref.WeakKeyDictionary()
+# Runs both copies of a hedged synchronous completion, so the caller can take the first answer
+_hedge_pool = None
+
+
+def _count_attempt(request):
+    # httpx event hook: fires for every HTTP attempt, so retries inside the SDK are counted too
+    tracing.record(attempts=1)
+
+
+async def _acount_attempt(request):
+    tracing.record(attempts=1)
+
+
+def _client_kwargs(asynchronous=False):
+    import httpx
+
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY is not set in the environment!")
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    if asynchronous:
+        http_client = httpx.AsyncClient(limits=limits, event_hooks={"request": [_acount_attempt]})
+    else:
+        http_client = httpx.Client(limits=limits, event_hooks={"request": [_count_attempt]})
+    return {
+        "api_key": settings.OPENAI_API_KEY,
+        "base_url": settings.OPENAI_BASE_URL,
+        "http_client": http_client,
+        # Retried by backend/resilience.py, which also sees every failure for the circuit breaker
+        "max_retries": 0,
+    }
+
+
+def get_client():
+    """Returns the process-wide synchronous OpenAI client, building it on first use."""
+    global _sync_client
+    if _sync_client is None:
+        with _client_lock:
+            if _sync_client is None:
+                from openai import OpenAI
+
+                _sync_client = OpenAI(**_client_kwargs())
+    return _sync_client
+
+
+def _get_async_state():
+    loop = asyncio.get_running_loop()
+    state = _async_clients.get(loop)
+    if state is None:
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(**_client_kwargs(asynchronous=True))
+        state = (client, asyncio.Semaphore(MAX_CONCURRENT_REQUESTS))
+        _async_clients[loop] = state
+    return state
+
+
+def get_async_client():
+    """Returns the asynchronous OpenAI client bound to the running event loop."""
+    return _get_async_state()[0]
+
+
+class _StreamUsage:
+    """Picks the text delta out of each streamed chunk and keeps the token usage for tracing."""
+
+    def __init__(self, model):
+        self.model = model
+        self.usage = None
+        self.deltas = 0
+
+    def delta(self, chunk):
+        usage = getattr(chunk, "usage", None)
+        if usage:
+            self.usage = usage
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta.content
+        if delta:
+            self.deltas += 1
+        return delta
+
+    def record(self):
+        """Records the stream's usage and returns it as (prompt, completion) tokens."""
+        if self.usage:
+            tokens = self.usage.prompt_tokens, self.usage.completion_tokens
+        else:
+            # Endpoints that ignore stream_options send no usage; one delta is about one token
+            tokens = 0, self.deltas
+        tracing.record_usage(self.model, *tokens)
+        return tokens
+
+
+def _stream_params(params):
+    # Ask for a final usage chunk only when someone is tracing; it is not part of the cache key
+    if tracing.enabled():
+        return {**params, "stream_options": {"include_usage": True}}
+    return params
+
+
+def _record_response(model, response):
+    """Records the usage of a completed response and returns it as (prompt, completion) tokens."""
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return 0, 0
+    tracing.record_usage(model, usage.prompt_tokens, usage.completion_tokens)
+    return usage.prompt_tokens, usage.completion_tokens
+
+
+def _route(model, call_site):
+    # Callers that name no model get their call site's tier (backend/model_router.py)
+    return model_router.pinned(call_site, model) if model else model_router.route(call_site)
+
+
+def _span(route):
+    attrs = {"model": route.model, "tier": route.tier}
+    if route.downgraded_from:
+        attrs["downgraded_from"] = route.downgraded_from
+    return tracing.span(f"llm.{route.call_site or 'other'}", **attrs)
+
+
+def _request_options(route):
+    # Per-request options of the SDK; unlike params they are not part of the cache key
+    timeout = deadlines.timeout(route.timeout)
+    return {"timeout": timeout} if timeout else {}
+
+
+def _failed(route, started):
+    """
+    Records a failed upstream call. A call that was cancelled, or ran past the meeting's deadline,
+    raises that instead of the error it surfaced as (e.g. its response closed under it).
+    """
+    deadline = deadlines.current()
+    # A cancelled call says nothing about the model's latency
+    if deadline is None or not deadline.cancelled:
+        model_router.observe(route, time.perf_counter() - started, failed=True)
+    deadlines.check()
+
+
+def _hedge_delay(route):
+    if not HEDGE or route.call_site not in HEDGE_CALL_SITES:
+        return None
+    delay = model_router.hedge_delay(route)
+    left = deadlines.remaining()
+    # Not worth a second request when the deadline comes before the hedge would be sent
+    return None if delay is None or (left is not None and left <= delay) else delay
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _client_lock:
+            if _hedge_pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                # Two copies per request slot; the slots still cap the requests actually in flight
+                _hedge_pool = ThreadPoolExecutor(max_workers=2 * MAX_CONCURRENT_REQUESTS,
+                                                 thread_name_prefix="llm-hedge")
+    return _hedge_pool
+
+
+def _hedge_leg(call, scopes):
+    # Each copy runs under its own scope of the caller's deadline, so the slower one can be cancelled
+    with deadlines.scope(None) as deadline:
+        scopes.append(deadline)
+        return call()
+
+
+def _hedged(route, call):
+    """
+    Returns call(). When the call is still running after its call site's hedge delay, a second
+    copy is started and the first successful answer is returned. The other copy is cancelled: it
+    stops at its next rate-limit or retry wait, and a request already sent is left to finish.
+    """
+    delay = _hedge_delay(route)
+    if delay is None:
+        return call()
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    pool = _get_hedge_pool()
+    scopes = []
+    first = pool.submit(contextvars.copy_context().run, _hedge_leg, call, scopes)
+    pending = wait([first], timeout=delay).not_done
+    if not pending:
+        return first.result()
+    tracing.record(hedged=1)
+    second = pool.submit(contextvars.copy_context().run, _hedge_leg, call, scopes)
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    model_router.record_hedge(route, won=future is second)
+                    return future.result()
+        return first.result()
+    finally:
+        for deadline in scopes:
+            deadline.cancel("Another copy of this request answered first.")
+
+
+async def _ahedged(route, call):
+    """Async counterpart of _hedged(); the slower copy's task is cancelled, which aborts its request."""
+    delay = _hedge_delay(route)
+    if delay is None:
+        return await call()
+    first = asyncio.ensure_future(call())
+    done, pending = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+    tracing.record(hedged=1)
+    second = asyncio.ensure_future(call())
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    model_router.record_hedge(route, won=task is second)
+                    return task.result()
+        return first.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _acquire_slot():
+    # Waiting for a request slot is queueing too; it is recorded with the rate-limit waits
+    if not _sync_slots.acquire(blocking=False):
+        started = time.perf_counter()
+        _sync_slots.acquire()
+        resilience.record_queue_wait(time.perf_counter() - started)
+
+
+async def _aacquire_slot(slots):
+    if slots.locked():
+        started = time.perf_counter()
+        await slots.acquire()
+        resilience.record_queue_wait(time.perf_counter() - started)
+    else:
+        await slots.acquire()
+
+
+def _tokens(messages, params):
+    return resilience.estimate_tokens(messages, params.get("max_tokens"))
+
+
+def _cached(key):
+    cached = cache.get(key)
+    tracing.record(**({"cache_hits": 1} if cached is not None else {"cache_misses": 1}))
+    return cached
+
+
+def _complete_upstream(messages, route, params):
+    tracing.record(llm_calls=1)
+    model = route.model
+
+    def attempt():
+        _acquire_slot()
+        try:
+            return get_client().chat.completions.create(model=model, messages=messages,
+                                                        **params, **_request_options(route))
+        finally:
+            _sync_slots.release()
+
+    started = time.perf_counter()
+    try:
+        response = resilience.call(model, _tokens(messages, params), attempt)
+    except Exception:
+        _failed(route, started)
+        raise
+    model_router.observe(route, time.perf_counter() - started, *_record_response(model, response))
+    return response.choices[0].message.content
+
+
+def _stream_upstream(messages, route, params):
+    tracing.record(llm_calls=1)
+    model = route.model
+    usage = _StreamUsage(model)
+
+    def attempt():
+        # The slot stays held while the stream is read; it is released below
+        _acquire_slot()
+        try:
+            return get_client().chat.completions.create(model=model, messages=messages, stream=True,
+                                                        **_stream_params(params), **_request_options(route))
+        except BaseException:
+            _sync_slots.release()
+            raise
+
+    started = time.perf_counter()
+    try:
+        response = resilience.call(model, _tokens(messages, params), attempt)
+        try:
+            # Cancelling the call closes the response even while a read is waiting on the model. In a
+            # flight (backend/singleflight.py) that is the flight's deadline, cancelled when its last
+            # subscriber leaves; each subscriber checks its own deadline between chunks.
+            with deadlines.on_cancel(response.close):
+                for chunk in response:
+                    delta = usage.delta(chunk)
+                    if delta:
+                        yield delta
+        finally:
+            # Also reached when the reader stops early; the provider then stops generating
+            response.close()
+            _sync_slots.release()
+    except Exception:
+        _failed(route, started)
+        raise
+    model_router.observe(route, time.perf_counter() - started, *usage.record())
+
+
+def _shared_source(key, shared, produce, call_site):
+    """
+    Yields the chunks of produce(). With the cache behind the call (shared), another process's
+    identical call is waited for and reused, and a fully read result is written to the cache.
+    """
+    if not shared:
+        yield from produce()
+        return
+    with singleflight.cross_process(key) as waited:
+        if waited:
+            cached = cache.get(key)
+            if cached is not None:
+                singleflight.record_cross_process_hit()
+                yield cached
+                return
+        parts = []
+        for chunk in produce():
+            parts.append(chunk)
+            yield chunk
+        cache.set(key, "".join(parts), call_site)
+
+
+async def _ashared_source(key, shared, produce, call_site):
+    """Async counterpart of _shared_source()."""
+    if not shared:
+        async for chunk in produce():
+            yield chunk
+        return
+    async with singleflight.across_process(key) as waited:
+        if waited:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                singleflight.record_cross_process_hit()
+                yield cached
+                return
+        parts = []
+        async for chunk in produce():
+            parts.append(chunk)
+            yield chunk
+        await asyncio.to_thread(cache.set, key, "".join(parts), call_site)
+
+
+def _chunks(key, source):
+    # Identical requests already in flight in this process are joined rather than repeated
+    if singleflight.ENABLED:
+        return singleflight.flights.subscribe(key, source)
+    return source()
+
+
+def complete(messages, model=None, call_site=None, use_cache=True, **params):
+    """
+    Runs a chat completion on the shared client and returns the message text.
+    `call_site` names the caller for per-site cache TTLs and picks its model tier when `model`
+    is not given (backend/model_router.py); use_cache=False skips the cache.
+    An identical request already in flight is joined instead of repeated (backend/singleflight.py).
+    """
+    route = _route(model, call_site)
+    with _span(route):
+        shared = use_cache and cache.enabled
+        key = make_key(route.model, messages, params)
+        if shared:
+            cached = _cached(key)
+            if cached is not None:
+                return cached
+        upstream = lambda: [_hedged(route, lambda: _complete_upstream(messages, route, params))]
+        source = lambda: _shared_source(key, shared, upstream, call_site)
+        return "".join(_chunks(key, source))
+
+
+def stream(messages, model=None, call_site=None, use_cache=True, **params):
+    """
+    Runs a streamed chat completion on the shared client, yielding text deltas as they arrive.
+    A cache hit is yielded as a single chunk; a fully consumed stream is written to the cache.
+    Callers streaming an identical request at the same time all receive the same chunks from
+    one upstream call.
+    """
+    route = _route(model, call_site)
+    with _span(route):
+        shared = use_cache and cache.enabled
+        key = make_key(route.model, messages, params)
+        if shared:
+            cached = _cached(key)
+            if cached is not None:
+                yield cached
+                return
+        source = lambda: _shared_source(key, shared, lambda: _stream_upstream(messages, route, params), call_site)
+        for chunk in _chunks(key, source):
+            # Stops reading at the caller's deadline; the upstream call closes once nobody reads it
+            deadlines.check()
+            yield chunk
+
+
+async def acomplete(messages, model=None, call_site=None, use_cache=True, **params):
+    """
+    Async counterpart of complete(); waits for a free slot without blocking the loop.
+    Identical requests awaited at the same time on one loop share a single call.
+    """
+    route = _route(model, call_site)
+    model = route.model
+    with _span(route):
+        shared = use_cache and cache.enabled
+        key = make_key(model, messages, params)
+        if shared:
+            cached = await asyncio.to_thread(_cached, key)
+            if cached is not None:
+                return cached
+        client, slots = _get_async_state()
+
+        async def upstream():
+            tracing.record(llm_calls=1)
+
+            async def attempt():
+                await _aacquire_slot(slots)
+                try:
+                    return await client.chat.completions.create(model=model, messages=messages,
+                                                                **params, **_request_options(route))
+                finally:
+                    slots.release()
+
+            started = time.perf_counter()
+            try:
+                response = await resilience.acall(model, _tokens(messages, params), attempt)
+            except Exception:
+                _failed(route, started)
+                raise
+            model_router.observe(route, time.perf_counter() - started, *_record_response(model, response))
+            return response.choices[0].message.content
+
+        async def produce():
+            text = await _ahedged(route, upstream)
+            if shared:
+                await asyncio.to_thread(cache.set, key, text, call_site)
+            return text
+
+        if singleflight.ENABLED:
+            return await singleflight.flights.run_async(key, produce)
+        return await produce()
+
+
+async def astream(messages, model=None, call_site=None, use_cache=True, **params):
+    """
+    Async counterpart of stream(); yields text deltas as they arrive. Identical streams on one
+    loop share a single upstream call.
+    """
+    route = _route(model, call_site)
+    model = route.model
+    with _span(route):
+        shared = use_cache and cache.enabled
+        key = make_key(model, messages, params)
+        if shared:
+            cached = await asyncio.to_thread(_cached, key)
+            if cached is not None:
+                yield cached
+                return
+        client, slots = _get_async_state()
+
+        async def upstream():
+            tracing.record(llm_calls=1)
+            usage = _StreamUsage(model)
+
+            async def attempt():
+                await _aacquire_slot(slots)
+                try:
+                    return await client.chat.completions.create(model=model, messages=messages, stream=True,
+                                                                **_stream_params(params), **_request_options(route))
+                except BaseException:
+                    slots.release()
+                    raise
+
+            started = time.perf_counter()
+            try:
+                response = await resilience.acall(model, _tokens(messages, params), attempt)
+                try:
+                    async for chunk in response:
+                        delta = usage.delta(chunk)
+                        if delta:
+                            yield delta
+                finally:
+                    await response.close()
+                    slots.release()
+            except Exception:
+                _failed(route, started)
+                raise
+            model_router.observe(route, time.perf_counter() - started, *usage.record())
+
+        source = lambda: _ashared_source(key, shared, upstream, call_site)
+        chunks = singleflight.flights.subscribe_async(key, source) if singleflight.ENABLED else source()
+        async for chunk in chunks:
+            deadlines.check()
+            yield chunk
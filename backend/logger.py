@@ -1,5 +1,37 @@
-from backend.database import save_expert_selection
+import logging
+
+from backend.database import INSERT_EXPERT_SELECTION, INSERT_WAITLIST, add_followup, save_transcript
+from backend.write_queue import enqueue
+from config import settings
 
 def log_interaction(session_id, user_input, experts_selected):
-    """Logs user interactions by saving them in the database."""
-    save_expert_selection(session_id, user_input, experts_selected)
\ No newline at end of file
+    """Logs user interactions by queueing them for a background write to the database."""
+    enqueue(INSERT_EXPERT_SELECTION, (session_id, user_input, ", ".join(experts_selected)))
+
+def log_waitlist_signup(email, priority_access=False):
+    """Queues a waitlist entry for a background write to the database."""
+    enqueue(INSERT_WAITLIST, (email, int(priority_access)))
+
+def log_transcript(session_id, meeting_id, context, experts, discussion=None, report=None):
+    """
+    Stores a finished meeting in the transcript store: its plain-text discussion, or its MeetingReport.
+    A failure to store is logged rather than raised, so it never costs the user their meeting.
+    """
+    if not settings.TRANSCRIPT_STORE:
+        return
+    try:
+        if report is not None:
+            save_transcript(session_id, meeting_id, context, experts, report.to_text(), report.to_dict())
+        else:
+            save_transcript(session_id, meeting_id, context, experts, discussion)
+    except Exception:
+        logging.exception(f"Could not store the transcript of meeting {meeting_id}")
+
+def log_followup(meeting_id, question, answer, role=None):
+    """Adds a follow-up exchange to the meeting's stored transcript, logging any failure."""
+    if not settings.TRANSCRIPT_STORE:
+        return
+    try:
+        add_followup(meeting_id, question, answer, role)
+    except Exception:
+        logging.exception(f"Could not store a follow-up of meeting {meeting_id}")
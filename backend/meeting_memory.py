@@ -0,0 +1,112 @@
+# backend/meeting_memory.py
+"""
+What a finished meeting leaves behind for its follow-up questions.
+
+The memory keeps the context and the panel that met, plus a compact digest of the discussion: the
+options on the table, the preferred one and the main risks. The digest is extracted once, locally,
+from the "Meeting Resolutions" text the discussion ends with, or read directly from the fields
+of a structured MeetingReport. Follow-up prompts then carry a few
+hundred tokens of real grounding instead of either nothing or the whole transcript.
+"""
+import re
+
+from backend.prompts import count_tokens, truncate
+from config import settings
+
+DIGEST_TOKEN_BUDGET = settings.MEETING_DIGEST_TOKEN_BUDGET
+MAX_OPTIONS = 3
+MAX_RISKS = 3
+# Each extracted line is kept short so that a full digest (3 options, the preferred choice and
+# 3 risks) fits DIGEST_TOKEN_BUDGET; the digest is a pointer into the discussion, not a copy
+LINE_TOKEN_LIMIT = 40
+
+_RESOLUTIONS_RE = re.compile(r"meeting resolutions\s*:", re.IGNORECASE)
+_NUMBERED_RE = re.compile(r"^\s*\d+[.)]\s+(.+)$")
+_PREFERRED_RE = re.compile(r"\b(preferred|recommend(?:ed|ation)?)\b", re.IGNORECASE)
+_RISK_RE = re.compile(r"\b(risks?|fail(?:s|ure)?|downside|threat)\b", re.IGNORECASE)
+_LABEL_RE = re.compile(r"^\s*(?:[-*•#]+\s*)?(?:preferred option|recommended option|recommendation)\s*:\s*",
+                       re.IGNORECASE)
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]?")
+
+
+def _clean(line):
+    return line.replace("**", "").strip().strip('"').strip()
+
+
+class MeetingMemory:
+    """The panel and discussion digest of one meeting, built once and reused by every follow-up."""
+
+    def __init__(self, context, experts, options=(), preferred=None, risks=(), excerpt=None):
+        self.context = dict(context)
+        self.experts = list(experts)
+        self.options = list(options)
+        self.preferred = preferred
+        self.risks = list(risks)
+        # Used only when the discussion had none of the expected structure
+        self.excerpt = excerpt
+        self.digest = self._render_digest()
+
+    @classmethod
+    def from_discussion(cls, context, experts, discussion):
+        """Extracts the options, preferred choice and risks from a finished discussion."""
+        start = _RESOLUTIONS_RE.search(discussion)
+        resolutions = discussion[start.end():] if start else discussion
+        lines = [_clean(line) for line in resolutions.splitlines()]
+
+        options = []
+        for line in lines:
+            match = _NUMBERED_RE.match(line)
+            if match:
+                options.append(truncate(_clean(match.group(1)), LINE_TOKEN_LIMIT))
+                if len(options) == MAX_OPTIONS:
+                    break
+            elif options and line:
+                # The first numbered list is the options; stop where it ends
+                break
+
+        preferred = next((truncate(_LABEL_RE.sub("", line), LINE_TOKEN_LIMIT)
+                          for line in lines if _PREFERRED_RE.search(line) and not _NUMBERED_RE.match(line)),
+                         None)
+
+        risks = []
+        for sentence in _SENTENCE_RE.findall(discussion):
+            sentence = _clean(sentence)
+            if _RISK_RE.search(sentence) and sentence not in risks:
+                risks.append(truncate(sentence, LINE_TOKEN_LIMIT))
+                if len(risks) == MAX_RISKS:
+                    break
+
+        excerpt = None
+        if not options and not preferred:
+            excerpt = truncate(" ".join(resolutions.split()), DIGEST_TOKEN_BUDGET)
+        return cls(context, experts, options, preferred, risks, excerpt)
+
+    @classmethod
+    def from_report(cls, context, experts, report):
+        """Takes the digest straight from a MeetingReport's fields; nothing needs extracting."""
+        if report.error:
+            return cls(context, experts)
+        options = [truncate(option.title, LINE_TOKEN_LIMIT) for option in report.options[:MAX_OPTIONS]]
+        preferred = report.preferred_option or None
+        if preferred and report.recommendation:
+            preferred = f"{preferred}. {report.recommendation}"
+        risks = [truncate(f"{option.title}. Fails if: {option.fails_if}", LINE_TOKEN_LIMIT)
+                 for option in report.options[:MAX_RISKS] if option.fails_if]
+        return cls(context, experts, options,
+                   truncate(preferred, LINE_TOKEN_LIMIT) if preferred else None, risks)
+
+    def _render_digest(self):
+        parts = []
+        if self.options:
+            parts.append("Options discussed:\n" + "\n".join(
+                f"{number}. {option}" for number, option in enumerate(self.options, 1)))
+        if self.preferred:
+            parts.append(f"Preferred: {self.preferred}")
+        if self.risks:
+            parts.append("Key risks:\n" + "\n".join(f"- {risk}" for risk in self.risks))
+        if self.excerpt:
+            parts.append(f"Discussion excerpt: {self.excerpt}")
+        digest = "\n".join(parts)
+        if count_tokens(digest) > DIGEST_TOKEN_BUDGET:
+            digest = truncate(digest, DIGEST_TOKEN_BUDGET)
+        return digest
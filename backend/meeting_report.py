@@ -0,0 +1,261 @@
+# backend/meeting_report.py
+"""
+Typed meeting reports.
+
+With structured output the model answers with a JSON document constrained by REPORT_SCHEMA (or by
+RESOLUTION_SCHEMA for the map-reduce synthesis, whose expert turns are generated separately). The
+document becomes a MeetingReport made of slotted dataclasses. The report serializes to and from
+JSON, so it can be cached or kept in the session and rendered again without re-parsing any text.
+
+ReportStreamParser consumes the document while it streams and hands back each expert turn and
+each option as soon as its JSON object closes.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+
+LEVELS = ("high", "low")
+
+_TURN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "expert": {"type": "string"},
+        "text": {"type": "string"},
+    },
+    "required": ["expert", "text"],
+    "additionalProperties": False,
+}
+
+_OPTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "description": {"type": "string"},
+        "upside": {"type": "string"},
+        "downside": {"type": "string"},
+        "fails_if": {"type": "string"},
+        "impact": {"type": "string", "enum": list(LEVELS)},
+        "risk": {"type": "string", "enum": list(LEVELS)},
+    },
+    "required": ["title", "description", "upside", "downside", "fails_if", "impact", "risk"],
+    "additionalProperties": False,
+}
+
+_RESOLUTION_PROPERTIES = {
+    "decision_type": {"type": "string", "enum": ["strategic", "operational"]},
+    "options": {"type": "array", "items": _OPTION_SCHEMA},
+    "preferred_option": {"type": "string"},
+    "recommendation": {"type": "string"},
+}
+
+# The meeting conclusion alone, for the map-reduce synthesis
+RESOLUTION_SCHEMA = {
+    "type": "object",
+    "properties": _RESOLUTION_PROPERTIES,
+    "required": list(_RESOLUTION_PROPERTIES),
+    "additionalProperties": False,
+}
+
+# The whole meeting: the discussion turns followed by the conclusion
+REPORT_SCHEMA = {
+    "type": "object",
+    "properties": {"turns": {"type": "array", "items": _TURN_SCHEMA}, **_RESOLUTION_PROPERTIES},
+    "required": ["turns", *_RESOLUTION_PROPERTIES],
+    "additionalProperties": False,
+}
+
+
+def response_format(name, schema):
+    """The chat completions `response_format` that constrains a reply to schema."""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+REPORT_FORMAT = response_format("meeting_report", REPORT_SCHEMA)
+RESOLUTION_FORMAT = response_format("meeting_resolution", RESOLUTION_SCHEMA)
+
+
+@dataclass(slots=True)
+class ExpertTurn:
+    expert: str
+    text: str
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(str(data.get("expert", "")).strip(), str(data.get("text", "")).strip())
+
+    def to_dict(self):
+        return {"expert": self.expert, "text": self.text}
+
+
+@dataclass(slots=True)
+class StrategicOption:
+    title: str
+    description: str = ""
+    upside: str = ""
+    downside: str = ""
+    fails_if: str = ""
+    impact: str = "high"
+    risk: str = "high"
+
+    @classmethod
+    def from_dict(cls, data):
+        values = {name: str(data.get(name, "")).strip() for name in
+                  ("title", "description", "upside", "downside", "fails_if")}
+        levels = {name: str(data.get(name, "high")).strip().lower() for name in ("impact", "risk")}
+        return cls(**values, **{name: level if level in LEVELS else "high" for name, level in levels.items()})
+
+    def to_dict(self):
+        return {"title": self.title, "description": self.description, "upside": self.upside,
+                "downside": self.downside, "fails_if": self.fails_if, "impact": self.impact, "risk": self.risk}
+
+
+@dataclass(slots=True)
+class MeetingReport:
+    turns: list = field(default_factory=list)
+    options: list = field(default_factory=list)
+    decision_type: str = ""
+    preferred_option: str = ""
+    recommendation: str = ""
+    # Set instead of the other fields when the meeting could not be generated
+    error: str = None
+
+    @classmethod
+    def from_dict(cls, data, turns=None):
+        """Builds a report from a decoded document; `turns` overrides the document's own."""
+        return cls(
+            turns=list(turns) if turns is not None else [ExpertTurn.from_dict(t) for t in data.get("turns") or []],
+            options=[StrategicOption.from_dict(option) for option in data.get("options") or []],
+            decision_type=str(data.get("decision_type", "")),
+            preferred_option=str(data.get("preferred_option", "")),
+            recommendation=str(data.get("recommendation", "")),
+            error=data.get("error"),
+        )
+
+    @classmethod
+    def from_json(cls, text, turns=None):
+        return cls.from_dict(json.loads(_json_object(text)), turns)
+
+    def to_dict(self):
+        return {
+            "turns": [turn.to_dict() for turn in self.turns],
+            "options": [option.to_dict() for option in self.options],
+            "decision_type": self.decision_type,
+            "preferred_option": self.preferred_option,
+            "recommendation": self.recommendation,
+            "error": self.error,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    def quadrant(self):
+        """Option titles by (impact, risk), e.g. quadrant()[("high", "low")] for the quick wins."""
+        cells = {(impact, risk): [] for impact in LEVELS for risk in LEVELS}
+        for option in self.options:
+            cells[(option.impact, option.risk)].append(option.title)
+        return cells
+
+    def to_text(self):
+        """Renders the report in the shape of the plain-text meeting output."""
+        if self.error:
+            return self.error
+        parts = [f"{turn.expert}: {turn.text}\n\n" for turn in self.turns]
+        parts.append("Meeting Resolutions:\n")
+        if self.decision_type:
+            parts.append(f"Decision type: {self.decision_type}\n")
+        for number, option in enumerate(self.options, 1):
+            parts.append(f"   {number}. {option.title}\n")
+        for option in self.options:
+            parts.append(f"\n{option.title}: {option.description}\nUpside: {option.upside}\n"
+                         f"Downside: {option.downside}\nFails if: {option.fails_if}\n"
+                         f"Impact: {option.impact}, risk: {option.risk}\n")
+        if self.preferred_option:
+            parts.append(f"\nPreferred option: {self.preferred_option}\n")
+        if self.recommendation:
+            parts.append(f"{self.recommendation}\n")
+        return "".join(parts)
+
+
+def _json_object(text):
+    # Tolerates code fences or chatter around the object from providers without strict schemas
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("The reply holds no JSON object")
+    return text[start:end + 1]
+
+
+# A complete JSON string, or a structural character. A lone quote is a string still streaming in.
+_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\],:"]')
+_DECODER = json.JSONDecoder()
+
+
+class ReportStreamParser:
+    """
+    Incremental parser for a streamed report document.
+
+    feed() follows only the top level of the document, skipping whole strings in one step. An
+    element of the "turns" or "options" array is handed to the JSON decoder once a closing brace
+    has arrived after its start, and returned as an ExpertTurn or StrategicOption as soon as it
+    decodes. finish() decodes the complete document into a MeetingReport.
+    """
+
+    _ITEMS = {"turns": ExpertTurn, "options": StrategicOption}
+
+    def __init__(self):
+        self._text = ""
+        self._position = 0
+        self._depth = 0
+        self._expect_key = False
+        self._key = None
+        self._item_start = None
+
+    def feed(self, chunk):
+        """Adds streamed text and returns the items it completed, in order."""
+        self._text += chunk
+        text = self._text
+        index = self._position
+        items = []
+        while True:
+            if self._item_start is not None:
+                # An element can only be complete once a closing brace arrived after the last attempt
+                if text.find("}", index) == -1:
+                    index = len(text)
+                    break
+                try:
+                    data, index = _DECODER.raw_decode(text, self._item_start)
+                except ValueError:
+                    index = len(text)
+                    break
+                items.append(self._ITEMS[self._key].from_dict(data))
+                self._item_start = None
+                continue
+            match = _TOKEN_RE.search(text, index)
+            if match is None:
+                index = len(text)
+                break
+            token = match.group()
+            if token == '"':
+                # Resume at the opening quote once more of the string has arrived
+                index = match.start()
+                break
+            index = match.end()
+            char = token[0]
+            if char == '"':
+                if self._depth == 1 and self._expect_key:
+                    self._key = json.loads(token)
+            elif char == "{" and self._depth == 2 and self._key in self._ITEMS:
+                self._item_start = match.start()
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif char in "}]":
+                self._depth -= 1
+            elif self._depth == 1:
+                self._expect_key = char == ","
+        self._position = index
+        return items
+
+    def finish(self, turns=None):
+        """Decodes the whole document; `turns` supplies turns generated outside it."""
+        return MeetingReport.from_json(self._text, turns)
@@ -0,0 +1,261 @@
+# backend/model_router.py
+"""
+Model tiers for each call site.
+
+Call sites ask for a tier rather than a model. LLM_ROUTES in config/settings.py maps each call
+site to a tier. LLM_TIERS gives each tier a model, a request timeout and a p95 latency target,
+which LLM_SLOS can override per call site. By default expert selection, Secretary extraction and
+follow-ups run on the fast tier, and the meeting itself stays on the premium tier.
+
+route() picks the tier a call should use right now. A tier is downgraded to its fallback
+(LLM_TIER_FALLBACKS) when the p95 latency of one call site's recent calls on it breaches that call
+site's target, or while its model's circuit is open (backend/resilience.py). A downgrade lasts
+LLM_DOWNGRADE_SECONDS, after which the tier is tried again on fresh measurements. Latencies are
+kept per call site because a short expert turn and a whole streamed report have nothing in common:
+in a single window, the mix of calls would decide the p95 rather than how fast the model is. Every
+upstream call reports its latency and tokens through observe(). stats() returns them per route, so
+the p95 of each call site can be compared before and after a routing change. The same per-route
+p95 is the delay after which backend/llm_client.py hedges a slow call (hedge_delay()).
+"""
+import threading
+import time
+from collections import deque
+
+from backend import resilience
+from config import settings
+
+SLO_WINDOW = settings.LLM_SLO_WINDOW
+SLO_MIN_CALLS = settings.LLM_SLO_MIN_CALLS
+DOWNGRADE_SECONDS = settings.LLM_DOWNGRADE_SECONDS
+HEDGE_MIN_DELAY = settings.LLM_HEDGE_MIN_DELAY
+# Latencies kept per route for stats()
+ROUTE_WINDOW = 1000
+
+
+def _pairs(spec, setting):
+    pairs = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = pair.partition("=")
+        if not name.strip() or not value.strip():
+            raise ValueError(f"Bad {setting} entry {pair!r}; expected name=value")
+        pairs[name.strip()] = value.strip()
+    return pairs
+
+
+def _parse_tiers(spec):
+    tiers = {}
+    for name, value in _pairs(spec, "LLM_TIERS").items():
+        model, _, limits = value.partition("/")
+        timeout, _, slo = limits.partition("/")
+        try:
+            tiers[name] = Tier(name, model, float(timeout or 0) or None, float(slo or 0) or None)
+        except ValueError:
+            raise ValueError(f"Bad LLM_TIERS entry {name}={value!r}; expected tier=model/timeout/p95") from None
+    return tiers
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * q // 100) - 1)] if ordered else None
+
+
+class Tier:
+    """A model with its request timeout, p95 latency target (seconds) and recent latencies per call site."""
+
+    __slots__ = ("name", "model", "timeout", "slo", "fallback", "latencies", "degraded_until")
+
+    def __init__(self, name, model, timeout=None, slo=None, fallback=None):
+        self.name = name
+        self.model = model
+        self.timeout = timeout
+        self.slo = slo
+        self.fallback = fallback
+        self.latencies = {}
+        self.degraded_until = 0.0
+
+
+class Route:
+    """Where one call goes: the tier and model used, and the tier it was downgraded from, if any."""
+
+    __slots__ = ("call_site", "tier", "model", "timeout", "downgraded_from")
+
+    def __init__(self, call_site, tier, model, timeout=None, downgraded_from=None):
+        self.call_site = call_site
+        self.tier = tier
+        self.model = model
+        self.timeout = timeout
+        self.downgraded_from = downgraded_from
+
+
+class _RouteStats:
+    __slots__ = ("calls", "failures", "downgraded", "hedged", "hedge_wins", "prompt_tokens", "completion_tokens",
+                 "models", "latencies")
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.downgraded = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.models = {}
+        self.latencies = deque(maxlen=ROUTE_WINDOW)
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "downgraded": self.downgraded,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "models": dict(self.models),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "p50_seconds": _percentile(self.latencies, 50),
+            "p95_seconds": _percentile(self.latencies, 95),
+        }
+
+
+class ModelRouter:
+    """Routes call sites to tiers and tracks the latency of every tier and route."""
+
+    def __init__(self, tiers=settings.LLM_TIERS, routes=settings.LLM_ROUTES,
+                 fallbacks=settings.LLM_TIER_FALLBACKS, default_tier=settings.LLM_DEFAULT_TIER,
+                 min_calls=SLO_MIN_CALLS, downgrade_seconds=DOWNGRADE_SECONDS, slos=settings.LLM_SLOS):
+        self.tiers = _parse_tiers(tiers) if isinstance(tiers, str) else dict(tiers)
+        self.routes = _pairs(routes, "LLM_ROUTES") if isinstance(routes, str) else dict(routes)
+        fallbacks = _pairs(fallbacks, "LLM_TIER_FALLBACKS") if isinstance(fallbacks, str) else dict(fallbacks)
+        self.default_tier = default_tier
+        slos = _pairs(slos, "LLM_SLOS") if isinstance(slos, str) else dict(slos)
+        try:
+            self.slos = {call_site: float(slo) for call_site, slo in slos.items()}
+        except ValueError:
+            raise ValueError(f"Bad LLM_SLOS {slos!r}; expected call_site=seconds") from None
+        for setting, names in (("LLM_ROUTES", self.routes.values()), ("LLM_TIER_FALLBACKS", fallbacks),
+                               ("LLM_TIER_FALLBACKS", fallbacks.values()), ("LLM_DEFAULT_TIER", [default_tier])):
+            for name in names:
+                if name not in self.tiers:
+                    raise ValueError(f"{setting} names tier {name!r}, which LLM_TIERS does not define")
+        for name, fallback in fallbacks.items():
+            self.tiers[name].fallback = fallback
+        self.min_calls = min_calls
+        self.downgrade_seconds = downgrade_seconds
+        self._lock = threading.Lock()
+        self._route_stats = {}
+        self.downgrades = 0
+
+    def tier_for(self, call_site):
+        """The tier call_site is configured to use."""
+        return self.tiers[self.routes.get(call_site, self.default_tier)]
+
+    def _degraded(self, tier, now):
+        with self._lock:
+            if tier.degraded_until:
+                if now < tier.degraded_until:
+                    return True
+                # Back on probation: it has to breach its target again on fresh calls
+                tier.degraded_until = 0.0
+                tier.latencies.clear()
+        return resilience.breaker(tier.model).state == "open"
+
+    def route(self, call_site):
+        """Returns the Route for a call from call_site, downgrading past degraded tiers."""
+        primary = tier = self.tier_for(call_site)
+        now = time.monotonic()
+        visited = {tier.name}
+        while tier.fallback and tier.fallback not in visited and self._degraded(tier, now):
+            tier = self.tiers[tier.fallback]
+            visited.add(tier.name)
+        return Route(call_site, tier.name, tier.model, tier.timeout,
+                     primary.name if tier is not primary else None)
+
+    def _stats_for(self, call_site):
+        stats = self._route_stats.get(call_site)
+        if stats is None:
+            stats = self._route_stats[call_site] = _RouteStats()
+        return stats
+
+    def observe(self, route, seconds, prompt_tokens=0, completion_tokens=0, failed=False):
+        """
+        Records one upstream call of route. A tier is downgraded when the p95 of route's call site
+        on it breaches that call site's target.
+        """
+        with self._lock:
+            stats = self._stats_for(route.call_site)
+            stats.calls += 1
+            stats.failures += failed
+            stats.downgraded += route.downgraded_from is not None
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.models[route.model] = stats.models.get(route.model, 0) + 1
+            stats.latencies.append(seconds)
+            tier = self.tiers.get(route.tier)
+            slo = self.slos.get(route.call_site, tier.slo) if tier is not None else None
+            if not slo:
+                return
+            latencies = tier.latencies.get(route.call_site)
+            if latencies is None:
+                latencies = tier.latencies[route.call_site] = deque(maxlen=SLO_WINDOW)
+            latencies.append(seconds)
+            if (not tier.degraded_until and tier.fallback and len(latencies) >= self.min_calls
+                    and _percentile(latencies, 95) > slo):
+                tier.degraded_until = time.monotonic() + self.downgrade_seconds
+                self.downgrades += 1
+
+    def hedge_delay(self, route):
+        """
+        Seconds after which a call of route's call site gets a hedge: the p95 latency of its recent
+        calls, at least HEDGE_MIN_DELAY. None until the call site has min_calls measurements.
+        """
+        with self._lock:
+            stats = self._route_stats.get(route.call_site)
+            if stats is None or len(stats.latencies) < self.min_calls:
+                return None
+            latencies = list(stats.latencies)
+        return max(_percentile(latencies, 95), HEDGE_MIN_DELAY)
+
+    def record_hedge(self, route, won):
+        """Counts a hedge sent for a call of route, and whether its answer was the one used."""
+        with self._lock:
+            stats = self._stats_for(route.call_site)
+            stats.hedged += 1
+            stats.hedge_wins += won
+
+    def stats(self):
+        """Per-route calls, models, tokens and p50/p95 latency, plus the tiers currently downgraded."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "routes": {call_site: stats.to_dict() for call_site, stats in self._route_stats.items()},
+                "downgrades": self.downgrades,
+                "degraded_tiers": [tier.name for tier in self.tiers.values() if tier.degraded_until > now],
+            }
+
+
+router = ModelRouter()
+
+
+def route(call_site):
+    return router.route(call_site)
+
+
+def pinned(call_site, model):
+    """The Route of a call that names its model itself: measured, but never downgraded."""
+    return Route(call_site, None, model)
+
+
+def observe(route, seconds, prompt_tokens=0, completion_tokens=0, failed=False):
+    router.observe(route, seconds, prompt_tokens, completion_tokens, failed)
+
+
+def hedge_delay(route):
+    return router.hedge_delay(route)
+
+
+def record_hedge(route, won):
+    router.record_hedge(route, won)
+
+
+def stats():
+    return router.stats()
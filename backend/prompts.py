@@ -0,0 +1,161 @@
+# backend/prompts.py
+"""
+Prompt building with token budgets.
+
+A PromptTemplate splits a prompt in two. The static instructions become the system message; they
+are built once at import and never change between calls, so every request shares one stable prefix
+that the provider can cache. The per-call data (the user's context, the panel, a question) goes
+into a short user message after it. The context is serialized compactly, one "field: value" line
+per field. No single field may exceed a per-field cap, and when a prompt would still exceed its
+input token budget the longest fields are trimmed first. Trimming cuts at a sentence boundary
+where possible.
+
+Tokens are counted locally with tiktoken when it is installed, and with a conservative
+estimate otherwise.
+"""
+import re
+
+from config import settings
+
+# Input token budget for one prompt: the static prefix, the context and any other per-call parts
+INPUT_TOKEN_BUDGET = settings.PROMPT_INPUT_TOKEN_BUDGET
+# Cap on any one context field, so a rambling answer cannot crowd out the rest of the prompt
+MAX_FIELD_TOKENS = settings.PROMPT_FIELD_TOKEN_LIMIT
+# No context field is trimmed below this, however tight the budget
+MIN_FIELD_TOKENS = 24
+
+ELLIPSIS = " …"
+
+# Fallback estimate: words are split into pieces of up to 4 characters and each punctuation mark
+# counts as one token. For English prose this slightly overestimates the BPE count, which is the
+# safe side for a budget.
+_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s)")
+
+_encodings = {}
+_tiktoken = None
+
+
+def _encoding(model):
+    global _tiktoken
+    if _tiktoken is None:
+        try:
+            import tiktoken
+        except ImportError:
+            tiktoken = False
+        _tiktoken = tiktoken
+    if not _tiktoken:
+        return None
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = _tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = _tiktoken.get_encoding("cl100k_base")
+        _encodings[model] = encoding
+    return encoding
+
+
+def count_tokens(text, model=settings.DEFAULT_MODEL):
+    """Counts the tokens `model` would see for text."""
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(_TOKEN_RE.findall(text))
+
+
+def truncate(text, max_tokens, model=settings.DEFAULT_MODEL):
+    """
+    Shortens text to at most max_tokens, keeping its beginning. Cuts at the last sentence end
+    that keeps at least half of what fits, otherwise at a word, and marks the cut with an ellipsis.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    words = text.split()
+    # Longest prefix of words that fits, found by bisection
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle]) + ELLIPSIS, model) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    head = " ".join(words[:low])
+    sentence_ends = [match.end() for match in _SENTENCE_END_RE.finditer(head + " ")]
+    if sentence_ends and sentence_ends[-1] >= len(head) // 2:
+        return head[:sentence_ends[-1]] + ELLIPSIS
+    return head + ELLIPSIS
+
+
+def compact_context(context, max_tokens=None, model=settings.DEFAULT_MODEL, field_limit=MAX_FIELD_TOKENS):
+    """
+    Serializes the context as "field: value" lines with collapsed whitespace, skipping empty
+    fields. Each line is cut to field_limit tokens. With max_tokens, the longest fields are then
+    trimmed until the whole block fits: short fields keep their full text and the rest share what
+    is left equally.
+    """
+    fields = []
+    for field, value in context.items():
+        value = _WHITESPACE_RE.sub(" ", str(value)).strip()
+        if value:
+            fields.append((field, value))
+    lines = {field: f"{field}: {value}" for field, value in fields}
+    if field_limit is not None:
+        for field, line in lines.items():
+            # Counting is only needed when the line is longer in bytes than the cap in tokens
+            if len(line.encode("utf-8")) > field_limit:
+                lines[field] = truncate(line, field_limit, model)
+    if max_tokens is not None:
+        sizes = {field: count_tokens(line, model) for field, line in lines.items()}
+        if sum(sizes.values()) > max_tokens:
+            remaining = max_tokens
+            pending = sorted(sizes, key=sizes.get)
+            while pending:
+                share = max(remaining // len(pending), MIN_FIELD_TOKENS)
+                field = pending.pop(0)
+                if sizes[field] > share:
+                    lines[field] = truncate(lines[field], share, model)
+                    sizes[field] = count_tokens(lines[field], model)
+                remaining -= sizes[field]
+    return "\n".join(lines[field] for field, _ in fields)
+
+
+class PromptTemplate:
+    """
+    A prompt made of a static system prefix and a per-call user message.
+
+    `system` is fixed text. `user` is a str.format template whose `{context}` placeholder receives
+    the compacted context; its other placeholders are filled from render()'s keyword arguments.
+    """
+
+    def __init__(self, name, system, user, budget=None):
+        self.name = name
+        self.system = system.strip()
+        self.user = user.strip()
+        self.budget = budget
+        self._system_message = {"role": "system", "content": self.system}
+        self._fixed_tokens = {}
+
+    def fixed_tokens(self, model=settings.DEFAULT_MODEL):
+        """Tokens of the static prefix and of the user template's own text, counted once per model."""
+        tokens = self._fixed_tokens.get(model)
+        if tokens is None:
+            tokens = self._fixed_tokens[model] = count_tokens(self.system, model) + count_tokens(self.user, model)
+        return tokens
+
+    def render(self, context, model=settings.DEFAULT_MODEL, **parts):
+        """
+        Returns the chat messages for one call. The context gets whatever is left of the budget
+        after the static text and the other parts.
+        """
+        available = (self.budget or INPUT_TOKEN_BUDGET) - self.fixed_tokens(model)
+        parts = {name: str(value) for name, value in parts.items()}
+        context_text = compact_context(context, model=model)
+        # Every token covers at least one byte, so a prompt that fits in bytes needs no counting
+        size = len(context_text.encode("utf-8")) + sum(len(value.encode("utf-8")) for value in parts.values())
+        if size > available:
+            used = sum(count_tokens(value, model) for value in parts.values())
+            context_text = compact_context(context, max(available - used, 0), model)
+        user = self.user.format(context=context_text, **parts)
+        return [self._system_message, {"role": "user", "content": user}]
@@ -0,0 +1,352 @@
+# backend/resilience.py
+"""
+Rate limiting, retries and circuit breaking for model calls.
+
+Every call in backend/llm_client.py goes through call() (or acall() on the async path):
+  * A token-bucket limiter, shared by all threads and event loops, holds each model to its
+    requests-per-minute and tokens-per-minute budget (LLM_RPM_LIMIT, LLM_TPM_LIMIT,
+    LLM_RATE_LIMITS). The buckets are per process, so each process gets an equal share of the
+    budget (LLM_RATE_LIMIT_SHARES, by default the UI and the job workers). Calls that exceed the
+    budget queue for capacity, and the time they wait is recorded as queue_wait on the trace span.
+    A call that would wait longer than LLM_MAX_QUEUE_WAIT fails at once with RateLimitTimeout
+    instead of piling up behind the burst.
+  * Transient failures (HTTP 408/409/429/5xx, timeouts, dropped connections) are retried up to
+    LLM_MAX_RETRIES times with jittered exponential backoff, honouring Retry-After when the
+    server sends it. When the retries run out, UpstreamUnavailable is raised from the last error.
+    Other errors are raised at once.
+  * A per-model circuit breaker opens after LLM_BREAKER_FAILURES consecutive transient failures.
+    While it is open, calls fail fast with CircuitOpenError. After LLM_BREAKER_RESET_SECONDS one
+    probe call is let through, and its outcome closes or reopens the circuit.
+  * Queueing and backoff stop at the meeting's deadline (backend/deadlines.py). A call past its
+    deadline, or cancelled, is neither retried nor counted against the circuit.
+Process-wide counters are available from stats().
+"""
+import random
+import threading
+import time
+
+from backend import deadlines, tracing
+from config import settings
+
+MAX_RETRIES = settings.LLM_MAX_RETRIES
+RETRY_BASE_DELAY = settings.LLM_RETRY_BASE_DELAY
+RETRY_MAX_DELAY = settings.LLM_RETRY_MAX_DELAY
+MAX_QUEUE_WAIT = settings.LLM_MAX_QUEUE_WAIT
+BREAKER_FAILURES = settings.LLM_BREAKER_FAILURES
+BREAKER_RESET_SECONDS = settings.LLM_BREAKER_RESET_SECONDS
+# Completion tokens assumed for a call that sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+
+_RETRY_STATUSES = {408, 409, 429}
+# Exception classes (from openai and httpx) that mean the request never got a proper answer
+_TRANSIENT_ERRORS = {"APITimeoutError", "APIConnectionError", "TimeoutException", "NetworkError",
+                     "RemoteProtocolError"}
+
+
+class UpstreamUnavailable(RuntimeError):
+    """The model service cannot take the call right now; the message is fit to show a user."""
+
+
+class RateLimitTimeout(UpstreamUnavailable):
+    pass
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+def _parse_limits(spec):
+    limits = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = pair.partition("=")
+        rpm, _, tpm = values.partition("/")
+        try:
+            limits[model.strip()] = (int(rpm or 0), int(tpm or 0))
+        except ValueError:
+            raise ValueError(f"Bad LLM_RATE_LIMITS entry {pair!r}; expected model=rpm/tpm") from None
+    return limits
+
+
+class _Bucket:
+    """A token bucket holding one minute of budget. Reservations may overdraw it into a queue."""
+
+    __slots__ = ("capacity", "rate", "level", "updated")
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_for(self, amount, now):
+        """Refills the bucket and returns how long a reservation of amount would wait."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+def process_shares():
+    """Number of processes the rate limits are split across (see LLM_RATE_LIMIT_SHARES)."""
+    if settings.LLM_RATE_LIMIT_SHARES > 0:
+        return settings.LLM_RATE_LIMIT_SHARES
+    return 1 + settings.JOB_WORKER_PROCESSES if settings.MEETING_JOBS else 1
+
+
+class RateLimiter:
+    """
+    Per-model request and token buckets shared by every caller in the process, each holding
+    1/shares of the configured limits.
+    """
+
+    def __init__(self, rpm=settings.LLM_RPM_LIMIT, tpm=settings.LLM_TPM_LIMIT,
+                 overrides=settings.LLM_RATE_LIMITS, max_wait=MAX_QUEUE_WAIT, shares=1):
+        self.default = (rpm, tpm)
+        self.shares = shares
+        self.overrides = _parse_limits(overrides) if isinstance(overrides, str) else dict(overrides)
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def _buckets_for(self, model):
+        buckets = self._buckets.get(model)
+        if buckets is None:
+            rpm, tpm = self.overrides.get(model, self.default)
+            buckets = self._buckets[model] = (_Bucket(rpm / self.shares) if rpm else None,
+                                              _Bucket(tpm / self.shares) if tpm else None)
+        return buckets
+
+    def reserve(self, model, tokens, deadline=None):
+        """
+        Reserves one request and `tokens` tokens of model's budget and returns the seconds the
+        caller must wait before sending. Raises RateLimitTimeout, reserving nothing, when that wait
+        would exceed max_wait, or DeadlineExceeded when it would outlast `deadline` seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            requests, token_bucket = self._buckets_for(model)
+            wait = 0.0
+            if requests:
+                wait = requests.wait_for(1, now)
+            if token_bucket:
+                wait = max(wait, token_bucket.wait_for(tokens, now))
+            if wait > self.max_wait:
+                raise RateLimitTimeout(f"The model service is at its rate limit for {model}; "
+                                       f"please try again in a minute.")
+            if deadline is not None and wait > deadline:
+                raise deadlines.DeadlineExceeded()
+            if requests:
+                requests.take(1)
+            if token_bucket:
+                token_bucket.take(tokens)
+        return wait
+
+
+class CircuitBreaker:
+    """Fails fast while a model keeps failing, then lets a single probe call test it again."""
+
+    def __init__(self, model, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.model = model
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def before_call(self):
+        """Raises CircuitOpenError while the circuit is open; lets one probe through after the reset time."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._probing = True
+                return
+        _count(rejected_open=1)
+        raise CircuitOpenError(f"The model service ({self.model}) is failing; please try again shortly.")
+
+    def on_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def cancel(self):
+        """Gives up a probe that never reached the service, so another call can probe instead."""
+        with self._lock:
+            self._probing = False
+
+    def on_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or (self._opened_at is None and self._consecutive >= self.failures):
+                if self._opened_at is None:
+                    _count(breaker_trips=1)
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "queued": 0, "queue_wait": 0.0, "max_queue_wait": 0.0, "retries": 0,
+          "rejected_rate_limit": 0, "rejected_open": 0, "breaker_trips": 0}
+
+limiter = RateLimiter(shares=process_shares())
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def _count(**counters):
+    with _stats_lock:
+        for name, value in counters.items():
+            _stats[name] += value
+
+
+def stats():
+    """Returns a snapshot of the process-wide counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def breaker(model):
+    """Returns the circuit breaker of model."""
+    found = _breakers.get(model)
+    if found is None:
+        with _breakers_lock:
+            found = _breakers.setdefault(model, CircuitBreaker(model))
+    return found
+
+
+def record_queue_wait(seconds):
+    """Records time a call spent queued, on the current trace span and in stats()."""
+    if seconds <= 0:
+        return
+    tracing.record(queue_wait=seconds)
+    with _stats_lock:
+        _stats["queued"] += 1
+        _stats["queue_wait"] += seconds
+        _stats["max_queue_wait"] = max(_stats["max_queue_wait"], seconds)
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """Rough token cost of a call for the limiter: about 4 characters per prompt token."""
+    prompt = sum(len(str(message.get("content", ""))) for message in messages) // 4
+    return prompt + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def is_transient(exc):
+    """Whether exc is a failure worth retrying: throttling, a server error, a timeout or a lost connection."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in _RETRY_STATUSES or status >= 500
+    return any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(exc).__mro__)
+
+
+def _retry_delay(exc, retry):
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** retry))
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        try:
+            delay = max(delay, min(float(headers.get("retry-after", 0)), RETRY_MAX_DELAY))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+def _exhausted(model):
+    return UpstreamUnavailable(f"The model service ({model}) did not answer after {MAX_RETRIES + 1} attempts; "
+                               f"please try again shortly.")
+
+
+def _reserve(model, tokens):
+    try:
+        return limiter.reserve(model, tokens, deadlines.remaining())
+    except RateLimitTimeout:
+        _count(rejected_rate_limit=1)
+        raise
+
+
+def call(model, tokens, attempt):
+    """Runs attempt() under model's rate limit, retry policy and circuit breaker; returns its result."""
+    circuit = breaker(model)
+    _count(calls=1)
+    for retry in range(MAX_RETRIES + 1):
+        deadlines.check()
+        circuit.before_call()
+        try:
+            wait = _reserve(model, tokens)
+            if wait:
+                deadlines.sleep(wait)
+                record_queue_wait(wait)
+            result = attempt()
+        except (RateLimitTimeout, deadlines.DeadlineExceeded, deadlines.Cancelled):
+            circuit.cancel()
+            raise
+        except Exception as exc:
+            if not is_transient(exc):
+                # The service answered; the request itself was wrong
+                circuit.on_success()
+                raise
+            if deadlines.stopped():
+                # Cut short by the meeting's deadline or a cancellation, not by the service
+                circuit.cancel()
+                deadlines.check()
+            circuit.on_failure()
+            if retry == MAX_RETRIES:
+                raise _exhausted(model) from exc
+            _count(retries=1)
+            deadlines.sleep(_retry_delay(exc, retry))
+            continue
+        except BaseException:
+            # Interrupted before an answer; a probe must not stay claimed
+            circuit.cancel()
+            raise
+        circuit.on_success()
+        return result
+
+
+async def acall(model, tokens, attempt):
+    """Async counterpart of call(); attempt() returns an awaitable and waits do not block the loop."""
+    circuit = breaker(model)
+    _count(calls=1)
+    for retry in range(MAX_RETRIES + 1):
+        deadlines.check()
+        circuit.before_call()
+        try:
+            wait = _reserve(model, tokens)
+            if wait:
+                await deadlines.asleep(wait)
+                record_queue_wait(wait)
+            result = await attempt()
+        except (RateLimitTimeout, deadlines.DeadlineExceeded, deadlines.Cancelled):
+            circuit.cancel()
+            raise
+        except Exception as exc:
+            if not is_transient(exc):
+                circuit.on_success()
+                raise
+            if deadlines.stopped():
+                circuit.cancel()
+                deadlines.check()
+            circuit.on_failure()
+            if retry == MAX_RETRIES:
+                raise _exhausted(model) from exc
+            _count(retries=1)
+            await deadlines.asleep(_retry_delay(exc, retry))
+            continue
+        except BaseException:
+            circuit.cancel()
+            raise
+        circuit.on_success()
+        return result
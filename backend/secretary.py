@@ -1,16 +1,10 @@
-import os
-import json
-import openai
-from backend.expert_manager import select_experts
+from backend import tracing
+from backend.context_extraction import extract_fields, extract_fields_with_model
+from config import settings
 
-# Set OpenAI API key from environment
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in the environment!")
-openai.api_key = OPENAI_API_KEY
 
 class Secretary:
-    def __init__(self):
+    def __init__(self, use_model=None):
         # Define the sequential order of required fields
         self.required_fields = ["problem", "persona", "objective", "scenario", "geography", "constraints"]
         # Mapping of fields to friendly, user-understandable prompts
@@ -22,12 +16,21 @@ class Secretary:
             "geography": "Where will this project be executed (location, market, etc.)?",
             "constraints": "What limitations or constraints (time, budget, resources) are you facing?"
         }
+        # Short names for the fields, used when telling the user what was picked up from a message
+        self.field_labels = {
+            "problem": "challenge", "persona": "role", "objective": "goal",
+            "scenario": "situation", "geography": "location", "constraints": "constraints",
+        }
         # Storage for context gathered from the user
         self.context = {}
         # Index to track which field is currently being asked for
         self.current_field_index = 0  
         # Total number of fields
         self.max_fields = len(self.required_fields)
+        # Whether one cheap model call backs up the local extraction heuristics
+        self.use_model = settings.SECRETARY_MODEL_EXTRACTION if use_model is None else use_model
+        # Questions skipped because an earlier message already answered them
+        self.turns_saved = 0
 
     def next_followup(self):
         """
@@ -40,22 +43,52 @@ class Secretary:
         else:
             return None
 
-    def analyze_input(self, user_input):
+    def analyze_input(self, user_input, field_being_answered=None):
         """
-        Processes the user input sequentially.
-        The first input addresses the current required field.
-        It then advances to the next field in the predetermined order.
+        Processes the user input.
+        The input answers the field being asked for: `field_being_answered` when given, otherwise
+        the first field still missing. Any other missing fields the input clearly states are
+        filled from it as well (see backend/context_extraction.py), so their questions are skipped.
+        It then moves on to the first field still missing in the predetermined order.
         Returns a response with a follow-up question if more fields remain,
         or indicates completion if all fields have been answered.
+        "extracted" lists the fields filled beyond the one asked for, and "noted" tells the user
+        what was filled for them ("" when nothing was), so a skipped question is never silent.
         """
-        # Assign the user's input to the current field
-        if self.current_field_index < self.max_fields:
-            field = self.required_fields[self.current_field_index]
-            self.context[field] = user_input.strip()
-            self.current_field_index += 1
+        if field_being_answered not in self.required_fields:
+            current = self.next_followup()
+            field_being_answered = current["field"] if current else None
+        with tracing.span("secretary", field=field_being_answered):
+            extracted = {}
+            if field_being_answered is not None:
+                text = user_input.strip()
+                self.context[field_being_answered] = text
+                missing = [field for field in self.required_fields if field not in self.context]
+                extracted = extract_fields(text, missing)
+                if self.use_model:
+                    extracted.update(extract_fields_with_model(
+                        text, [field for field in missing if field not in extracted]))
+                self.context.update(extracted)
+                self.turns_saved += len(extracted)
+                tracing.annotate(extracted=len(extracted))
+                # Keep the fields in question order whatever order they were filled in
+                self.context = {field: self.context[field] for field in self.required_fields if field in self.context}
+            # Advance to the first field that is still missing
+            self.current_field_index = next((index for index, field in enumerate(self.required_fields)
+                                             if field not in self.context), self.max_fields)
 
-        next_q = self.next_followup()
-        if next_q:
-            return {"status": "incomplete", "question": next_q["question"], "missing_field": next_q["field"], "context": self.context}
-        else:
-            return {"status": "complete", "context": self.context}
+            next_q = self.next_followup()
+            if next_q:
+                return {"status": "incomplete", "question": next_q["question"], "missing_field": next_q["field"],
+                        "context": self.context, "extracted": list(extracted), "noted": self.noted(extracted)}
+            else:
+                return {"status": "complete", "context": self.context, "extracted": list(extracted),
+                        "noted": self.noted(extracted)}
+
+    def noted(self, extracted):
+        """A sentence listing the fields filled from a message without being asked, or ""."""
+        if not extracted:
+            return ""
+        parts = [f"{self.field_labels[field]}: {extracted[field]}" for field in self.required_fields
+                 if field in extracted]
+        return "Noted from your message - " + "; ".join(parts) + "."
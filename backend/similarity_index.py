@@ -0,0 +1,327 @@
+# backend/similarity_index.py
+"""
+Near-duplicate index over previously seen Secretary contexts.
+
+The panel mostly depends on the problem and the objective, so each is matched on its own, apart
+from the rest of the context, and all three must match before a panel is reused:
+  * The problem and the objective are each reduced to a set of normalized words (stop words dropped,
+    common suffixes stripped) and summarized by a 64-bit MinHash sketch: 8 slots of 8 bits. Two
+    texts agree on about as many slots as the share of words they have in common. Lookups are
+    banded on the problem sketch: any stored problem agreeing on one band of 2 slots is a candidate.
+    A candidate is kept when its problem and its objective each agree on at least
+    SIMILAR_PROBLEM_MIN_SIMILARITY of the slots.
+  * Every other field (persona, scenario, geography, constraints) goes into a 64-bit SimHash
+    fingerprint. A candidate's fingerprint must be within SIMILAR_CONTEXT_MAX_DISTANCE bits.
+A different problem asked by the same persona, in the same place and with the same objective,
+therefore does not reuse that panel, while a rewording that keeps most of the problem's words does.
+
+Signatures are persisted next to `expert_selections` in the `context_signatures` table, which
+database.initialize_db() creates. Only rows added since the last sync are hashed, so a restart over
+millions of stored contexts just reloads integers.
+"""
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+
+from backend.database import get_pool
+from config import settings
+
+# The other fields of two contexts may differ in at most this many fingerprint bits
+MAX_DISTANCE = settings.SIMILAR_CONTEXT_MAX_DISTANCE
+# Share of the problem and objective sketch slots two contexts must agree on (about their share of
+# common words)
+MIN_PROBLEM_SIMILARITY = settings.SIMILAR_PROBLEM_MIN_SIMILARITY
+# Minimum seconds between two syncs from the database
+SYNC_INTERVAL = 10.0
+SYNC_BATCH_SIZE = 5000
+
+SKETCH_SLOTS = 8
+SKETCH_BITS = 8
+BAND_SLOTS = 2
+
+PROBLEM_FIELDS = ("problem", "objective")
+_FIELD_ORDER = ("problem", "persona", "objective", "scenario", "geography", "constraints")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset("""
+    a about all also am an and any are as at be been being but by can could did do does doing for from
+    get got had has have having how i if in into is it its just me more most much my need no not now of
+    on or our out over really should so some than that the their them then there these they this those
+    though to too us very was we were what when which while who why will with would you your
+""".split())
+# Stripped longest first, only from words that keep at least four letters
+_SUFFIXES = ("ing", "ed", "es", "ly", "s")
+_SLOT_MASK = (1 << SKETCH_BITS) - 1
+_MASK64 = (1 << 64) - 1
+_LOW7 = 0x7F7F7F7F7F7F7F7F
+# simhash() keeps its 64 per-bit counts in lanes of one integer; _SPREAD[byte] puts each of the
+# byte's bits at the bottom of its own lane
+_LANE_BITS = 32
+_LANE_MASK = (1 << _LANE_BITS) - 1
+_SPREAD = [sum((byte >> bit & 1) << (bit * _LANE_BITS) for bit in range(8)) for byte in range(256)]
+# Stands in for a missing objective sketch in the index's arrays
+_NO_SKETCH = _MASK64
+
+
+def _log():
+    # The expert selection log, shared with backend/expert_manager.py
+    return settings.get_file_logger("expert_selection", "expert_selection.log")
+
+
+def _context_fields(user_context):
+    """The context as a dict; its JSON form is parsed, and any other text counts as the problem."""
+    if isinstance(user_context, str):
+        try:
+            parsed = json.loads(user_context)
+        except ValueError:
+            parsed = None
+        user_context = parsed if isinstance(parsed, dict) else {"problem": user_context}
+    if not isinstance(user_context, dict):
+        return {"problem": str(user_context)}
+    return user_context
+
+
+def _words(text):
+    """Lowercase words of text without stop words and with common suffixes stripped."""
+    words = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in _STOP_WORDS:
+            continue
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+                word = word[:-len(suffix)]
+                break
+        words.append(word)
+    return words
+
+
+def context_text(user_context):
+    """Flattens every field but the problem and objective into one lowercase string in field order."""
+    fields = _context_fields(user_context)
+    ordered = [str(fields.get(field) or "") for field in _FIELD_ORDER if field not in PROBLEM_FIELDS]
+    ordered += [str(value) for field, value in fields.items() if field not in _FIELD_ORDER]
+    return " ".join(ordered).lower()
+
+
+def minhash(words):
+    """
+    64-bit MinHash sketch of a word set: slot i holds the low SKETCH_BITS bits of the smallest i-th
+    hash over the words. Returns None for an empty set, which never matches.
+    """
+    if not words:
+        return None
+    digests = [hashlib.blake2b(word.encode("utf-8"), digest_size=8 * SKETCH_SLOTS).digest() for word in words]
+    sketch = 0
+    for slot in range(SKETCH_SLOTS):
+        # Equal-length big-endian byte strings compare like the integers they encode
+        smallest = min(digest[8 * slot:8 * slot + 8] for digest in digests)
+        sketch |= (int.from_bytes(smallest, "big") & _SLOT_MASK) << (slot * SKETCH_BITS)
+    return sketch
+
+
+def matching_slots(a, b):
+    """Number of slots on which two sketches agree."""
+    x = a ^ b
+    # SKETCH_BITS is 8, so a matching slot is a zero byte of x: only those keep their high bit here
+    return (~(((x & _LOW7) + _LOW7) | x | _LOW7) & _MASK64).bit_count()
+
+
+def simhash(text):
+    """64-bit SimHash over normalized words, weighted by term frequency."""
+    features = Counter(_words(text))
+    # One _LANE_BITS-wide counter per fingerprint bit, all added up in a single integer
+    counts = 0
+    for feature, weight in features.items():
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        spread = 0
+        for position, byte in enumerate(reversed(digest)):
+            spread |= _SPREAD[byte] << (position * 8 * _LANE_BITS)
+        counts += weight * spread
+    # A bit is set when the words that have it outweigh the words that do not
+    total = sum(features.values())
+    fingerprint = 0
+    for bit in range(64):
+        if 2 * (counts >> bit * _LANE_BITS & _LANE_MASK) > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def signature(user_context):
+    """
+    (problem sketch, objective sketch, fingerprint of the other fields) for a context dict or its
+    JSON form. A sketch is None when its field has no words.
+    """
+    fields = _context_fields(user_context)
+    problem, objective = (minhash(set(_words(str(fields.get(field) or "")))) for field in PROBLEM_FIELDS)
+    return problem, objective, simhash(context_text(fields))
+
+
+def _to_signed(value):
+    if value is None:
+        return None
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value):
+    return None if value is None else value & _MASK64
+
+
+class SimilarContextIndex:
+    """In-memory index mapping context signatures (see signature()) to expert panels."""
+
+    def __init__(self, max_distance=MAX_DISTANCE, min_problem_similarity=MIN_PROBLEM_SIMILARITY):
+        self.max_distance = max_distance
+        self.min_slots = math.ceil(min_problem_similarity * SKETCH_SLOTS)
+        band_bits = BAND_SLOTS * SKETCH_BITS
+        # (shift, mask) per band of BAND_SLOTS problem sketch slots
+        self._bands = [(shift, (1 << band_bits) - 1) for shift in range(0, 64, band_bits)]
+        self._tables = [{} for _ in self._bands]
+        self._problems = array("Q")
+        self._objectives = array("Q")
+        self._fingerprints = array("Q")
+        self._panel_ids = array("I")
+        self._panels = []
+        self._panel_lookup = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.last_synced_id = 0
+        self._last_sync = 0.0
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def add(self, problem, objective, fingerprint, experts):
+        """Stores a context's signature with the panel chosen for it. A context without a problem is skipped."""
+        if problem is None:
+            return
+        panel = tuple(experts)
+        with self._lock:
+            panel_id = self._panel_lookup.get(panel)
+            if panel_id is None:
+                panel_id = len(self._panels)
+                self._panels.append(panel)
+                self._panel_lookup[panel] = panel_id
+            row = len(self._fingerprints)
+            self._problems.append(problem)
+            self._objectives.append(_NO_SKETCH if objective is None else objective)
+            self._fingerprints.append(fingerprint)
+            self._panel_ids.append(panel_id)
+            for table, (shift, mask) in zip(self._tables, self._bands):
+                table.setdefault(problem >> shift & mask, []).append(row)
+
+    def _objective_matches(self, stored, objective):
+        if stored == _NO_SKETCH or objective is None:
+            # Only two contexts without an objective match on it
+            return stored == _NO_SKETCH and objective is None
+        return matching_slots(stored, objective) >= self.min_slots
+
+    def nearest(self, problem, objective, fingerprint):
+        """
+        Returns (panel, matching problem slots, distance) for the stored context whose problem matches
+        best, among those whose objective also matches and whose other fields are within max_distance
+        bits, or None.
+        """
+        if problem is None:
+            return None
+        best = None
+        seen = set()
+        with self._lock:
+            for table, (shift, mask) in zip(self._tables, self._bands):
+                for row in table.get(problem >> shift & mask, ()):
+                    if row in seen:
+                        continue
+                    seen.add(row)
+                    slots = matching_slots(self._problems[row], problem)
+                    if slots < self.min_slots or not self._objective_matches(self._objectives[row], objective):
+                        continue
+                    distance = (self._fingerprints[row] ^ fingerprint).bit_count()
+                    if distance > self.max_distance:
+                        continue
+                    if best is None or (slots, -distance) > (best[1], -best[2]):
+                        best = (row, slots, distance)
+            if best is None:
+                return None
+            return list(self._panels[self._panel_ids[best[0]]]), best[1], best[2]
+
+    def sync_from_db(self, db_path, force=False):
+        """
+        Adds expert_selections rows newer than the last sync.
+        Rows hashed for the first time have their signature saved to `context_signatures`.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_sync < SYNC_INTERVAL:
+            return 0
+        # Another thread already syncing is as good as syncing here
+        if not self._sync_lock.acquire(blocking=force):
+            return 0
+        self._last_sync = now
+        added = 0
+        try:
+            with get_pool(db_path).connection() as conn:
+                added = self._sync_rows(conn)
+        except sqlite3.OperationalError as e:
+            _log().warning(f"Could not sync the similar-context index: {e}")
+        finally:
+            self._sync_lock.release()
+        return added
+
+    def _sync_rows(self, conn):
+        added = 0
+        while True:
+            rows = conn.execute("""
+                SELECT s.id, s.user_input, s.selected_experts, c.problem, c.objective, c.fingerprint
+                FROM expert_selections s
+                LEFT JOIN context_signatures c ON c.selection_id = s.id
+                WHERE s.id > ? ORDER BY s.id LIMIT ?
+            """, (self.last_synced_id, SYNC_BATCH_SIZE)).fetchall()
+            if not rows:
+                break
+            new_signatures = []
+            for selection_id, user_input, selected, *stored in rows:
+                if stored[-1] is None:
+                    stored = signature(user_input or "")
+                    new_signatures.append((selection_id, *(_to_signed(value) for value in stored)))
+                else:
+                    stored = [_to_unsigned(value) for value in stored]
+                problem, objective, fingerprint = stored
+                experts = [name.strip() for name in (selected or "").split(",") if name.strip()]
+                if experts and problem is not None:
+                    self.add(problem, objective, fingerprint, experts)
+                    added += 1
+                self.last_synced_id = selection_id
+            if new_signatures:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT OR IGNORE INTO context_signatures VALUES (?, ?, ?, ?)", new_signatures)
+                conn.execute("COMMIT")
+        return added
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(db_path):
+    """Returns the process-wide index, synced incrementally from db_path."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SimilarContextIndex()
+    _index.sync_from_db(db_path)
+    return _index
+
+
+def find_similar_panel(user_context, db_path):
+    """Returns the panel stored for a near-duplicate of user_context, or None."""
+    match = get_index(db_path).nearest(*signature(user_context))
+    if match is None:
+        return None
+    experts, slots, distance = match
+    _log().info(f"Reusing panel of a similar context ({slots}/{SKETCH_SLOTS} problem slots, "
+                 f"distance {distance}): {experts}")
+    return experts
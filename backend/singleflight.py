@@ -0,0 +1,468 @@
+# backend/singleflight.py
+"""
+Coalescing of identical in-flight model requests.
+
+Callers that make the same request (same model, whitespace-normalized messages and parameters,
+i.e. the same completion-cache key) while an identical one is still running share it instead of
+paying for a second completion:
+  * In-process, the first caller opens a flight and the others subscribe to it. A flight is a
+    shared, buffered iterator over the upstream chunks. Every subscriber sees every chunk from the
+    first one, whichever subscriber pulled it from upstream. The upstream call runs under a
+    deadline of the flight's own, which lasts as long as the latest subscriber's, so no single
+    subscriber's deadline or cancellation ends it. A subscriber that stops reading (a Streamlit
+    rerun, a closed generator, its own deadline or cancellation) leaves without disturbing the
+    others. The upstream call is closed only when the last subscriber leaves. On the async path,
+    acomplete() callers await one shared task per request, and astream() callers subscribe to an
+    AsyncFlight, whose upstream stream is read by a task of its own on the event loop.
+  * Across processes, a flight that has the completion cache behind it first takes an advisory
+    lock on a slot of LOCK_FILE derived from the key (POSIX only), and tags the slot with its key.
+    If another process holds the slot for the same key, the flight waits for it, up to
+    COALESCE_WAIT seconds, and then reads the result from the cache. A slot held for an unrelated
+    key is not waited for: the call goes upstream without the lock. A streaming subscriber on the
+    waiting path receives the whole text as one chunk.
+stats() counts the flights started and the calls saved.
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from backend import deadlines, tracing
+from config import settings
+
+ENABLED = settings.LLM_COALESCE
+COALESCE_WAIT = settings.LLM_COALESCE_WAIT
+LOCK_FILE = settings.LLM_COALESCE_LOCK_FILE
+# Keys map onto this many lock slots of LOCK_FILE. The holder of a slot writes the first bytes of
+# its key there, so a caller can tell an identical call from an unrelated key sharing the slot.
+LOCK_SLOTS = 4096
+_TAG_BYTES = 8
+_NO_TAG = bytes(_TAG_BYTES)
+_LOCK_POLL = 0.05
+# How long a slot's new holder may take to tag it before it counts as unrelated
+_TAG_WAIT = 0.2
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: coalescing stays in-process
+    fcntl = None
+
+_END = object()
+
+
+def _extend(flight_deadline, first):
+    """Lets a flight's deadline run until the calling subscriber's deadline, if that is later."""
+    deadline = deadlines.current()
+    expires = deadline.expires if deadline is not None else None
+    if first:
+        flight_deadline.expires = expires
+    elif flight_deadline.expires is not None:
+        flight_deadline.expires = None if expires is None else max(flight_deadline.expires, expires)
+
+
+class Flight:
+    """One upstream call and the chunks it produced so far, shared by every subscriber."""
+
+    def __init__(self, key, source_factory, on_finish):
+        self.key = key
+        self.chunks = []
+        self.subscribers = 0
+        self._factory = source_factory
+        self._source = None
+        self._on_finish = on_finish
+        self._condition = threading.Condition()
+        self._pulling = False
+        self._done = False
+        self._error = None
+        # Upstream reads run in this context, under the flight's deadline rather than a subscriber's
+        self._deadline = deadlines.Deadline()
+        self._context = deadlines.context_for(self._deadline)
+
+    def join(self):
+        """Adds the calling subscriber, letting the upstream call run until its deadline too."""
+        with self._condition:
+            _extend(self._deadline, first=self.subscribers == 0)
+            self.subscribers += 1
+        return _Subscription(self)
+
+    def chunk(self, index):
+        """Returns chunk number index, pulling it from upstream if nobody else is; _END when finished."""
+        with self._condition:
+            while True:
+                if index < len(self.chunks):
+                    return self.chunks[index]
+                if self._error is not None:
+                    # A cancelled subscriber may be what abandoned the flight; it reports its own cancellation
+                    deadlines.check()
+                    raise self._error
+                if self._done:
+                    return _END
+                if not self._pulling:
+                    self._pulling = True
+                    break
+                # A subscriber waits no longer than its own deadline (backend/deadlines.py)
+                self._condition.wait(deadlines.remaining())
+                deadlines.check()
+        try:
+            if self._source is None:
+                self._source = self._context.run(lambda: iter(self._factory()))
+            chunk = self._context.run(next, self._source)
+        except StopIteration:
+            self._finish()
+            return _END
+        except Exception as e:
+            self._finish(e)
+            # A subscriber that was cancelled itself reports that, not the closed response
+            deadlines.check()
+            raise
+        except BaseException:
+            # Interrupted mid-read: the upstream generator cannot be resumed
+            self._finish(RuntimeError("The shared model call was interrupted"))
+            raise
+        with self._condition:
+            self.chunks.append(chunk)
+            self._pulling = False
+            self._condition.notify_all()
+        return chunk
+
+    def _finish(self, error=None):
+        with self._condition:
+            self._done = True
+            self._error = error
+            self._pulling = False
+            self._condition.notify_all()
+        self._on_finish(self)
+
+    def leave(self):
+        """
+        Drops one subscriber. The last one to leave an unfinished flight cancels the flight's
+        deadline, which closes the upstream response even while another thread is reading it.
+        """
+        with self._condition:
+            self.subscribers -= 1
+            abandoned = self.subscribers == 0 and not self._done
+            if abandoned:
+                self._done = True
+                self._error = RuntimeError("The shared model call was abandoned")
+            close = abandoned and self._source is not None and not self._pulling
+            # Subscribers waiting for a chunk re-check their own deadlines
+            self._condition.notify_all()
+        if abandoned:
+            self._deadline.cancel("The shared model call was abandoned.")
+            if close:
+                self._context.run(self._source.close)
+            self._on_finish(self)
+
+
+class _Subscription:
+    """One subscriber's place in a flight; leaving twice counts once."""
+
+    def __init__(self, flight):
+        self._flight = flight
+        self._lock = threading.Lock()
+        self._left = False
+
+    def leave(self):
+        with self._lock:
+            if self._left:
+                return
+            self._left = True
+        self._flight.leave()
+
+
+class AsyncFlight:
+    """
+    Async counterpart of Flight, bound to one event loop. A task of its own reads the upstream
+    stream, so a subscriber that is cancelled or stops reading does not interrupt it.
+    """
+
+    def __init__(self, key, source_factory, on_finish):
+        self.key = key
+        self.chunks = []
+        self.subscribers = 0
+        self._on_finish = on_finish
+        self._done = False
+        self._error = None
+        self._changed = asyncio.Event()
+        self._deadline = deadlines.Deadline()
+        self._task = None
+        self._factory = source_factory
+
+    def join(self):
+        _extend(self._deadline, first=self.subscribers == 0)
+        self.subscribers += 1
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(
+                self._read(), context=deadlines.context_for(self._deadline))
+
+    async def _read(self):
+        try:
+            async for chunk in self._factory():
+                self.chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            self._error = RuntimeError("The shared model call was abandoned")
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._notify()
+            self._on_finish(self)
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def chunk(self, index):
+        """Returns chunk number index once it has arrived; _END when finished."""
+        while True:
+            if index < len(self.chunks):
+                return self.chunks[index]
+            if self._error is not None:
+                raise self._error
+            if self._done:
+                return _END
+            try:
+                # A subscriber waits no longer than its own deadline
+                await asyncio.wait_for(self._changed.wait(), deadlines.remaining())
+            except TimeoutError:
+                deadlines.check()
+
+    def leave(self):
+        """Drops one subscriber; the last one to leave an unfinished flight stops its upstream read."""
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self._done:
+            self._deadline.cancel("The shared model call was abandoned.")
+            self._task.cancel()
+
+
+class FlightGroup:
+    """The flights in progress in this process, by request key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+        self._async_tasks = {}
+        self.started = 0
+        self.coalesced = 0
+        self.coalesced_cross_process = 0
+
+    def _remove(self, flight):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def _join(self, key, source_factory):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight(key, source_factory, self._remove)
+                self.started += 1
+                joined = False
+            else:
+                self.coalesced += 1
+                joined = True
+            subscription = flight.join()
+        if joined:
+            tracing.record(coalesced=1)
+        return flight, subscription
+
+    def subscribe(self, key, source_factory):
+        """
+        Yields the chunks of the flight for key, starting one with source_factory() (a callable
+        returning an iterator of chunks) when none is in progress.
+        """
+        flight, subscription = self._join(key, source_factory)
+        try:
+            # A cancelled subscriber stops counting at once, so cancelling the last one closes the call
+            with deadlines.on_cancel(subscription.leave):
+                index = 0
+                while True:
+                    chunk = flight.chunk(index)
+                    if chunk is _END:
+                        return
+                    # Each subscriber stops at its own deadline
+                    deadlines.check()
+                    yield chunk
+                    index += 1
+        finally:
+            subscription.leave()
+
+    async def subscribe_async(self, key, source_factory):
+        """
+        Async counterpart of subscribe(): yields the chunks of the flight for key on the running
+        loop, starting one with source_factory() (a callable returning an async iterator of chunks)
+        when none is in progress.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._async_flights.get((loop, key))
+            if flight is None:
+                flight = self._async_flights[(loop, key)] = AsyncFlight(
+                    key, source_factory, lambda done: self._remove_async(loop, done))
+                self.started += 1
+                joined = False
+            else:
+                self.coalesced += 1
+                joined = True
+        if joined:
+            tracing.record(coalesced=1)
+        flight.join()
+        try:
+            index = 0
+            while True:
+                chunk = await flight.chunk(index)
+                if chunk is _END:
+                    return
+                deadlines.check()
+                yield chunk
+                index += 1
+        finally:
+            flight.leave()
+
+    def _remove_async(self, loop, flight):
+        with self._lock:
+            if self._async_flights.get((loop, flight.key)) is flight:
+                del self._async_flights[(loop, flight.key)]
+
+    async def run_async(self, key, coroutine_factory):
+        """Awaits the one shared task for key, creating it with coroutine_factory() when none is running."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._async_tasks.get((loop, key))
+            if task is None:
+                # A task of its own, so a cancelled caller does not cancel the others' call
+                task = self._async_tasks[(loop, key)] = loop.create_task(coroutine_factory())
+                task.add_done_callback(lambda _: self._async_tasks.pop((loop, key), None))
+                self.started += 1
+                joined = False
+            else:
+                self.coalesced += 1
+                joined = True
+        if joined:
+            tracing.record(coalesced=1)
+        return await asyncio.shield(task)
+
+    def stats(self):
+        with self._lock:
+            return {"flights": self.started, "coalesced": self.coalesced,
+                    "coalesced_cross_process": self.coalesced_cross_process}
+
+
+flights = FlightGroup()
+
+_lock_fd = None
+_held_slots = {}
+_slots_lock = threading.Lock()
+
+
+def _lock_file():
+    global _lock_fd
+    if _lock_fd is None:
+        directory = os.path.dirname(LOCK_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Kept open for the life of the process: closing any descriptor drops all POSIX locks on the file
+        _lock_fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    return _lock_fd
+
+
+def _slot(key):
+    return int(key[:8], 16) % LOCK_SLOTS, bytes.fromhex(key[:2 * _TAG_BYTES])
+
+
+def _try_lock(slot, tag):
+    # POSIX record locks belong to the process, so threads share a slot through a count
+    with _slots_lock:
+        if _held_slots.get(slot):
+            _held_slots[slot] += 1
+            return True
+        try:
+            fcntl.lockf(_lock_file(), fcntl.LOCK_EX | fcntl.LOCK_NB, _TAG_BYTES, slot * _TAG_BYTES)
+        except OSError:
+            return False
+        os.pwrite(_lock_file(), tag, slot * _TAG_BYTES)
+        _held_slots[slot] = 1
+        return True
+
+
+def _unlock(slot):
+    with _slots_lock:
+        _held_slots[slot] -= 1
+        if not _held_slots[slot]:
+            del _held_slots[slot]
+            os.pwrite(_lock_file(), _NO_TAG, slot * _TAG_BYTES)
+            fcntl.lockf(_lock_file(), fcntl.LOCK_UN, _TAG_BYTES, slot * _TAG_BYTES)
+
+
+def _worth_waiting(slot, tag, started):
+    """
+    Whether to keep waiting for the other process holding slot: while it runs the identical call,
+    up to COALESCE_WAIT, or briefly while it has not tagged the slot yet. A slot held for an
+    unrelated key is not waited for.
+    """
+    holder = os.pread(_lock_file(), _TAG_BYTES, slot * _TAG_BYTES)
+    waited = time.monotonic() - started
+    if holder == tag:
+        return waited < COALESCE_WAIT
+    return holder.strip(b"\0") == b"" and waited < _TAG_WAIT
+
+
+@contextmanager
+def cross_process(key):
+    """
+    Holds key's lock slot for the duration of the block. Yields True when another process held it
+    for the same key first, in which case its result should be looked up before calling upstream.
+    Without POSIX locks, after COALESCE_WAIT seconds of waiting, or when the slot is held for an
+    unrelated key, the block runs without the lock.
+    """
+    if fcntl is None:
+        yield False
+        return
+    slot, tag = _slot(key)
+    waited = False
+    started = time.monotonic()
+    locked = _try_lock(slot, tag)
+    while not locked and _worth_waiting(slot, tag, started):
+        waited = True
+        deadlines.sleep(_LOCK_POLL)
+        locked = _try_lock(slot, tag)
+    try:
+        yield waited
+    finally:
+        if locked:
+            _unlock(slot)
+
+
+@asynccontextmanager
+async def across_process(key):
+    """Async counterpart of cross_process(); waits without blocking the event loop."""
+    if fcntl is None:
+        yield False
+        return
+    slot, tag = _slot(key)
+    waited = False
+    started = time.monotonic()
+    locked = _try_lock(slot, tag)
+    while not locked and _worth_waiting(slot, tag, started):
+        waited = True
+        await deadlines.asleep(_LOCK_POLL)
+        locked = _try_lock(slot, tag)
+    try:
+        yield waited
+    finally:
+        if locked:
+            _unlock(slot)
+
+
+def record_cross_process_hit():
+    with flights._lock:
+        flights.coalesced_cross_process += 1
+    tracing.record(coalesced=1)
+
+
+def stats():
+    """Flights started, and calls saved in this process and by waiting on other processes."""
+    return flights.stats()
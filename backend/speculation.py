@@ -0,0 +1,109 @@
+# backend/speculation.py
+"""
+Speculative expert selection.
+
+What the problem is and who is facing it decide most of the expert panel, so selection can start as
+soon as the Secretary has the `problem` and `persona` fields, while the user is still answering the
+remaining questions. A speculative selection remembers the fields it was started from and stays
+valid while those fields say materially the same thing. Once it has finished, the answers given
+since start a refined one, so the panel has seen as much of the context as there was time for.
+When the last field lands, the UI commits the speculative result instead of paying for a fresh
+selection round trip on the critical path.
+"""
+import contextvars
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.expert_manager import select_experts
+
+# Fields that must be known before a speculative selection is worth starting
+TRIGGER_FIELDS = ("problem", "persona")
+# Word overlap (Jaccard) below which the fields a selection was based on count as materially changed
+MIN_SIMILARITY = 0.6
+
+# Shared by every session so speculation never holds more than a few threads per process
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculative-select")
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _words(context, fields):
+    text = " ".join(str(context.get(field) or "") for field in fields)
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def _similarity(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class SpeculativeExpertSelector:
+    """
+    Runs select_experts in the background once the trigger fields are known.
+
+    Call observe() after every Secretary answer and commit() once the context is complete. At most
+    one speculative selection runs at a time: a started selection cannot be stopped, so answers
+    that arrive while it runs wait for it to finish before refining it. A selection is only
+    replaced while running when a field it was based on changes materially. commit() and peek()
+    compare the final context with the latest selection on the fields that selection was based
+    on, and fall back to a fresh selection when they differ.
+    """
+
+    def __init__(self, select=select_experts, min_similarity=MIN_SIMILARITY):
+        self._select = select
+        self._min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._future = None
+        self._basis = {}
+        self.started = 0
+        self.restarts = 0
+
+    def _matches(self, context):
+        fields = list(self._basis)
+        return _similarity(_words(self._basis, fields), _words(context, fields)) >= self._min_similarity
+
+    def _answered_since(self, context):
+        return any(value and field not in self._basis for field, value in context.items())
+
+    def observe(self, context):
+        """Starts, keeps, refines or restarts the speculative selection for the context gathered so far."""
+        if not all(context.get(field) for field in TRIGGER_FIELDS):
+            return
+        with self._lock:
+            if self._future is not None:
+                if self._matches(context):
+                    if not self._future.done() or not self._answered_since(context):
+                        return
+                else:
+                    self.restarts += 1
+                    logging.info("Speculative expert selection invalidated, restarting")
+            self._basis = {field: value for field, value in context.items() if value}
+            # Run in a copy of the caller's context so the selection is traced under its meeting
+            self._future = _executor.submit(contextvars.copy_context().run, self._select, dict(context))
+            self.started += 1
+
+    def _speculated(self, context):
+        with self._lock:
+            if self._future is None or not self._matches(context):
+                return None
+            return self._future
+
+    def commit(self, context, timeout=None):
+        """
+        Returns the expert panel for the completed context: the speculative selection's, waiting for
+        it if it is still running, or a fresh selection when there is none that still matches.
+        """
+        future = self._speculated(context)
+        if future is None:
+            return self._select(context)
+        return future.result(timeout=timeout)
+
+    def peek(self, context):
+        """The speculative panel for the completed context if it is already selected, without waiting; else None."""
+        future = self._speculated(context)
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
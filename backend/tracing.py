@@ -0,0 +1,326 @@
+# backend/tracing.py
+"""
+Per-stage trace spans for the meeting pipeline.
+
+A span times one stage (Secretary answer, expert selection, discussion, follow-up, a single model
+call) and collects what happened inside it: prompt and completion tokens, estimated cost, HTTP
+attempts and retries, completion-cache hits and misses, calls coalesced into an identical one
+already in flight, time spent queued for rate-limit capacity or a request slot, and time spent in
+the database. Spans nest through a context variable, and a finished span adds its counters to its
+parent, so a stage span also accounts for the model calls and queries it made. Every span carries the meeting ID
+set by meeting().
+
+Finished spans go to the configured exporters (TRACING_EXPORTERS in config/settings.py):
+  * "jsonl"      - one JSON object per span appended to TRACE_FILE;
+  * "prometheus" - aggregated per-stage counters and a latency histogram, rendered in the
+                   Prometheus text format and served on TRACING_PROMETHEUS_PORT.
+Other exporters can be added with add_exporter(). With no exporter configured tracing is off:
+span() hands back a shared no-op object and record() returns after one context lookup.
+"""
+import contextvars
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# USD per 1K (prompt, completion) tokens; models not listed are traced without a cost
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+# Latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Counters every span carries; a finished span adds them to its parent
+COUNTERS = ("prompt_tokens", "completion_tokens", "cost_usd", "llm_calls", "attempts",
+            "cache_hits", "cache_misses", "coalesced", "hedged", "db_calls", "db_time", "queue_wait", "errors")
+
+_current_span = contextvars.ContextVar("trace_span", default=None)
+_current_meeting = contextvars.ContextVar("trace_meeting", default=None)
+
+_exporters = None
+_exporters_lock = threading.Lock()
+# Guards counter updates; children can finish on other threads than their parent
+_counters_lock = threading.Lock()
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """One timed stage of a meeting and the counters collected while it ran."""
+
+    __slots__ = ("name", "meeting_id", "span_id", "parent", "attrs", "start", "duration", "error",
+                 "_started", "_token") + COUNTERS
+
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.parent = parent
+        self.meeting_id = _current_meeting.get()
+        self.span_id = next(_span_ids)
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self._started = time.perf_counter()
+        self._token = None
+        for counter in COUNTERS:
+            setattr(self, counter, 0)
+
+    @property
+    def retries(self):
+        """HTTP attempts beyond the first for each model call that reached the API."""
+        return max(0, self.attempts - self.llm_calls)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, **counters):
+        with _counters_lock:
+            for counter, value in counters.items():
+                setattr(self, counter, getattr(self, counter) + value)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.error = f"{exc_type.__name__}: {exc}"
+            self.add(errors=1)
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # A generator span closed from another context; just restore the parent there
+            _current_span.set(self.parent)
+        if self.parent is not None:
+            self.parent.add(**{counter: getattr(self, counter) for counter in COUNTERS})
+        for exporter in _get_exporters():
+            exporter.export(self)
+        return False
+
+    def to_dict(self):
+        record = {
+            "name": self.name,
+            "meeting_id": self.meeting_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "start": self.start,
+            "duration": self.duration,
+            "error": self.error,
+            "retries": self.retries,
+            **{counter: getattr(self, counter) for counter in COUNTERS},
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        return record
+
+
+class _NoopSpan:
+    """Stands in for a span while tracing is off."""
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, **counters):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class JsonLinesExporter:
+    """Appends each finished span as one JSON line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span):
+        import json
+
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+
+class PrometheusExporter:
+    """
+    Aggregates spans per stage name into counters and a latency histogram.
+    Counters include those of child spans, so sum them per stage rather than across stages.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def export(self, span):
+        with self._lock:
+            stage = self._stages.get(span.name)
+            if stage is None:
+                stage = self._stages[span.name] = {"count": 0, "seconds": 0.0, "retries": 0,
+                                                   "buckets": [0] * len(BUCKETS),
+                                                   **{counter: 0 for counter in COUNTERS}}
+            stage["count"] += 1
+            stage["seconds"] += span.duration
+            stage["retries"] += span.retries
+            for counter in COUNTERS:
+                stage[counter] += getattr(span, counter)
+            for i, bound in enumerate(BUCKETS):
+                if span.duration <= bound:
+                    stage["buckets"][i] += 1
+
+    def render(self):
+        """Returns the aggregated metrics in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {name: dict(stage, buckets=list(stage["buckets"])) for name, stage in self._stages.items()}
+        lines = ["# HELP meeting_stage_seconds Wall time of each pipeline stage.",
+                 "# TYPE meeting_stage_seconds histogram"]
+        for name, stage in sorted(stages.items()):
+            for bound, count in zip(BUCKETS, stage["buckets"]):
+                lines.append(f'meeting_stage_seconds_bucket{{stage="{name}",le="{bound:g}"}} {count}')
+            lines.append(f'meeting_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {stage["count"]}')
+            lines.append(f'meeting_stage_seconds_sum{{stage="{name}"}} {stage["seconds"]:.6f}')
+            lines.append(f'meeting_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+        for counter in COUNTERS + ("retries",):
+            metric = f"meeting_stage_{counter}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for name, stage in sorted(stages.items()):
+                lines.append(f'{metric}{{stage="{name}"}} {stage[counter]:g}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host="127.0.0.1", port=0):
+        """Serves render() at /metrics from a daemon thread. Returns the server."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="trace-metrics", daemon=True).start()
+        return server
+
+
+def _configure():
+    # Settings are read here rather than at import: the Secretary imports this module and must
+    # stay cheap to import on its own
+    from config import settings
+
+    exporters = []
+    for name in filter(None, (part.strip().lower() for part in settings.TRACING_EXPORTERS.split(","))):
+        if name == "jsonl":
+            exporters.append(JsonLinesExporter(settings.TRACE_FILE))
+        elif name == "prometheus":
+            exporter = PrometheusExporter()
+            if settings.TRACING_PROMETHEUS_PORT:
+                exporter.serve(settings.TRACING_PROMETHEUS_HOST, settings.TRACING_PROMETHEUS_PORT)
+            exporters.append(exporter)
+        else:
+            raise ValueError(f"Unknown trace exporter {name!r}; expected 'jsonl' or 'prometheus'")
+    return exporters
+
+
+def _get_exporters():
+    global _exporters
+    exporters = _exporters
+    if exporters is None:
+        with _exporters_lock:
+            if _exporters is None:
+                _exporters = _configure()
+            exporters = _exporters
+    return exporters
+
+
+def add_exporter(exporter):
+    """Registers an object with an export(span) method, turning tracing on if it was off."""
+    global _exporters
+    with _exporters_lock:
+        current = _exporters if _exporters is not None else _configure()
+        _exporters = current + [exporter]
+    return exporter
+
+
+def enabled():
+    return bool(_get_exporters())
+
+
+def get_exporter(kind):
+    """Returns the first configured exporter of the given class, or None."""
+    return next((exporter for exporter in _get_exporters() if isinstance(exporter, kind)), None)
+
+
+@contextmanager
+def meeting(meeting_id=None):
+    """Tags every span opened inside the block with meeting_id (a fresh one when not given)."""
+    token = _current_meeting.set(meeting_id or os.urandom(16).hex())
+    try:
+        yield _current_meeting.get()
+    finally:
+        _current_meeting.reset(token)
+
+
+def current_meeting():
+    return _current_meeting.get()
+
+
+def span(name, **attrs):
+    """Returns a context manager timing one stage as a child of the current span."""
+    if not _get_exporters():
+        return _NOOP_SPAN
+    return Span(name, _current_span.get(), attrs)
+
+
+def record(**counters):
+    """Adds to the counters of the current span; does nothing outside a span."""
+    current = _current_span.get()
+    if current is not None:
+        current.add(**counters)
+
+
+def annotate(**attrs):
+    """Sets attributes on the current span; does nothing outside a span."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+def record_usage(model, prompt_tokens, completion_tokens):
+    """Records a model call's token usage and its estimated cost on the current span."""
+    if _current_span.get() is None:
+        return
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    record(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+           cost_usd=(prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000)
+
@@ -0,0 +1,228 @@
+# backend/write_queue.py
+"""
+Write-behind queue for analytics and logging inserts.
+
+Request handlers enqueue (sql, params) pairs and return immediately. A background thread drains the
+queue and writes each batch with executemany inside one transaction, once the batch reaches
+`batch_size` rows or `flush_interval` seconds have passed. The queue is bounded. When it is full,
+producers wait up to `put_timeout` and then write synchronously, so a stalled disk slows callers
+down instead of growing memory without limit.
+
+Batches that cannot be written (the database is locked or the disk is unavailable) are appended
+to a JSON-lines spill file (WRITE_QUEUE_SPILL_FILE) and replayed the next time a queue starts.
+Pending events are drained on a normal exit. The queue is not durable, though: a process killed
+outright (SIGKILL, the OOM killer, a power loss) loses every event still in memory, up to
+MAX_PENDING queued ones plus the batch being written. Only the spill file survives that. Nothing
+that must not be lost should go through this queue.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from backend.database import get_pool
+from config import settings
+
+MAX_PENDING = 10000
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 0.5  # seconds
+PUT_TIMEOUT = 1.0  # seconds a producer waits on a full queue before writing synchronously
+FLUSH_RETRIES = 3
+SPILL_PATH = settings.WRITE_QUEUE_SPILL_FILE
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Buffers INSERT statements in memory and flushes them to SQLite in batches."""
+
+    def __init__(self, db_name=None, max_pending=MAX_PENDING, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, put_timeout=PUT_TIMEOUT, spill_path=SPILL_PATH):
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.sync_fallbacks = 0
+        self.spilled = 0
+        self.dropped = 0
+
+    def start(self):
+        """Starts the background writer (idempotent) after replaying any spilled events."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._replay_spill()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def submit(self, sql, params):
+        """Queues one statement. Blocks for at most put_timeout when the queue is full."""
+        self.start()
+        with self._stats_lock:
+            self.submitted += 1
+        try:
+            self._queue.put((sql, tuple(params)), timeout=self.put_timeout)
+        except queue.Full:
+            # Backpressure: the writer is behind, so this caller pays for its own write
+            with self._stats_lock:
+                self.sync_fallbacks += 1
+            self._write_batch([(sql, tuple(params))])
+
+    def flush(self):
+        """Blocks until every event queued so far has been written (or spilled)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Drains pending events and stops the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "pending": self._queue.qsize(),
+                "submitted": self.submitted,
+                "written": self.written,
+                "batches": self.batches,
+                "sync_fallbacks": self.sync_fallbacks,
+                "spilled": self.spilled,
+                "dropped": self.dropped,
+            }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        for attempt in range(FLUSH_RETRIES):
+            try:
+                self._execute(batch)
+                with self._stats_lock:
+                    self.written += len(batch)
+                    self.batches += 1
+                return
+            except sqlite3.IntegrityError:
+                # One bad row must not sink the rest of the batch
+                self._write_rows_individually(batch)
+                return
+            except Exception as e:
+                logging.warning(f"Write-behind flush failed (attempt {attempt + 1}): {e}")
+                time.sleep(0.1 * 2 ** attempt)
+        self._spill(batch)
+
+    def _execute(self, batch):
+        with get_pool(self.db_name).transaction() as conn:
+            # executemany over consecutive runs of the same statement keeps insert order intact
+            start = 0
+            while start < len(batch):
+                sql = batch[start][0]
+                end = start
+                while end < len(batch) and batch[end][0] == sql:
+                    end += 1
+                conn.executemany(sql, [params for _, params in batch[start:end]])
+                start = end
+
+    def _write_rows_individually(self, batch):
+        for row in batch:
+            try:
+                self._execute([row])
+                with self._stats_lock:
+                    self.written += 1
+            except sqlite3.IntegrityError as e:
+                logging.error(f"Dropping write-behind event that violates a constraint: {e}")
+                with self._stats_lock:
+                    self.dropped += 1
+            except Exception:
+                self._spill([row])
+
+    def _spill(self, batch):
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for sql, params in batch:
+                    f.write(json.dumps({"sql": sql, "params": params}) + "\n")
+            with self._stats_lock:
+                self.spilled += len(batch)
+            logging.error(f"Spilled {len(batch)} write-behind events to {self.spill_path}")
+        except OSError as e:
+            logging.error(f"Lost {len(batch)} write-behind events, spill failed: {e}")
+            with self._stats_lock:
+                self.dropped += len(batch)
+
+    def _replay_spill(self):
+        replay_path = self.spill_path + ".replay"
+        # A leftover .replay file means the previous process died mid-replay; finish it first
+        if not os.path.exists(replay_path):
+            if not os.path.exists(self.spill_path):
+                return
+            os.replace(self.spill_path, replay_path)
+        batch = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    event = json.loads(line)
+                    batch.append((event["sql"], tuple(event["params"])))
+        logging.info(f"Replaying {len(batch)} spilled write-behind events")
+        for start in range(0, len(batch), self.batch_size):
+            self._write_batch(batch[start:start + self.batch_size])
+        os.remove(replay_path)
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    """Returns the process-wide write-behind queue for the application database."""
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteBehindQueue()
+                atexit.register(_write_queue.close)
+    return _write_queue
+
+
+def enqueue(sql, params):
+    """Queues one statement on the application database's write-behind queue."""
+    get_write_queue().submit(sql, params)
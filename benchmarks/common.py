@@ -0,0 +1,74 @@
+# benchmarks/common.py
+"""Helpers shared by the benchmark scripts: baseline storage, regression checks and sample data."""
+import json
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+# A measurement regresses when it is slower than baseline * TOLERANCE + slack
+TOLERANCE = 1.5
+
+SAMPLE_CONTEXT = {
+    "problem": "Sales have been declining despite increased marketing efforts.",
+    "persona": "Owner of a small retail business",
+    "objective": "Increase sales and customer engagement",
+    "scenario": "The business is located in a competitive urban area",
+    "geography": "Lagos, Nigeria",
+    "constraints": "Limited budget and staffing",
+}
+SAMPLE_ANSWERS = [SAMPLE_CONTEXT[field] for field in
+                  ("problem", "persona", "objective", "scenario", "geography", "constraints")]
+SAMPLE_EXPERTS = ["Business Strategy Expert", "Financial Expert", "Marketing Specialist"]
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def save_baseline(baseline):
+    with open(BASELINE_PATH, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def is_regression(seconds, budget, slack):
+    return budget is not None and seconds > budget * TOLERANCE + slack
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of values (q in 0-100); None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def isolated_environment(base_url=None):
+    """
+    Points the app at a throwaway working directory (databases, logs, caches) and, when given, at a
+    fake LLM endpoint. Must run before any backend module is imported, since settings are read once.
+    Returns the working directory.
+    """
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.environ["APP_DB"] = os.path.join(workdir, "app_data.sqlite")
+    os.environ["LLM_CACHE_DB"] = os.path.join(workdir, "llm_cache.sqlite")
+    os.environ["LLM_CACHE_DISABLED"] = "1"
+    os.environ["LOG_DIR"] = os.path.join(workdir, "logs")
+    os.environ["OPENAI_API_KEY"] = "sk-fake"
+    # Benchmarks measure the app, not an account's rate limits; the load test can set them
+    os.environ.setdefault("LLM_RPM_LIMIT", "0")
+    os.environ.setdefault("LLM_TPM_LIMIT", "0")
+    os.environ.setdefault("MEETING_LIMIT", "0")
+    if base_url:
+        os.environ["OPENAI_BASE_URL"] = base_url
+    os.chdir(workdir)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    return workdir
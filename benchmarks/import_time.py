@@ -0,0 +1,108 @@
+# benchmarks/import_time.py
+"""
+Cold-start guard for the app's entry points.
+
+Imports each module in a fresh interpreter, without an OPENAI_API_KEY and from an empty working
+directory, and checks two things:
+  * the median import time stays within the recorded baseline (plus tolerance);
+  * the import has no side effects: it raises nothing and creates no files or directories.
+
+Usage:
+    python benchmarks/import_time.py                    # compare against benchmarks/baseline.json
+    python benchmarks/import_time.py --update-baseline  # record the current timings
+Exits with status 1 on any regression, so it can gate CI.
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import REPO_ROOT, is_regression, load_baseline, save_baseline
+
+SECTION = "import_time"
+
+MODULES = [
+    "config.settings",
+    "backend.secretary",
+    "backend.expert_manager",
+    "backend.ai_processing",
+    "main",
+    "frontend.ui",
+]
+# Modules that can only be imported when an optional package is installed
+REQUIRES = {"frontend.ui": "streamlit"}
+
+# Absolute slack on top of the relative tolerance, in seconds
+SLACK = 0.02
+
+_PROBE = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(module, runs):
+    """Returns (median seconds, files created) for importing module in fresh interpreters."""
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    timings = []
+    created = set()
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            result = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)],
+                                    cwd=workdir, env=env, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"importing {module} failed:\n{result.stderr.strip()}")
+            timings.append(float(result.stdout.strip().splitlines()[-1]))
+            created.update(os.listdir(workdir))
+    return statistics.median(timings), sorted(created)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline()
+    recorded = baseline.get(SECTION, {})
+    current = {}
+    failures = []
+    for module in MODULES:
+        required = REQUIRES.get(module)
+        if required and importlib.util.find_spec(required) is None:
+            print(f"{module:<28} skipped ({required} not installed)")
+            continue
+        try:
+            seconds, created = measure(module, args.runs)
+        except RuntimeError as e:
+            failures.append(str(e))
+            continue
+        current[module] = round(seconds, 4)
+        budget = recorded.get(module)
+        status = "ok"
+        if created:
+            status = f"SIDE EFFECTS: created {', '.join(created)}"
+            failures.append(f"{module} created {created} on import")
+        elif is_regression(seconds, budget, SLACK):
+            status = f"REGRESSION (baseline {budget * 1000:.1f} ms)"
+            failures.append(f"{module} took {seconds * 1000:.1f} ms, baseline {budget * 1000:.1f} ms")
+        print(f"{module:<28} {seconds * 1000:8.1f} ms  {status}")
+
+    if args.update_baseline:
+        baseline[SECTION] = {**recorded, **current}
+        save_baseline(baseline)
+        print("Baseline updated")
+        return 0
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+# benchmarks/load_test.py
+"""
+Concurrent-session load generator.
+
+Drives simulated users through the full meeting flow against the fake OpenAI-compatible server in
+backend/fake_llm.py. Each meeting is: the quota admission (backend/admission.py), the six
+Secretary answers, select_experts, generate_expert_discussion, one generate_extra_followup_response,
+and the session bookkeeping writes the UI makes. Concurrency is ramped level by level. For each level the script reports:
+  * throughput in meetings per second;
+  * p50/p95/p99 latency per stage and for the whole meeting;
+  * error rates;
+  * SQLite contention: connection pool waits and time spent waiting, plus write-queue fallbacks;
+  * model-call queueing, retries and rejections from backend/resilience.py, and the calls saved
+    by coalescing identical requests (backend/singleflight.py).
+At the end it prints the latency, tokens, models and hedged requests of each model route
+(backend/model_router.py). Meetings and follow-ups run under the same deadlines as in the UI
+(backend/deadlines.py).
+It stops at the saturation point, where adding users no longer buys throughput or p95 latency has
+blown up.
+
+Usage:
+    python benchmarks/load_test.py                                   # ramp 1, 2, 4, ... 64 users
+    python benchmarks/load_test.py --levels 4,16,64 --meetings 5
+    python benchmarks/load_test.py --latency 0.5 --tokens-per-second 60 --failure-rate 0.02
+    python benchmarks/load_test.py --model-latency gpt-4=0.8,gpt-4o-mini=0.1     # model tiers
+    python benchmarks/load_test.py --rpm 500 --tpm 150000                # with account rate limits
+    python benchmarks/load_test.py --slow-rate 0.05 --slow-latency 2 --hedge    # tail latency, hedged
+    python benchmarks/load_test.py --json results.json               # also write the raw report
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from common import REPO_ROOT, SAMPLE_CONTEXT, isolated_environment, percentile
+
+STAGES = ("admission", "secretary", "select_experts", "discussion", "followup", "storage", "meeting")
+PERCENTILES = (50, 95, 99)
+FOLLOWUP_QUESTION = "Which option should I start with, and what would make you change your mind?"
+
+# A level is past saturation when throughput grows less than this fraction over the previous level...
+MIN_THROUGHPUT_GAIN = 0.10
+# ...or when meeting p95 exceeds this multiple of the p95 at the lowest level
+MAX_P95_GROWTH = 3.0
+
+# Words mixed into each meeting's problem so selection and the similarity index see varied traffic
+_VOCABULARY = ("cash", "loan", "hiring", "supplier", "launch", "pricing", "app", "lawsuit", "franchise",
+               "restaurant", "farm", "clinic", "investor", "branding", "inventory", "partner", "export")
+
+
+class StageRecorder:
+    """Thread-safe latency and error bookkeeping for one concurrency level."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {stage: [] for stage in STAGES}
+        self.errors = {stage: 0 for stage in STAGES}
+
+    def record(self, stage, seconds, failed=False):
+        with self._lock:
+            self.latencies[stage].append(seconds)
+            if failed:
+                self.errors[stage] += 1
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for stage in STAGES:
+                values = self.latencies[stage]
+                calls = len(values)
+                result[stage] = {
+                    "calls": calls,
+                    "errors": self.errors[stage],
+                    "error_rate": self.errors[stage] / calls if calls else 0.0,
+                    **{f"p{q}": percentile(values, q) for q in PERCENTILES},
+                }
+            return result
+
+
+def _is_error(result):
+    return isinstance(result, str) and result.startswith("Error generating")
+
+
+def _meeting_answers(rng):
+    """The simulated user's answer for each Secretary field."""
+    problem = f"{SAMPLE_CONTEXT['problem']} We are weighing {' and '.join(rng.sample(_VOCABULARY, 3))}."
+    return dict(SAMPLE_CONTEXT, problem=problem)
+
+
+def run_meeting(recorder, rng, session_id):
+    """Runs one full meeting for a simulated user, recording each stage. Returns True on success."""
+    from backend import admission, ai_processing, deadlines, expert_manager, tracing
+    from backend.logger import log_followup, log_interaction, log_transcript
+    from backend.meeting_memory import MeetingMemory
+    from backend.secretary import Secretary
+
+    # Every stage of one meeting is traced under the same meeting ID (see backend/tracing.py)
+    with tracing.meeting() as meeting_id:
+        failed = False
+        meeting_start = time.perf_counter()
+
+        def stage(name, func, *args):
+            nonlocal failed
+            start = time.perf_counter()
+            try:
+                result = func(*args)
+                error = _is_error(result)
+            except Exception:
+                result, error = None, True
+            recorder.record(name, time.perf_counter() - start, error)
+            failed = failed or error
+            return result
+
+        def interview():
+            secretary = Secretary()
+            answers = _meeting_answers(rng)
+            response = secretary.analyze_input(answers["problem"])
+            while response["status"] == "incomplete":
+                field = response["missing_field"]
+                response = secretary.analyze_input(answers[field], field_being_answered=field)
+            return secretary.context
+
+        # Quota check and atomic increment, as the UI does before a meeting's first model call
+        stage("admission", admission.admit, session_id)
+        context = stage("secretary", interview) or dict(SAMPLE_CONTEXT)
+        with deadlines.scope():
+            experts = stage("select_experts", expert_manager.select_experts, context) or []
+            discussion = stage("discussion", ai_processing.generate_expert_discussion, context, experts) or ""
+        memory = MeetingMemory.from_discussion(context, experts, discussion)
+        with deadlines.scope():
+            reply = stage("followup", ai_processing.generate_extra_followup_response, FOLLOWUP_QUESTION, context,
+                          experts, memory) or ""
+
+        def bookkeeping():
+            log_interaction(session_id, json.dumps(context), experts)
+            log_transcript(session_id, meeting_id, context, experts, discussion)
+            log_followup(meeting_id, FOLLOWUP_QUESTION, reply)
+
+        stage("storage", bookkeeping)
+        recorder.record("meeting", time.perf_counter() - meeting_start, failed)
+        return not failed
+
+
+def run_level(users, meetings_per_user, seed):
+    """Runs `users` concurrent simulated users, each holding `meetings_per_user` meetings."""
+    from backend import database, resilience, singleflight
+    from backend.write_queue import get_write_queue
+
+    recorder = StageRecorder()
+    pool_before = database.pool_stats()
+    queue_before = get_write_queue().stats()
+    llm_before = {**resilience.stats(), **singleflight.stats()}
+    start_gate = threading.Barrier(users)
+
+    def user(index):
+        rng = random.Random(seed * 100003 + index)
+        session_id = f"load-{uuid.uuid4().hex[:12]}"
+        start_gate.wait()
+        return sum(run_meeting(recorder, rng, session_id) for _ in range(meetings_per_user))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users, thread_name_prefix="load-user") as executor:
+        succeeded = sum(executor.map(user, range(users)))
+    elapsed = time.perf_counter() - start
+
+    get_write_queue().flush()
+    pool_after = database.pool_stats()
+    queue_after = get_write_queue().stats()
+    llm_after = {**resilience.stats(), **singleflight.stats()}
+    meetings = users * meetings_per_user
+    return {
+        "users": users,
+        "meetings": meetings,
+        "succeeded": succeeded,
+        "elapsed": elapsed,
+        "throughput": meetings / elapsed if elapsed else 0.0,
+        "stages": recorder.summary(),
+        "sqlite": {
+            "pool_waits": pool_after["waits"] - pool_before["waits"],
+            "pool_wait_time": pool_after["wait_time"] - pool_before["wait_time"],
+            "acquisitions": pool_after["acquisitions"] - pool_before["acquisitions"],
+            "rollbacks": pool_after["rollbacks"] - pool_before["rollbacks"],
+            "queue_sync_fallbacks": queue_after["sync_fallbacks"] - queue_before["sync_fallbacks"],
+            "queue_spilled": queue_after["spilled"] - queue_before["spilled"],
+        },
+        "llm": {name: llm_after[name] - llm_before[name] for name in
+                ("calls", "queued", "queue_wait", "retries", "rejected_rate_limit", "rejected_open",
+                 "coalesced", "coalesced_cross_process")},
+    }
+
+
+def saturation_reason(level, previous, first):
+    """Returns why `level` is past saturation compared to the previous and first levels, or None."""
+    if previous is not None and level["throughput"] < previous["throughput"] * (1 + MIN_THROUGHPUT_GAIN):
+        return (f"throughput {level['throughput']:.2f}/s gained less than {MIN_THROUGHPUT_GAIN:.0%} "
+                f"over {previous['users']} users")
+    base_p95 = first["stages"]["meeting"]["p95"]
+    p95 = level["stages"]["meeting"]["p95"]
+    if base_p95 and p95 and p95 > base_p95 * MAX_P95_GROWTH:
+        return f"meeting p95 {p95:.3f}s is over {MAX_P95_GROWTH:g}x the {first['users']}-user p95"
+    return None
+
+
+def _ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+def print_level(level):
+    sqlite = level["sqlite"]
+    print(f"\n== {level['users']} users: {level['meetings']} meetings in {level['elapsed']:.2f}s, "
+          f"{level['throughput']:.2f} meetings/s, {level['meetings'] - level['succeeded']} failed")
+    print(f"   {'stage':<16}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}")
+    for stage, row in level["stages"].items():
+        print(f"   {stage:<16}{_ms(row['p50']):>9}{_ms(row['p95']):>9}{_ms(row['p99']):>9}"
+              f"{row['error_rate']:>9.1%}")
+    print(f"   sqlite: {sqlite['pool_waits']} pool waits ({sqlite['pool_wait_time'] * 1000:.1f} ms) over "
+          f"{sqlite['acquisitions']} checkouts, {sqlite['rollbacks']} rollbacks, "
+          f"{sqlite['queue_sync_fallbacks']} queue sync fallbacks, {sqlite['queue_spilled']} spilled")
+    llm = level["llm"]
+    print(f"   llm: {llm['calls']} calls, {llm['queued']} queued ({llm['queue_wait'] * 1000:.0f} ms), "
+          f"{llm['retries']} retries, {llm['rejected_rate_limit']} rate-limit rejections, "
+          f"{llm['rejected_open']} circuit-open rejections, "
+          f"{llm['coalesced'] + llm['coalesced_cross_process']} coalesced")
+
+
+def print_routes(routes):
+    print(f"\nModel routes ({routes['downgrades']} tier downgrades)")
+    print(f"   {'call site':<20}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'tokens':>9}{'hedged':>10}  models")
+    for call_site, row in sorted(routes["routes"].items()):
+        models = ", ".join(f"{model} x{count}" for model, count in row["models"].items())
+        hedged = f"{row['hedged']}/{row['hedge_wins']}w"
+        print(f"   {call_site:<20}{row['calls']:>7}{_ms(row['p50_seconds']):>9}{_ms(row['p95_seconds']):>9}"
+              f"{row['prompt_tokens'] + row['completion_tokens']:>9}{hedged:>10}  {models}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64", help="comma-separated concurrent user counts")
+    parser.add_argument("--meetings", type=int, default=3, help="meetings per user at each level")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake server latency per request")
+    parser.add_argument("--model-latency", default="", help="per-model latency, e.g. gpt-4=0.8,gpt-4o-mini=0.1")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake server token rate")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of fake requests that fail")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of fake requests that stall")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="extra seconds a stalled request waits")
+    parser.add_argument("--hedge", action="store_true", help="hedge slow completions (LLM_HEDGE)")
+    parser.add_argument("--deadline", type=float, default=None, help="meeting deadline in seconds (MEETING_DEADLINE)")
+    parser.add_argument("--engine", choices=("single", "map_reduce"), default=None, help="meeting engine")
+    parser.add_argument("--rpm", type=int, default=0, help="simulated requests-per-minute limit (0: none)")
+    parser.add_argument("--tpm", type=int, default=0, help="simulated tokens-per-minute limit (0: none)")
+    parser.add_argument("--no-stop", action="store_true", help="run every level even past saturation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="write the full report to this file")
+    args = parser.parse_args(argv)
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+
+    if importlib.util.find_spec("openai") is None:
+        print("openai is not installed; the load test needs it to talk to the fake server", file=sys.stderr)
+        return 1
+
+    sys.path.insert(0, REPO_ROOT)
+    from backend.fake_llm import FakeLLMConfig, start_server
+
+    model_latency = {model.strip(): float(value) for model, _, value in
+                     (pair.partition("=") for pair in args.model_latency.split(",") if pair.strip())}
+    config = FakeLLMConfig(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                           failure_rate=args.failure_rate, seed=args.seed, model_latency=model_latency,
+                           slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    server, base_url = start_server(config=config)
+    if args.engine:
+        os.environ["MEETING_ENGINE"] = args.engine
+    os.environ["LLM_RPM_LIMIT"] = str(args.rpm)
+    os.environ["LLM_TPM_LIMIT"] = str(args.tpm)
+    # Every simulated user runs in this process, so it gets the whole budget
+    os.environ["LLM_RATE_LIMIT_SHARES"] = "1"
+    if args.hedge:
+        os.environ["LLM_HEDGE"] = "1"
+    if args.deadline is not None:
+        os.environ["MEETING_DEADLINE"] = str(args.deadline)
+    isolated_environment(base_url)
+
+    from backend import database
+    database.initialize_db()
+
+    report = {"config": vars(args), "levels": [], "saturation": None}
+    try:
+        previous = None
+        for users in levels:
+            level = run_level(users, args.meetings, args.seed)
+            report["levels"].append(level)
+            print_level(level)
+            reason = saturation_reason(level, previous, report["levels"][0])
+            if reason:
+                report["saturation"] = {"users": previous["users"] if previous else users, "reason": reason}
+                print(f"   past saturation: {reason}")
+                if not args.no_stop:
+                    break
+            previous = level
+    finally:
+        server.shutdown()
+
+    from backend import model_router
+
+    report["routes"] = model_router.stats()
+    print_routes(report["routes"])
+    saturation = report["saturation"]
+    best = max(report["levels"], key=lambda level: level["throughput"])
+    if saturation:
+        print(f"\nSaturation point: {saturation['users']} concurrent users ({saturation['reason']})")
+    else:
+        print(f"\nNo saturation up to {report['levels'][-1]['users']} users")
+    print(f"Peak throughput: {best['throughput']:.2f} meetings/s at {best['users']} users; "
+          f"fake server saw {config.requests} requests, {config.failures} injected failures, "
+          f"{config.stalls} stalls")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
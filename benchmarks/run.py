@@ -0,0 +1,199 @@
+# benchmarks/run.py
+"""
+Microbenchmarks for the backend hot paths, run fully offline.
+
+The app is pointed at a throwaway working directory and at the fake OpenAI-compatible server in
+backend/fake_llm.py, so nothing here needs credentials or network access and results are
+reproducible. Each benchmark reports the median time per operation. Results are compared against
+the "microbench" section of benchmarks/baseline.json.
+
+Usage:
+    python benchmarks/run.py                     # run everything, fail on regressions
+    python benchmarks/run.py -k select           # only benchmarks whose name contains "select"
+    python benchmarks/run.py --update-baseline   # record the current numbers
+"""
+import argparse
+import importlib.util
+import json
+import random
+import statistics
+import sys
+import timeit
+
+from common import (REPO_ROOT, SAMPLE_ANSWERS, SAMPLE_CONTEXT, SAMPLE_EXPERTS, is_regression,
+                    isolated_environment, load_baseline, save_baseline)
+
+SECTION = "microbench"
+# Absolute slack on top of the relative tolerance, in seconds per operation
+SLACK = 20e-6
+# A first message that answers most of the Secretary's questions at once
+ONE_SHOT_MESSAGE = ("I'm the owner of a small retail shop in Lagos, Nigeria. Sales have been declining since a "
+                    "competitor opened last year. I want to increase sales and customer engagement, but my "
+                    "budget is limited.")
+# Rows seeded into expert_selections for the history-dependent benchmarks
+HISTORY_ROWS = 2000
+# Meetings seeded into the transcript store for the search benchmarks
+TRANSCRIPT_ROWS = 1000
+
+
+def _seed_history():
+    """Deterministic, varied past selections so index buckets look like real traffic."""
+    rng = random.Random(0)
+    words = " ".join(SAMPLE_CONTEXT.values()).split() + [
+        "cash", "loan", "hiring", "supplier", "launch", "pricing", "app", "lawsuit", "franchise",
+        "restaurant", "farm", "clinic", "investor", "branding", "inventory", "partner", "export",
+    ]
+    rows = []
+    for i in range(HISTORY_ROWS):
+        context = {field: " ".join(rng.choices(words, k=8)) for field in SAMPLE_CONTEXT}
+        rows.append((f"seed-{i}", json.dumps(context), ", ".join(rng.sample(SAMPLE_EXPERTS, 3))))
+    return rows
+
+
+def _benchmarks():
+    """Builds the (name, callable, needs_openai) list. Imports happen here, after the environment is set."""
+    from backend import admission, ai_processing, analytics, database, expert_manager, jobs, tracing
+    from backend.fake_llm import _REPORT_JSON, canned_reply
+    from backend.meeting_memory import MeetingMemory
+    from backend.meeting_report import MeetingReport, ReportStreamParser
+    from backend.secretary import Secretary
+    from backend.similarity_index import find_similar_panel
+
+    database.initialize_db()
+    with database.transaction() as conn:
+        conn.executemany(database.INSERT_EXPERT_SELECTION, _seed_history())
+    expert_manager.get_scorer()
+    find_similar_panel(SAMPLE_CONTEXT, database.DB_NAME)
+    discussion = canned_reply([])
+    for number, (session_id, context, experts) in enumerate(_seed_history()[:TRANSCRIPT_ROWS]):
+        database.save_transcript(session_id, f"seed-{number}", json.loads(context), experts.split(", "), discussion)
+
+    def secretary_session():
+        secretary = Secretary()
+        for answer in SAMPLE_ANSWERS:
+            secretary.analyze_input(answer)
+
+    counter = iter(range(10 ** 9))
+
+    def job_lifecycle():
+        # The queue's own writes for one meeting: the UI's enqueue, a worker's claim and its finish
+        job_id, _ = jobs.enqueue(f"bench-{next(counter)}", SAMPLE_CONTEXT)
+        jobs.claim("bench")
+        jobs.finish(job_id, "bench", {})
+    memory = MeetingMemory.from_discussion(SAMPLE_CONTEXT, SAMPLE_EXPERTS, canned_reply([]))
+
+    # A structured report as it arrives from a stream, a few characters per chunk
+    report_chunks = [_REPORT_JSON[i:i + 16] for i in range(0, len(_REPORT_JSON), 16)]
+    report = MeetingReport.from_json(_REPORT_JSON)
+
+    def parse_report_stream():
+        parser = ReportStreamParser()
+        for chunk in report_chunks:
+            parser.feed(chunk)
+        return parser.finish()
+
+    def full_meeting(engine):
+        def run():
+            experts = expert_manager.select_experts({**SAMPLE_CONTEXT, "problem": "I need advice"})
+            ai_processing.generate_expert_discussion(SAMPLE_CONTEXT, experts, engine=engine)
+        return run
+
+    return [
+        ("prompt.discussion", lambda: ai_processing._discussion_messages(SAMPLE_CONTEXT, SAMPLE_EXPERTS), False),
+        ("prompt.followup", lambda: ai_processing._followup_messages("Which option first?", SAMPLE_CONTEXT,
+                                                                    SAMPLE_EXPERTS, memory), False),
+        ("prompt.expert_turn", lambda: ai_processing._expert_turn_messages(SAMPLE_CONTEXT, SAMPLE_EXPERTS,
+                                                                          SAMPLE_EXPERTS[0]), False),
+        ("prompt.meeting_memory", lambda: MeetingMemory.from_discussion(SAMPLE_CONTEXT, SAMPLE_EXPERTS,
+                                                                        canned_reply([])), False),
+        ("report.stream_parse", parse_report_stream, False),
+        ("report.from_json", lambda: MeetingReport.from_json(report.to_json()), False),
+        ("select.parse_reply", lambda: expert_manager._finalize_selection(
+            SAMPLE_CONTEXT, "1. Financial Expert\n- Marketing Specialist\nLegal Consultant"), False),
+        ("select.fallback_padding", lambda: expert_manager._finalize_selection(SAMPLE_CONTEXT, "no idea"), False),
+        ("select.local_scorer", lambda: expert_manager.get_scorer().select(SAMPLE_CONTEXT), False),
+        ("select.similar_lookup", lambda: find_similar_panel(SAMPLE_CONTEXT, database.DB_NAME), False),
+        ("secretary.six_answers", secretary_session, False),
+        ("secretary.one_shot", lambda: Secretary().analyze_input(ONE_SHOT_MESSAGE), False),
+        ("db.get_session", lambda: database.get_session(f"bench-{next(counter)}"), False),
+        ("db.update_meeting_count", lambda: database.update_meeting_count("bench-0"), False),
+        ("admission.admit", lambda: admission.admit(f"bench-{next(counter)}"), False),
+        ("admission.check_cached", lambda: admission.check("bench-0"), False),
+        ("jobs.lifecycle", job_lifecycle, False),
+        ("transcripts.save", lambda: database.save_transcript("bench", f"bench-{next(counter)}", SAMPLE_CONTEXT,
+                                                              SAMPLE_EXPERTS, discussion), False),
+        ("transcripts.get", lambda: database.get_transcript("seed-0"), False),
+        ("transcripts.search", lambda: database.search_transcripts("pricing loan"), False),
+        ("transcripts.search_session", lambda: database.search_transcripts("pricing", session_id="seed-7"), False),
+        ("db.save_expert_selection", lambda: database.save_expert_selection("bench", "{}", SAMPLE_EXPERTS), False),
+        ("db.save_waitlist", lambda: database.save_waitlist(f"bench-{next(counter)}@example.com"), False),
+        ("analytics.top_experts", lambda: analytics.top_experts(days=30), False),
+        ("analytics.report", lambda: analytics.report(days=30), False),
+        # Tracing is off in the benchmark environment; these guard its cost on every stage
+        ("tracing.span_disabled", lambda: tracing.span("bench").__enter__(), False),
+        ("tracing.record_disabled", lambda: tracing.record(db_calls=1, db_time=0.001), False),
+        ("meeting.single", full_meeting("single"), True),
+        ("meeting.map_reduce", full_meeting("map_reduce"), True),
+    ]
+
+
+def measure(func, repeat, min_time=0.2):
+    """Returns the median seconds per call over `repeat` rounds of an auto-sized number of calls."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return statistics.median(t / number for t in timer.repeat(repeat=repeat, number=number))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="keyword", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake server latency per request")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake server token rate")
+    args = parser.parse_args(argv)
+
+    # The fake server module has no app imports, so it can start before the environment is set
+    sys.path.insert(0, REPO_ROOT)
+    from backend.fake_llm import FakeLLMConfig, start_server
+
+    config = FakeLLMConfig(latency=args.latency, tokens_per_second=args.tokens_per_second, seed=0)
+    server, base_url = start_server(config=config)
+    isolated_environment(base_url)
+    has_openai = importlib.util.find_spec("openai") is not None
+
+    baseline = load_baseline()
+    recorded = baseline.get(SECTION, {})
+    current = {}
+    failures = []
+    try:
+        for name, func, needs_openai in _benchmarks():
+            if args.keyword not in name:
+                continue
+            if needs_openai and not has_openai:
+                print(f"{name:<28} skipped (openai not installed)")
+                continue
+            seconds = measure(func, args.repeat)
+            current[name] = seconds
+            budget = recorded.get(name)
+            status = "ok"
+            if is_regression(seconds, budget, SLACK):
+                status = f"REGRESSION (baseline {budget * 1e6:.1f} us)"
+                failures.append(f"{name} took {seconds * 1e6:.1f} us, baseline {budget * 1e6:.1f} us")
+            print(f"{name:<28} {seconds * 1e6:12.1f} us/op  {status}")
+    finally:
+        server.shutdown()
+
+    if args.update_baseline:
+        baseline[SECTION] = {**recorded, **current}
+        save_baseline(baseline)
+        print("Baseline updated")
+        return 0
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
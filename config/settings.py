@@ -0,0 +1,201 @@
+# config/settings.py
+"""
+Central configuration for the app.
+
+Every setting is read from the environment once, when this module is imported. Importing it has no
+other side effects: it opens no network clients, creates no files and does not configure logging.
+The things that need those (the OpenAI client, log files) are built on first use by the modules
+that need them.
+"""
+import os
+import threading
+
+
+def _env_bool(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+# OpenAI
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Points the client at an OpenAI-compatible endpoint instead of the official API when set
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL", "gpt-4")
+
+# Shared LLM client connection pool and concurrency limits
+LLM_MAX_CONNECTIONS = _env_int("LLM_MAX_CONNECTIONS", 20)
+LLM_MAX_KEEPALIVE_CONNECTIONS = _env_int("LLM_MAX_KEEPALIVE_CONNECTIONS", 10)
+LLM_KEEPALIVE_EXPIRY = _env_float("LLM_KEEPALIVE_EXPIRY", 30)
+LLM_MAX_CONCURRENT_REQUESTS = _env_int("LLM_MAX_CONCURRENT_REQUESTS", 8)
+
+# Rate limits, retries and the circuit breaker around every model call (see backend/resilience.py).
+# Requests and tokens per minute apply per model; 0 turns a limit off. LLM_RATE_LIMITS overrides
+# them for single models as "model=rpm/tpm" pairs, e.g. "gpt-4=500/30000,gpt-4o-mini=5000/2000000".
+LLM_RPM_LIMIT = _env_int("LLM_RPM_LIMIT", 500)
+LLM_TPM_LIMIT = _env_int("LLM_TPM_LIMIT", 150000)
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+# The buckets live in each process, so every process that calls the model gets 1/LLM_RATE_LIMIT_SHARES
+# of the limits above. 0 sizes the split for the default deployment: one UI process plus
+# JOB_WORKER_PROCESSES job workers when MEETING_JOBS is on, the UI alone otherwise. Set it when
+# more processes share the account, e.g. several UI replicas or a batch run next to the UI.
+LLM_RATE_LIMIT_SHARES = _env_int("LLM_RATE_LIMIT_SHARES", 0)
+# A call that would wait longer than this for rate-limit capacity fails at once instead
+LLM_MAX_QUEUE_WAIT = _env_float("LLM_MAX_QUEUE_WAIT", 20)
+LLM_MAX_RETRIES = _env_int("LLM_MAX_RETRIES", 3)
+LLM_RETRY_BASE_DELAY = _env_float("LLM_RETRY_BASE_DELAY", 0.5)
+LLM_RETRY_MAX_DELAY = _env_float("LLM_RETRY_MAX_DELAY", 8)
+# Consecutive transient failures that open a model's circuit, and how long it stays open
+LLM_BREAKER_FAILURES = _env_int("LLM_BREAKER_FAILURES", 5)
+LLM_BREAKER_RESET_SECONDS = _env_float("LLM_BREAKER_RESET_SECONDS", 30)
+
+# Model tiers (see backend/model_router.py). LLM_TIERS defines each tier as
+# "tier=model/timeout/p95_target" in seconds; LLM_ROUTES maps call sites to tiers, and call sites
+# it does not list use LLM_DEFAULT_TIER. Latency is tracked per call site on each tier: when the p95
+# of one call site's last LLM_SLO_WINDOW calls exceeds its target (once it has LLM_SLO_MIN_CALLS of
+# them), the tier falls back per LLM_TIER_FALLBACKS for LLM_DOWNGRADE_SECONDS. The target is the
+# tier's, unless LLM_SLOS gives the call site its own as "call_site=seconds", e.g. for calls that
+# stream a whole report.
+LLM_TIERS = os.getenv("LLM_TIERS", f"fast=gpt-4o-mini/20/5,standard=gpt-4o/60/20,premium={DEFAULT_MODEL}/120/60")
+LLM_ROUTES = os.getenv("LLM_ROUTES", "select_experts=fast,secretary_extract=fast,followup=fast,"
+                                     "expert_turn=premium,expert_discussion=premium,meeting_synthesis=premium")
+LLM_DEFAULT_TIER = os.getenv("LLM_DEFAULT_TIER", "premium")
+LLM_TIER_FALLBACKS = os.getenv("LLM_TIER_FALLBACKS", "premium=standard,standard=fast")
+LLM_SLOS = os.getenv("LLM_SLOS", "expert_discussion=180,meeting_synthesis=90")
+LLM_SLO_WINDOW = _env_int("LLM_SLO_WINDOW", 100)
+LLM_SLO_MIN_CALLS = _env_int("LLM_SLO_MIN_CALLS", 20)
+LLM_DOWNGRADE_SECONDS = _env_float("LLM_DOWNGRADE_SECONDS", 120)
+
+# Hedged requests: a completion still running after the p95 latency of its call site (over the
+# last LLM_SLO_WINDOW calls, once there are LLM_SLO_MIN_CALLS of them) is sent a second time, and
+# whichever answer arrives first is used. LLM_HEDGE_CALL_SITES lists the call sites that may hedge;
+# streamed calls never do.
+LLM_HEDGE = _env_bool("LLM_HEDGE")
+LLM_HEDGE_CALL_SITES = os.getenv("LLM_HEDGE_CALL_SITES", "select_experts,secretary_extract,expert_turn,followup")
+LLM_HEDGE_MIN_DELAY = _env_float("LLM_HEDGE_MIN_DELAY", 0.5)
+
+# Seconds a whole meeting, or a follow-up answer, may take before its model calls are stopped
+# (see backend/deadlines.py); 0 means no deadline
+MEETING_DEADLINE = _env_float("MEETING_DEADLINE", 300)
+
+# Meeting generation ("single" or "map_reduce", see backend/ai_processing.py)
+MEETING_ENGINE = os.getenv("MEETING_ENGINE", "single")
+# Ask for the meeting as a JSON report (backend/meeting_report.py) instead of free text. Needs a
+# model that supports json_schema response formats, such as gpt-4o.
+STRUCTURED_REPORTS = _env_bool("STRUCTURED_REPORTS")
+
+# Completion cache
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.sqlite")
+LLM_CACHE_MAX_ENTRIES = _env_int("LLM_CACHE_MAX_ENTRIES", 5000)
+LLM_CACHE_DISABLED = _env_bool("LLM_CACHE_DISABLED")
+
+# Identical model requests in flight at the same time share one call (see backend/singleflight.py).
+# Across processes the result is shared through the completion cache; a process waits at most
+# LLM_COALESCE_WAIT seconds for another one's identical call.
+LLM_COALESCE = _env_bool("LLM_COALESCE", True)
+LLM_COALESCE_WAIT = _env_float("LLM_COALESCE_WAIT", 120)
+LLM_COALESCE_LOCK_FILE = os.getenv("LLM_COALESCE_LOCK_FILE", LLM_CACHE_DB + ".lock")
+
+# Prompt building (see backend/prompts.py and backend/meeting_memory.py)
+PROMPT_INPUT_TOKEN_BUDGET = _env_int("PROMPT_INPUT_TOKEN_BUDGET", 3000)
+PROMPT_FIELD_TOKEN_LIMIT = _env_int("PROMPT_FIELD_TOKEN_LIMIT", 400)
+MEETING_DIGEST_TOKEN_BUDGET = _env_int("MEETING_DIGEST_TOKEN_BUDGET", 300)
+
+# Secretary: one cheap model call (the "secretary_extract" route) fills the fields the local
+# extraction heuristics miss
+SECRETARY_MODEL_EXTRACTION = _env_bool("SECRETARY_MODEL_EXTRACTION")
+# Confidence (0-1) an extraction heuristic needs before it fills a field; below it the Secretary asks
+# (see backend/context_extraction.py)
+SECRETARY_MIN_CONFIDENCE = _env_float("SECRETARY_MIN_CONFIDENCE", 0.8)
+
+# Expert selection
+EXPERT_SCORER_THRESHOLD = _env_float("EXPERT_SCORER_THRESHOLD", 0.7)
+# A past context's panel is reused when its problem and objective share about this fraction of their
+# words with the new one, and its other fields differ by at most SIMILAR_CONTEXT_MAX_DISTANCE bits
+# (see backend/similarity_index.py)
+SIMILAR_PROBLEM_MIN_SIMILARITY = _env_float("SIMILAR_PROBLEM_MIN_SIMILARITY", 0.5)
+SIMILAR_CONTEXT_MAX_DISTANCE = _env_int("SIMILAR_CONTEXT_MAX_DISTANCE", 5)
+
+# Storage
+DB_NAME = os.getenv("APP_DB", "app_data.sqlite")
+# Write-behind batches that could not be written are appended here and replayed on the next start
+# (see backend/write_queue.py)
+WRITE_QUEUE_SPILL_FILE = os.getenv("WRITE_QUEUE_SPILL_FILE", "write_queue.spill.jsonl")
+
+# Meeting transcripts (see backend/database.py): finished meetings and their follow-ups are stored
+# compressed and indexed for search. TRANSCRIPT_COMPRESSION is "auto" (zstd when the zstandard
+# package is installed, zlib otherwise), "zstd" or "zlib".
+TRANSCRIPT_STORE = _env_bool("TRANSCRIPT_STORE", True)
+TRANSCRIPT_COMPRESSION = os.getenv("TRANSCRIPT_COMPRESSION", "auto")
+
+# Meeting quota per session (see backend/admission.py); 0 means no limit. Cached session counts are
+# read again from the database after ADMISSION_CACHE_TTL seconds. The session ID is kept in the page
+# URL, so a user can reset it; MEETING_QUOTA_KEY=client counts meetings per client address instead,
+# shared by everyone behind the same proxy or NAT.
+MEETING_LIMIT = _env_int("MEETING_LIMIT", 3)
+MEETING_QUOTA_KEY = os.getenv("MEETING_QUOTA_KEY", "session")
+ADMISSION_CACHE_TTL = _env_float("ADMISSION_CACHE_TTL", 30)
+ADMISSION_CACHE_MAX_ENTRIES = _env_int("ADMISSION_CACHE_MAX_ENTRIES", 10000)
+
+# Meeting jobs (see backend/jobs.py). With MEETING_JOBS on, the UI enqueues each meeting and a pool
+# of worker processes (python -m backend.jobs) generates it; off, the UI generates it inline.
+# JOB_AUTOSTART_WORKERS lets the UI start that pool itself when no worker is alive. The pool then
+# outlives the UI and logs to LOG_DIR/meeting_jobs.log; stop it with pkill -f "backend.jobs".
+MEETING_JOBS = _env_bool("MEETING_JOBS")
+JOB_AUTOSTART_WORKERS = _env_bool("JOB_AUTOSTART_WORKERS")
+JOB_WORKER_PROCESSES = _env_int("JOB_WORKER_PROCESSES", 2)
+JOB_WORKER_THREADS = _env_int("JOB_WORKER_THREADS", 4)
+# How often the UI polls a job and an idle worker looks for one, in seconds
+JOB_POLL_INTERVAL = _env_float("JOB_POLL_INTERVAL", 0.5)
+# A running job whose worker has not reported for this long is queued again, at most
+# JOB_MAX_ATTEMPTS times in all
+JOB_LEASE_SECONDS = _env_float("JOB_LEASE_SECONDS", 120)
+JOB_MAX_ATTEMPTS = _env_int("JOB_MAX_ATTEMPTS", 2)
+# A running job is cancelled when no page has polled it for this long; 0 lets every job finish
+JOB_ABANDON_SECONDS = _env_float("JOB_ABANDON_SECONDS", 120)
+
+# Logging
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_FORMAT = "%(asctime)s - %(message)s"
+
+# Tracing (see backend/tracing.py): comma-separated exporters, "jsonl" and/or "prometheus".
+# Empty turns tracing off.
+TRACING_EXPORTERS = os.getenv("TRACING_EXPORTERS", "")
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(LOG_DIR, "traces.jsonl"))
+TRACING_PROMETHEUS_HOST = os.getenv("TRACING_PROMETHEUS_HOST", "127.0.0.1")
+# Port of the /metrics endpoint; 0 keeps the metrics in process without serving them
+TRACING_PROMETHEUS_PORT = _env_int("TRACING_PROMETHEUS_PORT", 9464)
+
+_loggers_lock = threading.Lock()
+_configured_loggers = set()
+
+
+def get_file_logger(name, filename):
+    """
+    Returns the named logger, attaching a file handler under LOG_DIR the first time it is asked for.
+    The log directory is only created once something actually logs.
+    """
+    import logging
+
+    logger = logging.getLogger(name)
+    if name not in _configured_loggers:
+        with _loggers_lock:
+            if name not in _configured_loggers:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                handler = logging.FileHandler(os.path.join(LOG_DIR, filename))
+                handler.setFormatter(logging.Formatter(LOG_FORMAT))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                # Keep these records in their own file rather than also in whatever the root logger prints
+                logger.propagate = False
+                _configured_loggers.add(name)
+    return logger
@@ -1,10 +1,21 @@
 # frontend/ui.py
 import sys
 sys.path.append(".")
+import html
+import json
+import uuid
 import streamlit as st
+from backend import admission, deadlines, jobs, tracing
+from backend.database import get_transcript, initialize_db, latest_transcript
+from backend.logger import log_followup, log_interaction, log_transcript
 from backend.secretary import Secretary
 from backend.expert_manager import select_experts
-from backend.ai_processing import generate_expert_discussion, generate_extra_followup_response
+from backend.meeting_memory import MeetingMemory
+from backend.meeting_report import ExpertTurn, MeetingReport, StrategicOption
+from backend.speculation import SpeculativeExpertSelector
+from backend.ai_processing import (DISCUSSION_ERROR, stream_expert_discussion, stream_extra_followup_response,
+                                   stream_meeting_report)
+from config import settings
 import logging
 import streamlit.components.v1 as components
 
@@ -169,31 +180,62 @@ st.title("💬 Call a Meeting")
 st.caption("🚀 Use this application to summon a board of experts to help you make the right decision.")
 
 # NEW: Initialize session state objects if not already set
+if "session_id" not in st.session_state:
+    initialize_db()
+    # Kept in the URL so a reloaded page, or one served by a restarted app, finds its meeting job again
+    st.session_state.session_id = st.query_params.get("session") or str(uuid.uuid4())
+    st.query_params["session"] = st.session_state.session_id
+    # Meetings are counted under this key; see backend/admission.py for why it can be the client address
+    st.session_state.quota_key = admission.quota_key(st.session_state.session_id,
+                                                     getattr(st.context, "ip_address", None))
+    # Trace spans from every rerun of this session's meeting share one meeting ID
+    st.session_state.meeting_id = uuid.uuid4().hex
 if "secretary" not in st.session_state:
     st.session_state.secretary = Secretary()
 if "messages" not in st.session_state:
     st.session_state.messages = [{"role": "Secretary", "content": "How can the team help you today?"}]
+if "speculator" not in st.session_state:
+    st.session_state.speculator = SpeculativeExpertSelector()
 if "meeting_complete" not in st.session_state:
     st.session_state.meeting_complete = False
 if "extra_followup_asked" not in st.session_state:
     st.session_state.extra_followup_asked = False
 
 
-def display_message(role: str, content: str, user: bool = False):
+def render_message_html(role: str, content: str, user: bool = False) -> str:
     """
-    Renders a message box with a role label (in bold) and content.
+    Builds the HTML for a message box with a role label (in bold) and content.
     User messages are right-aligned, while system messages (Secretary/Experts) are left-aligned.
     The role string is cleaned to remove any bold markers.
     """
     role = role.replace("**", "")
     alignment = "message-right" if user else "message-left"
-    message_html = f"""
+    return f"""
     <div class="message-box {alignment}">
         <div class="role-label">{role}</div>
         <div class="message-content">{content}</div>
     </div>
     """
-    st.markdown(message_html, unsafe_allow_html=True)
+
+
+def display_message(role: str, content: str, user: bool = False):
+    """Renders a single message box (see render_message_html)."""
+    st.markdown(render_message_html(role, content, user), unsafe_allow_html=True)
+
+
+def display_streaming_message(role: str, chunks) -> str:
+    """
+    Renders a message box that grows as each chunk of text arrives from a streaming model call.
+    The box is redrawn in place, so the user starts reading at the first token instead of
+    waiting for the full completion. Returns the complete text once the stream is exhausted.
+    """
+    placeholder = st.empty()
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        placeholder.markdown(render_message_html(role, text + " ▌"), unsafe_allow_html=True)
+    placeholder.markdown(render_message_html(role, text), unsafe_allow_html=True)
+    return text
 
 
 def display_plain_text(content: str):
@@ -201,55 +243,266 @@ def display_plain_text(content: str):
     st.write(content.replace("**", ""))
 
 
-def display_expert_conversation(conversation: str):
+def _text_html(text: str) -> str:
+    return html.escape(text).replace("\n", "<br>")
+
+
+def display_report_item(item):
+    """Renders one ExpertTurn or StrategicOption of a structured meeting report as its own message box."""
+    if isinstance(item, ExpertTurn):
+        display_message(html.escape(item.expert), _text_html(item.text))
+    elif isinstance(item, StrategicOption):
+        display_message(f"Option: {html.escape(item.title)}", "<br>".join([
+            _text_html(item.description),
+            f"<b>Upside:</b> {_text_html(item.upside)}",
+            f"<b>Downside:</b> {_text_html(item.downside)}",
+            f"<b>Fails if:</b> {_text_html(item.fails_if)}",
+            f"<b>Impact:</b> {item.impact} &middot; <b>Risk:</b> {item.risk}",
+        ]))
+
+
+def display_report_summary(report: MeetingReport):
+    """Renders the impact/risk quadrant and the recommendation that close a structured report."""
+    if report.error:
+        st.error(report.error)
+        return
+    cells = report.quadrant()
+
+    def cell(impact, risk):
+        return "<br>".join(html.escape(title) for title in cells[(impact, risk)]) or "&ndash;"
+
+    quadrant = f"""
+    <table>
+        <tr><th></th><th>Low risk</th><th>High risk</th></tr>
+        <tr><th>High impact</th><td>{cell("high", "low")}</td><td>{cell("high", "high")}</td></tr>
+        <tr><th>Low impact</th><td>{cell("low", "low")}</td><td>{cell("low", "high")}</td></tr>
+    </table>
     """
-    Splits the expert conversation into individual messages and displays each as a separate message box.
-    Assumes each expert message is on its own line and in the format "Role: Message".
+    decision = f"<b>Decision type:</b> {html.escape(report.decision_type)}<br>" if report.decision_type else ""
+    preferred = f"<b>Preferred option:</b> {html.escape(report.preferred_option)}<br>" if report.preferred_option else ""
+    display_message("Meeting Resolutions",
+                    decision + quadrant + preferred + _text_html(report.recommendation))
+
+
+def display_report(report: MeetingReport):
+    """Renders a finished structured report from its fields; nothing is re-parsed on reruns."""
+    for item in report.turns + report.options:
+        display_report_item(item)
+    display_report_summary(report)
+
+
+def display_streaming_report(events) -> MeetingReport:
     """
-    lines = conversation.splitlines()
-    for line in lines:
-        if line.strip():
-            if ":" in line:
-                role, msg = line.split(":", 1)
-                display_message(role.strip(), msg.strip(), user=False)
-            else:
-                display_message("Expert", line.strip(), user=False)
+    Renders each expert turn and option of a streamed report as soon as it is complete, then the
+    closing summary. Returns the finished MeetingReport.
+    """
+    report = MeetingReport(error="The meeting ended without a report.")
+    for event in events:
+        if isinstance(event, MeetingReport):
+            report = event
+        else:
+            display_report_item(event)
+    display_report_summary(report)
+    return report
+
+
+def _report_item(data):
+    return ExpertTurn.from_dict(data) if data.get("kind") == "turn" else StrategicOption.from_dict(data)
+
+
+def store_job_result(job):
+    """Adds a finished meeting job's outcome to the conversation, as the inline meeting would have."""
+    context = job.payload["context"]
+    result = job.result or {}
+    experts = result.get("experts") or job.progress.get("experts") or []
+    st.session_state.experts = experts
+    if "report" in result:
+        report = MeetingReport.from_dict(result["report"])
+        st.session_state.messages.append({"role": "Meeting Resolutions", "report": report})
+        st.session_state.memory = MeetingMemory.from_report(context, experts, report)
+    else:
+        discussion = result.get("discussion") or job.error or "The meeting could not be generated."
+        st.session_state.messages.append({"role": "Meeting Resolutions", "content": discussion})
+        st.session_state.memory = MeetingMemory.from_discussion(context, experts, discussion)
+    extra_secretary = "If you need further clarification, feel free to ask questions to help you make the best decision."
+    st.session_state.messages.append({"role": "Secretary", "content": extra_secretary})
+
+
+def restore_followups(followups):
+    """Adds stored follow-up exchanges back to the conversation."""
+    for followup in followups:
+        st.session_state.messages.append({"role": "You", "content": followup["question"]})
+        st.session_state.messages.append({"role": followup["role"] or "Expert", "content": followup["answer"]})
+    if followups:
+        st.session_state.extra_followup_asked = True
+
+
+def restore_meeting(job):
+    """Picks up the session's meeting job after a page reload or an app restart."""
+    st.session_state.secretary.context = dict(job.payload["context"])
+    st.session_state.meeting_complete = True
+    # Follow-ups are stored with the meeting's transcript, under the job's meeting ID
+    st.session_state.meeting_id = job.meeting_id
+    if job.finished:
+        store_job_result(job)
+        transcript = get_transcript(job.meeting_id, parts=("followups",))
+        if transcript is not None:
+            restore_followups(transcript["followups"])
+    else:
+        st.session_state.job_id = job.id
+
+
+def restore_transcript(transcript):
+    """Rebuilds a meeting generated in the UI process from the transcript store after a page reload."""
+    context, experts = transcript["context"], transcript["experts"]
+    st.session_state.secretary.context = dict(context)
+    st.session_state.meeting_complete = True
+    st.session_state.meeting_id = transcript["meeting_id"]
+    st.session_state.experts = experts
+    if transcript["report"] is not None:
+        report = MeetingReport.from_dict(transcript["report"])
+        st.session_state.messages.append({"role": "Meeting Resolutions", "report": report})
+        st.session_state.memory = MeetingMemory.from_report(context, experts, report)
+    else:
+        st.session_state.messages.append({"role": "Meeting Resolutions", "content": transcript["discussion"]})
+        st.session_state.memory = MeetingMemory.from_discussion(context, experts, transcript["discussion"])
+    extra_secretary = "If you need further clarification, feel free to ask questions to help you make the best decision."
+    st.session_state.messages.append({"role": "Secretary", "content": extra_secretary})
+    restore_followups(transcript["followups"])
+
+
+def display_job_progress(job):
+    """Renders what a running meeting job has produced so far."""
+    experts = job.progress.get("experts")
+    if experts:
+        st.success(f"Entering meeting with: {', '.join(experts)}")
+    st.info("Meeting is happening and you will get the resolutions soon.")
+    for item in job.progress.get("items") or []:
+        display_report_item(_report_item(item))
+    if job.progress.get("text"):
+        display_message("Meeting Resolutions", job.progress["text"] + " ▌")
+
+
+# Only this part of the page reruns while polling, so no script thread waits on the meeting
+@st.fragment(run_every=settings.JOB_POLL_INTERVAL)
+def poll_job():
+    """
+    Shows the progress of the session's meeting job, which a worker process generates (see
+    backend/jobs.py). When the job has finished, its result joins the conversation and the page reruns.
+    """
+    job = jobs.poll(st.session_state.job_id)
+    if job is None or job.finished:
+        if job is not None:
+            store_job_result(job)
+        st.session_state.job_id = None
+        st.rerun()
+    display_job_progress(job)
 
 
 def main():
+    if "restored" not in st.session_state:
+        st.session_state.restored = True
+        job = jobs.latest_job(st.session_state.session_id) if settings.MEETING_JOBS else None
+        if job is not None:
+            restore_meeting(job)
+        elif settings.TRANSCRIPT_STORE:
+            transcript = latest_transcript(st.session_state.session_id)
+            if transcript is not None:
+                restore_transcript(transcript)
+
     # Display previous messages
     for msg in st.session_state.messages:
-        if msg["role"] == "You":
+        if "report" in msg:
+            display_report(msg["report"])
+        elif msg["role"] == "You":
             display_message("You", msg["content"], user=True)
         else:
             display_message(msg["role"], msg["content"], user=False)
 
+    if st.session_state.get("job_id") is not None:
+        poll_job()
+        return
+
     # If meeting is not complete, process initial challenge input
     if not st.session_state.meeting_complete:
         prompt = st.chat_input("Please describe your business challenge.")
-        if prompt:
+        # Over-quota sessions are turned away from the cached count, before any model call
+        if prompt and not admission.check(st.session_state.quota_key):
+            st.error(admission.quota_message())
+        elif prompt:
             st.session_state.messages.append({"role": "You", "content": prompt})
             display_message("You", prompt, user=True)
 
             response = st.session_state.secretary.analyze_input(prompt)
+            # Start (or refresh) expert selection in the background while the user keeps answering
+            st.session_state.speculator.observe(response["context"])
             if response["status"] == "incomplete":
                 followup_text = f"Follow-up: {response['question']}"
+                if response["noted"]:
+                    followup_text = f"{response['noted']}\n\n{followup_text}"
                 st.session_state.messages.append({"role": "Secretary", "content": followup_text})
                 display_message("Secretary", followup_text, user=False)
             else:
+                try:
+                    # Takes the meeting atomically, so another tab or app process cannot take the last one too
+                    admission.admit(st.session_state.quota_key)
+                except admission.QuotaExceeded as e:
+                    st.error(str(e))
+                    return
                 st.session_state.meeting_complete = True
                 secretary_message = "I understand your business better now, let me get you the experts who can help."
                 st.session_state.messages.append({"role": "Secretary", "content": secretary_message})
                 display_message("Secretary", secretary_message, user=False)
 
-                experts = select_experts(response["context"])
-                meeting_intro = f"Entering meeting with: {', '.join(experts)}"
-                st.success(meeting_intro)
-                st.info("Meeting is happening and you will get the resolutions soon.")
-
-                # Generate the full expert discussion and meeting conclusion
-                discussion = generate_expert_discussion(response["context"], experts)
-                display_message("Meeting Resolutions", discussion, user=False)
+                if settings.MEETING_JOBS:
+                    # A worker generates the meeting, so reruns only poll it. The speculative panel is
+                    # passed on when it is ready; otherwise the worker selects the experts.
+                    st.session_state.job_id, queued = jobs.enqueue(
+                        st.session_state.session_id, response["context"],
+                        experts=st.session_state.speculator.peek(response["context"]),
+                        structured=settings.STRUCTURED_REPORTS, meeting_id=st.session_state.meeting_id,
+                        quota_key=st.session_state.quota_key)
+                    if not queued:
+                        # Another tab of this session already queued its meeting, and was charged for it
+                        admission.refund(st.session_state.quota_key)
+                    jobs.ensure_workers()
+                    poll_job()
+                    return
+
+                # Every model call of the meeting stops at its deadline (backend/deadlines.py)
+                with deadlines.scope():
+                    experts = st.session_state.speculator.commit(response["context"])
+                    st.session_state.experts = experts
+                    # Selection history feeds the local expert scorer's tuning
+                    log_interaction(st.session_state.session_id, json.dumps(response["context"]), experts)
+                    meeting_intro = f"Entering meeting with: {', '.join(experts)}"
+                    st.success(meeting_intro)
+                    st.info("Meeting is happening and you will get the resolutions soon.")
+
+                    # Stream the expert discussion and meeting conclusion as it is generated
+                    if settings.STRUCTURED_REPORTS:
+                        report = display_streaming_report(stream_meeting_report(response["context"], experts))
+                        # Kept as a typed report so later reruns render it without parsing any text
+                        st.session_state.messages.append({"role": "Meeting Resolutions", "report": report})
+                        st.session_state.memory = MeetingMemory.from_report(response["context"], experts, report)
+                        failed = report.error is not None
+                        if not failed:
+                            log_transcript(st.session_state.session_id, st.session_state.meeting_id,
+                                           response["context"], experts, report=report)
+                    else:
+                        discussion = display_streaming_message("Meeting Resolutions",
+                                                               stream_expert_discussion(response["context"], experts))
+                        st.session_state.messages.append({"role": "Meeting Resolutions", "content": discussion})
+                        # Digest the meeting once so the follow-up is grounded without resending the transcript
+                        st.session_state.memory = MeetingMemory.from_discussion(response["context"], experts,
+                                                                                discussion)
+                        failed = discussion.startswith(DISCUSSION_ERROR)
+                        if not failed:
+                            log_transcript(st.session_state.session_id, st.session_state.meeting_id,
+                                           response["context"], experts, discussion)
+                if failed:
+                    # The user got no meeting, so it does not count against the quota
+                    admission.refund(st.session_state.quota_key)
 
                 extra_secretary = "If you need further clarification, feel free to ask questions to help you make the best decision."
                 st.session_state.messages.append({"role": "Secretary", "content": extra_secretary})
@@ -263,21 +516,26 @@ def main():
                 display_message("You", extra_prompt, user=True)
 
                 context = st.session_state.secretary.context
+                memory = st.session_state.get("memory")
                 if "experts" not in st.session_state:
                     experts = select_experts(context)
                     st.session_state.experts = experts
                 else:
                     experts = st.session_state.experts
 
-                extra_reply = generate_extra_followup_response(extra_prompt, context, experts)
+                # Stream the reply under a generic label; once complete it is stored under the
+                # expert role the model answered as, which is how it shows on later reruns.
+                with deadlines.scope():
+                    extra_reply = display_streaming_message(
+                        "Expert", stream_extra_followup_response(extra_prompt, context, experts, memory))
                 if ":" in extra_reply:
                     role_from_reply, reply_message = extra_reply.split(":", 1)
-                    display_message(role_from_reply.strip(), reply_message.strip(), user=False)
-                    st.session_state.messages.append(
-                        {"role": role_from_reply.strip(), "content": reply_message.strip()})
+                    role, reply = role_from_reply.strip(), reply_message.strip()
                 else:
-                    display_message("Expert", extra_reply, user=False)
-                    st.session_state.messages.append({"role": "Expert", "content": extra_reply})
+                    role, reply = "Expert", extra_reply
+                st.session_state.messages.append({"role": role, "content": reply})
+                # Kept with the meeting's transcript, so a reloaded page shows it again
+                log_followup(st.session_state.meeting_id, extra_prompt, reply, role)
 
                 st.session_state.extra_followup_asked = True
             else:
@@ -285,4 +543,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with tracing.meeting(st.session_state.meeting_id):
+        main()
@@ -2,7 +2,7 @@
 import streamlit as st
 import re
 import logging
-from backend.database import save_waitlist
+from backend.logger import log_waitlist_signup
 
 # Setup logging to file
 logging.basicConfig(
@@ -42,7 +42,7 @@ def main():
     # Button to join waitlist
     if st.button("Join Waitlist"):
         if email and validate_email(email):
-            save_waitlist(email, priority_access=False)
+            log_waitlist_signup(email, priority_access=False)
             logging.info(f"Waitlist entry added: {email}")
             st.success("Thank you! You've been added to the waitlist.")
         else:
@@ -1,25 +1,93 @@
 # main.py
-from backend.secretary import Secretary
-from backend.expert_manager import select_experts
-from backend.ai_processing import generate_expert_discussion
+"""
+Command-line meetings.
+
+    python main.py                                        # one interactive meeting
+    python main.py --batch contexts.jsonl --output results.jsonl --workers 8
+    python main.py --batch contexts.jsonl --output results.jsonl --stub
+
+Batch mode runs one meeting per input line (see backend/batch.py) and can be rerun with the same
+output to resume. --stub serves every model call from the local fake server in backend/fake_llm.py,
+so a batch runs without credentials or network access.
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def interactive():
+    from backend import deadlines, tracing
+    from backend.secretary import Secretary
+    from backend.expert_manager import select_experts
+    from backend.ai_processing import generate_expert_discussion
+
+    with tracing.meeting():
+        secretary = Secretary()
+        # Initial input
+        user_prompt = input("Describe your business challenge: ")
+        response = secretary.analyze_input(user_prompt)
+
+        # Continue asking follow-up questions until context is complete
+        while response["status"] == "incomplete":
+            if response["noted"]:
+                print(response["noted"])
+            print("Follow-up: ", response["question"])
+            answer = input("Your answer: ")
+            response = secretary.analyze_input(answer, field_being_answered=response["missing_field"])
+
+        print("All context gathered:", response["context"])
+        print("Let me get you the relevant experts...")
+        with deadlines.scope():
+            experts = select_experts(response["context"])
+            print("Entering meeting with: ", ", ".join(experts))
+
+            print("\nSimulating expert discussion and generating strategic recommendations...\n")
+            discussion = generate_expert_discussion(response["context"], experts)
+        print(discussion)
+
+
+def start_stub(latency=0.0):
+    """
+    Starts the fake model server and points the app at it. Must run before any other backend
+    import, since settings are read once. Stub replies bypass the completion cache so they never
+    mix with real ones.
+    """
+    from backend.fake_llm import FakeLLMConfig, start_server
+
+    server, base_url = start_server(config=FakeLLMConfig(latency=latency))
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    os.environ["LLM_CACHE_DISABLED"] = "1"
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", metavar="INPUT", help="JSONL file of contexts to run as meetings")
+    parser.add_argument("--output", help="JSONL file the batch results are appended to")
+    parser.add_argument("--workers", type=int, default=None, help="meetings run at once (default 4)")
+    parser.add_argument("--engine", choices=("single", "map_reduce"), help="meeting engine (default from settings)")
+    parser.add_argument("--structured", action="store_true", help="store each meeting as a structured report")
+    parser.add_argument("--stub", action="store_true", help="answer every model call from the local fake server")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="fake server latency per request")
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        start_stub(args.stub_latency)
+    if not args.batch:
+        interactive()
+        return 0
+    if not args.output:
+        parser.error("--batch needs --output")
+
+    from backend.batch import DEFAULT_WORKERS, run_batch
+
+    summary = run_batch(args.batch, args.output, workers=args.workers or DEFAULT_WORKERS,
+                        engine=args.engine, structured=args.structured)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
 
 if __name__ == "__main__":
-    secretary = Secretary()
-    # Initial input
-    user_prompt = input("Describe your business challenge: ")
-    response = secretary.analyze_input(user_prompt)
-
-    # Continue asking follow-up questions until context is complete
-    while response["status"] == "incomplete":
-        print("Follow-up: ", response["question"])
-        answer = input("Your answer: ")
-        response = secretary.analyze_input(answer, field_being_answered=response["missing_field"])
-
-    print("All context gathered:", response["context"])
-    print("Let me get you the relevant experts...")
-    experts = select_experts(response["context"])
-    print("Entering meeting with: ", ", ".join(experts))
-
-    print("\nSimulating expert discussion and generating strategic recommendations...\n")
-    discussion = generate_expert_discussion(response["context"], experts)
-    print(discussion)
\ No newline at end of file
+    sys.exit(main())
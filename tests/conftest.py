@@ -0,0 +1,140 @@
+# tests/conftest.py
+"""
+Makes the repository importable from the tests and runs them in a throwaway working directory,
+where the app keeps its logs and databases. The OpenAI client gets a placeholder key; the
+fake_openai fixture answers its calls with canned completions, so nothing is sent.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+# Tests that exercise the completion cache build their own
+os.environ.setdefault("LLM_CACHE_DISABLED", "1")
+os.chdir(tempfile.mkdtemp(prefix="tests-"))
+
+REPLY = "Financial Expert: Review your pricing before spending more on ads."
+
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class _Stream:
+    """A streamed response: its chunks, and close() as on the SDK's Stream."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        return next(self._chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class _AsyncStream(_Stream):
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCompletions:
+    """
+    Stands in for client.chat.completions. Every request is recorded and answered with reply
+    (a function of the messages), streamed a few characters per chunk when asked to. fail makes
+    every request raise; delay makes it take that many seconds.
+    """
+
+    def __init__(self):
+        self.reply = lambda messages: REPLY
+        self.fail = False
+        self.delay = 0.0
+        self.requests = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _start(self, model, messages, params):
+        with self._lock:
+            self.requests.append({"model": model, "messages": messages, **params})
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _response(self, messages, stream):
+        if self.fail:
+            raise ConnectionError("upstream unavailable")
+        text = self.reply(messages)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+        # The role chunk carries no text, and a usage chunk carries no choices
+        return [_chunk(""), *(_chunk(text[i:i + 7]) for i in range(0, len(text), 7)), SimpleNamespace(choices=[])]
+
+    def create(self, model, messages, stream=False, **params):
+        self._start(model, messages, dict(params, stream=stream))
+        try:
+            time.sleep(self.delay)
+            response = self._response(messages, stream)
+        finally:
+            self._finish()
+        return _Stream(response) if stream else response
+
+
+class FakeAsyncCompletions:
+    """Async counterpart of FakeCompletions, sharing its settings and records."""
+
+    def __init__(self, completions):
+        self.sync = completions
+
+    async def create(self, model, messages, stream=False, **params):
+        self.sync._start(model, messages, dict(params, stream=stream))
+        try:
+            await asyncio.sleep(self.sync.delay)
+            response = self.sync._response(messages, stream)
+        finally:
+            self.sync._finish()
+        return _AsyncStream(response) if stream else response
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Points the shared clients of backend/llm_client.py at FakeCompletions."""
+    from backend import llm_client
+
+    completions = FakeCompletions()
+    async_completions = FakeAsyncCompletions(completions)
+    monkeypatch.setattr(llm_client, "_sync_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(llm_client, "_get_async_state", lambda: (
+        SimpleNamespace(chat=SimpleNamespace(completions=async_completions)),
+        asyncio.Semaphore(llm_client.MAX_CONCURRENT_REQUESTS)))
+    return completions
@@ -0,0 +1,85 @@
+# tests/test_admission.py
+import threading
+import uuid
+
+import pytest
+
+from backend import admission, database
+from backend.admission import AdmissionControl, QuotaExceeded
+
+
+@pytest.fixture(autouse=True)
+def db():
+    database.initialize_db()
+
+
+def _session():
+    return f"quota-{uuid.uuid4()}"
+
+
+def test_admission_stops_at_the_limit_and_refunds():
+    gate = AdmissionControl(limit=2)
+    session_id = _session()
+    assert gate.admit(session_id) == 1
+    assert gate.admit(session_id) == 2
+    assert not gate.check(session_id) and gate.remaining(session_id) == 0
+    with pytest.raises(QuotaExceeded, match="used all 2 of its meetings"):
+        gate.admit(session_id)
+    gate.refund(session_id)
+    assert gate.check(session_id)
+    # The refund reaches the database before the next admission is judged
+    assert gate.admit(session_id) == 2
+    assert gate.stats()["rejected"] == 1
+
+
+def test_admission_without_a_limit_still_counts():
+    gate = AdmissionControl(limit=0)
+    session_id = _session()
+    assert [gate.admit(session_id) for _ in range(4)] == [1, 2, 3, 4]
+    assert gate.check(session_id) and gate.remaining(session_id) is None
+
+
+def test_checks_are_answered_from_the_cache():
+    gate = AdmissionControl(limit=3)
+    session_id = _session()
+    for _ in range(5):
+        gate.check(session_id)
+    assert gate.stats()["db_reads"] == 1 and gate.stats()["cache_hits"] == 4
+
+
+def test_stale_counts_are_read_again():
+    gate = AdmissionControl(limit=1, ttl=0)
+    session_id = _session()
+    assert gate.check(session_id)
+    # Another process takes the meeting
+    database.admit_meeting(session_id, 1)
+    assert not gate.check(session_id)
+
+
+def test_concurrent_admissions_cannot_overrun_the_limit():
+    # Separate gates stand in for separate app processes with their own caches
+    gates = [AdmissionControl(limit=3) for _ in range(8)]
+    session_id = _session()
+    admitted = []
+
+    def take(gate):
+        try:
+            admitted.append(gate.admit(session_id))
+        except QuotaExceeded:
+            pass
+
+    threads = [threading.Thread(target=take, args=(gate,)) for gate in gates]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(admitted) == [1, 2, 3]
+    assert database.get_meeting_count(session_id) == 3
+
+
+def test_quota_key_is_the_session_unless_keyed_by_client(monkeypatch):
+    assert admission.quota_key("s1", "10.0.0.7") == "s1"
+    monkeypatch.setattr(admission, "QUOTA_KEY", "client")
+    assert admission.quota_key("s1", "10.0.0.7") == "client:10.0.0.7"
+    # Without a known address the session is all there is to count by
+    assert admission.quota_key("s1", None) == "s1"
@@ -0,0 +1,83 @@
+# tests/test_ai.py
+import asyncio
+
+import pytest
+
+from backend import ai_processing
+from backend.meeting_memory import MeetingMemory
+
+CONTEXT = {"problem": "Sales have been declining despite increased marketing efforts.",
+           "persona": "Owner of a small retail business", "objective": "Increase sales"}
+PANEL = ["Business Strategy Expert", "Financial Expert", "Marketing Specialist"]
+
+
+def test_discussion_streams_the_same_text_as_the_blocking_call(fake_openai):
+    chunks = list(ai_processing.stream_expert_discussion(CONTEXT, PANEL))
+    assert len(chunks) > 1 and all(chunks)
+    assert "".join(chunks) == ai_processing.generate_expert_discussion(CONTEXT, PANEL)
+    streamed, blocking = fake_openai.requests
+    assert streamed["stream"] and not blocking["stream"]
+    # Both calls send the same prompt
+    assert streamed["messages"] == blocking["messages"]
+
+
+def test_followup_streams_the_same_text_as_the_blocking_call(fake_openai):
+    question = "Should I take a loan?"
+    chunks = list(ai_processing.stream_extra_followup_response(question, CONTEXT, PANEL))
+    assert "".join(chunks) == ai_processing.generate_extra_followup_response(question, CONTEXT, PANEL)
+    assert question in fake_openai.requests[0]["messages"][-1]["content"]
+
+
+def test_followup_is_grounded_in_the_meeting_memory(fake_openai):
+    memory = MeetingMemory(CONTEXT, ["Legal Consultant"], options=["Raise prices"], preferred="Raise prices")
+    ai_processing.generate_extra_followup_response("Why?", CONTEXT, PANEL, memory=memory)
+    prompt = fake_openai.requests[0]["messages"][-1]["content"]
+    assert "The experts present are: Legal Consultant." in prompt
+    assert memory.digest in prompt and ai_processing._NO_SUMMARY not in prompt
+
+
+def test_failed_stream_yields_an_error_message(fake_openai):
+    fake_openai.fail = True
+    chunks = list(ai_processing.stream_expert_discussion(CONTEXT, PANEL))
+    assert chunks == ["Error generating expert discussion: upstream unavailable"]
+
+
+def test_async_discussion_matches_the_sync_one(fake_openai):
+    discussion = asyncio.run(ai_processing.generate_expert_discussion_async(CONTEXT, PANEL))
+    assert discussion == ai_processing.generate_expert_discussion(CONTEXT, PANEL)
+
+
+def _panel_reply(messages):
+    """Each expert's turn names its expert; the synthesis starts with the resolutions."""
+    prompt = messages[-1]["content"]
+    for expert in PANEL:
+        if f"You are the {expert}" in prompt:
+            return f"As the {expert}, I would test a price change first."
+    return "Meeting Resolutions: test a price change."
+
+
+def test_map_reduce_runs_every_turn_concurrently_then_one_synthesis(fake_openai):
+    fake_openai.reply = _panel_reply
+    fake_openai.delay = 0.1
+    discussion = ai_processing.generate_expert_discussion(CONTEXT, PANEL, engine="map_reduce")
+    assert discussion == "".join(f"{expert}: As the {expert}, I would test a price change first.\n\n"
+                                 for expert in PANEL) + "Meeting Resolutions: test a price change."
+    turns, synthesis = fake_openai.requests[:-1], fake_openai.requests[-1]
+    assert len(turns) == len(PANEL) and fake_openai.peak_in_flight == len(PANEL)
+    assert all(turn["max_tokens"] == ai_processing.EXPERT_TURN_MAX_TOKENS for turn in turns)
+    # The synthesis sees every expert's turn
+    assert all(f"As the {expert}" in synthesis["messages"][-1]["content"] for expert in PANEL)
+
+
+def test_map_reduce_streams_turns_in_panel_order(fake_openai):
+    fake_openai.reply = _panel_reply
+    chunks = list(ai_processing.stream_expert_discussion(CONTEXT, PANEL, engine="map_reduce"))
+    assert [chunk.split(":")[0] for chunk in chunks[:len(PANEL)]] == PANEL
+    assert "".join(chunks) == ai_processing.generate_expert_discussion(CONTEXT, PANEL, engine="map_reduce")
+    async_discussion = asyncio.run(ai_processing.generate_expert_discussion_async(CONTEXT, PANEL, "map_reduce"))
+    assert async_discussion == "".join(chunks)
+
+
+def test_unknown_engine_is_rejected(fake_openai):
+    with pytest.raises(ValueError, match="Unknown meeting engine"):
+        ai_processing.generate_expert_discussion(CONTEXT, PANEL, engine="committee")
@@ -0,0 +1,95 @@
+# tests/test_analytics.py
+import sqlite3
+
+import pytest
+
+from backend import analytics, database
+
+DAY = "2026-03-10"
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "app.sqlite")
+    monkeypatch.setattr(database, "DB_NAME", path)
+    yield path
+    database.get_pool(path).close()
+
+
+def _select(conn, session_id, experts, timestamp):
+    conn.execute("INSERT INTO expert_selections (session_id, user_input, selected_experts, timestamp) "
+                 "VALUES (?, '{}', ?, ?)", (session_id, experts, timestamp))
+
+
+def _signup(conn, email, priority, timestamp):
+    conn.execute("INSERT INTO waitlist (email, priority_access, timestamp) VALUES (?, ?, ?)",
+                 (email, priority, timestamp))
+
+
+def _history(conn):
+    _select(conn, "s1", "Financial Expert, Marketing Specialist", "2026-03-09 23:59:00")
+    _select(conn, "s1", "Financial Expert, Legal Consultant", "2026-03-10 08:00:00")
+    _select(conn, "s2", "Financial Expert", "2026-03-10 09:00:00")
+    _select(conn, None, 'Odd "quoted" Expert, ,Tax Advisor', "2026-03-10 10:00:00")
+    _signup(conn, "a@example.com", 1, "2026-03-08 12:00:00")
+    _signup(conn, "b@example.com", 0, "2026-03-10 12:00:00")
+
+
+def _rollups(conn):
+    return {table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall())
+            for table in ("selection_experts", "daily_expert_counts", "daily_session_meetings", "daily_activity",
+                          "daily_waitlist")}
+
+
+def test_rollups_follow_every_insert(db):
+    database.initialize_db()
+    with database.transaction() as conn:
+        _history(conn)
+    assert analytics.top_experts(days=2, until=DAY) == [("Financial Expert", 3), ("Legal Consultant", 1),
+                                                        ("Marketing Specialist", 1), ('Odd "quoted" Expert', 1),
+                                                        ("Tax Advisor", 1)]
+    assert analytics.top_experts(days=1, until=DAY, limit=1) == [("Financial Expert", 2)]
+    assert analytics.expert_trend("Financial Expert", days=3, until=DAY) == [
+        ("2026-03-08", 0), ("2026-03-09", 1), ("2026-03-10", 2)]
+    # The unknown session counts under ''
+    assert analytics.activity(days=2, until=DAY) == [("2026-03-09", 1, 1, 1.0), ("2026-03-10", 3, 3, 1.0)]
+    assert analytics.meetings_per_session(days=2, until=DAY) == 1.0
+    assert analytics.session_meetings("s1", days=2, until=DAY) == [("2026-03-09", 1), ("2026-03-10", 1)]
+    assert analytics.waitlist_growth(days=2, until=DAY) == [("2026-03-09", 0, 0, 1), ("2026-03-10", 1, 0, 2)]
+    assert [row[1] for row in analytics.recent_meetings_with("Financial Expert")] == ["s2", "s1", "s1"]
+    assert analytics.report(days=2, until=DAY)["meetings"] == 4
+
+
+def test_rows_written_before_the_rollups_are_backfilled_once(db, tmp_path, monkeypatch):
+    # A database from before the analytics tables: only the raw history, at user_version 0
+    with sqlite3.connect(db) as conn:
+        conn.execute("""
+            CREATE TABLE expert_selections (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT,
+                user_input TEXT, selected_experts TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)
+        """)
+        conn.execute("""
+            CREATE TABLE waitlist (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL,
+                priority_access BOOLEAN DEFAULT 0, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)
+        """)
+        _history(conn)
+    conn.close()
+    database.initialize_db()
+    with database.get_pool().connection() as conn:
+        backfilled = _rollups(conn)
+        assert backfilled["daily_activity"] == [("2026-03-09", 1, 1), ("2026-03-10", 3, 3)]
+        assert backfilled["daily_waitlist"] == [("2026-03-08", 1, 1), ("2026-03-10", 1, 0)]
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(database.MIGRATIONS)
+    database.initialize_db()
+
+    # The same history written through the triggers gives the same rollups
+    fresh = str(tmp_path / "fresh.sqlite")
+    monkeypatch.setattr(database, "DB_NAME", fresh)
+    database.initialize_db()
+    with database.transaction() as conn:
+        _history(conn)
+    with database.get_pool().connection() as conn:
+        assert _rollups(conn) == backfilled
+    database.get_pool(fresh).close()
+    with database.get_pool(db).connection() as conn:
+        # Running initialize_db() again did not count the history twice
+        assert _rollups(conn) == backfilled
@@ -0,0 +1,101 @@
+# tests/test_batch.py
+import json
+
+import pytest
+
+from backend import batch
+from backend.batch import BatchStats, read_jobs, run_batch
+
+CONTEXT = {"problem": "Sales have been declining despite increased marketing efforts.",
+           "persona": "Owner of a small retail business", "geography": "Lagos, Nigeria"}
+
+
+@pytest.fixture(autouse=True)
+def fake(fake_openai):
+    return fake_openai
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as lines:
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+def test_lines_are_read_with_ids_and_contexts(tmp_path):
+    source = tmp_path / "contexts.jsonl"
+    source.write_text("\n".join([
+        json.dumps({"id": 7, "context": CONTEXT}),
+        "",
+        json.dumps({"problem": "Cash flow is tight"}),
+        "[1, 2]",
+    ]) + "\n")
+    jobs = list(read_jobs(str(source)))
+    assert jobs[0] == ("7", CONTEXT, None)
+    assert jobs[1] == ("line-3", {"problem": "Cash flow is tight"}, None)
+    assert jobs[2][:2] == ("line-4", None) and jobs[2][2].endswith(":4: expected a JSON object")
+
+
+def test_batch_reports_bad_lines_and_resumes(tmp_path):
+    source, output = tmp_path / "contexts.jsonl", tmp_path / "results.jsonl"
+    source.write_text("\n".join([
+        json.dumps({"id": "a", "context": CONTEXT}),
+        "not json",
+        json.dumps({"id": "b", "context": "not a dict"}),
+        json.dumps({"id": "c", "problem": "Cash flow is tight"}),
+    ]) + "\n")
+    summary = run_batch(str(source), str(output), workers=2, log=None)
+    assert (summary["succeeded"], summary["failed"], summary["skipped"]) == (2, 2, 0)
+    results = {result["id"]: result for result in _read(output)}
+    assert results["line-2"]["error"].endswith("not a JSON object (Expecting value: line 1 column 1 (char 0))")
+    assert "context must be a JSON object" in results["b"]["error"]
+    assert results["a"]["discussion"] and results["c"]["experts"]
+    # Lines that never ran stay out of the latency percentiles
+    assert "seconds" not in results["b"] and "seconds" in results["a"]
+
+    # A rerun skips what succeeded and retries only the failures
+    source.write_text("\n".join([
+        json.dumps({"id": "a", "context": CONTEXT}),
+        json.dumps({"id": "b", "context": {"problem": "Hiring is slow"}}),
+        json.dumps({"id": "c", "problem": "Cash flow is tight"}),
+    ]) + "\n")
+    summary = run_batch(str(source), str(output), workers=2, log=None)
+    assert (summary["succeeded"], summary["failed"], summary["skipped"]) == (1, 0, 2)
+    assert [result["id"] for result in _read(output)][-1] == "b"
+
+
+def test_batch_resumes_after_a_torn_last_line(tmp_path):
+    source, output = tmp_path / "contexts.jsonl", tmp_path / "results.jsonl"
+    source.write_text(json.dumps({"id": "a", "context": CONTEXT}) + "\n")
+    output.write_text('{"id": "a", "experts": [')
+    summary = run_batch(str(source), str(output), workers=1, log=None)
+    assert summary["succeeded"] == 1
+    # The torn record is finished off with a newline rather than glued to the new one
+    lines = output.read_text().splitlines()
+    assert lines[0] == '{"id": "a", "experts": ['
+    assert json.loads(lines[-1])["id"] == "a"
+
+
+def test_failed_meetings_are_recorded_not_raised(fake, tmp_path):
+    def fail(messages):
+        raise RuntimeError("upstream down")
+
+    fake.reply = fail
+    result = batch.run_meeting("x", CONTEXT)
+    assert result["id"] == "x" and result["error"] and result["seconds"] >= 0
+
+
+def test_duplicate_ids_run_once(tmp_path):
+    source, output = tmp_path / "contexts.jsonl", tmp_path / "results.jsonl"
+    source.write_text((json.dumps({"id": "a", "context": CONTEXT}) + "\n") * 3)
+    summary = run_batch(str(source), str(output), workers=2, log=None)
+    assert (summary["succeeded"], summary["skipped"]) == (1, 2)
+    assert len(_read(output)) == 1
+
+
+def test_stats_summarise_latency_percentiles():
+    stats = BatchStats()
+    for seconds in range(1, 21):
+        stats.add({"id": str(seconds), "seconds": float(seconds)})
+    stats.add({"id": "bad", "error": "malformed"})
+    summary = stats.summary()
+    assert (summary["finished"], summary["failed"]) == (21, 1)
+    assert (summary["p50_seconds"], summary["p95_seconds"]) == (10.0, 19.0)
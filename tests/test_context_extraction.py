@@ -0,0 +1,77 @@
+# tests/test_context_extraction.py
+import json
+
+import pytest
+
+from backend import context_extraction
+from backend.context_extraction import extract_candidates, extract_fields, extract_fields_with_model
+
+OTHER_FIELDS = ["persona", "objective", "scenario", "geography", "constraints"]
+ONE_SHOT_MESSAGE = ("I'm the owner of a small retail shop in Lagos, Nigeria. Sales have been declining since a "
+                    "competitor opened last year. I want to increase sales and customer engagement, but my "
+                    "budget is limited.")
+
+
+def test_one_shot_message_fills_every_field_it_states():
+    assert extract_fields(ONE_SHOT_MESSAGE, OTHER_FIELDS) == {
+        "persona": "owner of a small retail shop in Lagos",
+        "objective": "increase sales and customer engagement",
+        "scenario": "Sales have been declining since a competitor opened last year",
+        "geography": "Lagos, Nigeria",
+        "constraints": "my budget is limited",
+    }
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Most of our leads come from Instagram", {}),
+    ("We read what customers in Amazon reviews say about us", {}),
+    ("We sell on Etsy across Europe and on Shopify", {"geography": "Europe"}),
+])
+def test_platforms_are_not_places(message, expected):
+    assert extract_fields(message, ["geography"]) == expected
+
+
+def test_unknown_place_needs_a_location_cue():
+    assert extract_fields("We are based in Springfield", ["geography"]) == {"geography": "Springfield"}
+    # A bare "in" before a name the gazetteer does not know is not enough
+    assert extract_fields("Our prices in Springfield are too high", ["geography"]) == {}
+    assert extract_fields("Our prices in Nairobi are too high", ["geography"]) == {"geography": "Nairobi"}
+
+
+def test_role_stops_at_the_role_noun_phrase():
+    message = "As CEO I need to decide whether to raise a seed round or bootstrap"
+    assert extract_fields(message, ["persona"]) == {"persona": "CEO"}
+    assert extract_fields("I'm the founder of a startup that sells shoes", ["persona"]) == {
+        "persona": "founder of a startup"}
+    assert extract_fields("As a result the owner left", ["persona"]) == {}
+
+
+def test_uncertain_fields_are_left_to_ask():
+    message = "As CEO I need to decide whether to raise a seed round or bootstrap"
+    # "need to" is found, but it states a decision as often as a goal
+    assert extract_candidates(message, ["objective"])["objective"][1] < context_extraction.MIN_CONFIDENCE
+    assert "objective" not in extract_fields(message, ["objective"])
+    assert extract_fields(message, ["objective"], min_confidence=0.0) == {
+        "objective": extract_candidates(message, ["objective"])["objective"][0]}
+
+
+def test_only_the_requested_fields_are_extracted():
+    assert set(extract_fields(ONE_SHOT_MESSAGE, ["geography", "constraints"])) == {"geography", "constraints"}
+
+
+def test_model_fills_only_the_fields_asked_for(fake_openai):
+    fake_openai.reply = lambda messages: json.dumps({"scenario": "A competitor opened nearby ", "persona": "Owner",
+                                                     "constraints": ["not", "a", "phrase"]})
+    message = "We have had a hard year and things keep changing around us, so I do not know what to do"
+    assert extract_fields_with_model(message, ["scenario", "constraints"]) == {
+        "scenario": "A competitor opened nearby"}
+    request, = fake_openai.requests
+    assert request["response_format"] == {"type": "json_object"} and request["messages"][1]["content"] == message
+
+
+def test_model_is_not_asked_about_short_messages_or_bad_replies(fake_openai):
+    assert extract_fields_with_model("Sales are down", ["scenario"]) == {}
+    assert fake_openai.requests == []
+    fake_openai.reply = lambda messages: "Sure! The scenario is a new competitor."
+    long_message = "We have had a hard year and things keep changing around us, so I do not know what to do"
+    assert extract_fields_with_model(long_message, ["scenario"]) == {}
@@ -0,0 +1,150 @@
+# tests/test_database.py
+import sqlite3
+import threading
+
+import pytest
+
+from backend import database
+from backend.database import ConnectionPool
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "app.sqlite")
+    monkeypatch.setattr(database, "DB_NAME", path)
+    database.initialize_db()
+    yield path
+    database.get_pool(path).close()
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite"), size=2, timeout=0.2)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+    yield pool
+    pool.close()
+
+
+def test_connections_are_reused_in_wal_mode(pool):
+    with pool.connection() as first:
+        assert first.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    with pool.connection() as second:
+        assert second is first
+    # The fixture's connection was the first one lent
+    assert pool.stats()["created"] == 1 and pool.stats()["acquisitions"] == 3
+
+
+def test_pool_is_bounded_and_times_out(pool):
+    with pool.connection(), pool.connection():
+        assert pool.stats()["in_use"] == 2
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    assert pool.stats()["created"] == 2 and pool.stats()["in_use"] == 0
+
+
+def test_waiting_caller_gets_a_released_connection(pool):
+    results = []
+
+    def borrow():
+        with pool.connection() as conn:
+            results.append(conn)
+
+    with pool.connection(), pool.connection():
+        waiter = threading.Thread(target=borrow)
+        waiter.start()
+        waiter.join(0.05)
+        assert results == []
+    waiter.join()
+    assert results and pool.stats()["waits"] == 1
+
+
+def test_transaction_commits_or_rolls_back(pool):
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO items VALUES ('kept')")
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES ('dropped')")
+            raise sqlite3.IntegrityError("abort")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT name FROM items").fetchall() == [("kept",)]
+    stats = pool.stats()
+    assert stats["transactions"] == 1 and stats["rollbacks"] == 1
+
+
+def test_get_pool_shares_one_pool_per_file(db):
+    assert database.get_pool() is database.get_pool(db)
+    assert database.get_pool(db + ".other") is not database.get_pool(db)
+
+
+def test_concurrent_first_visits_create_one_session(db):
+    barrier = threading.Barrier(8)
+    sessions = []
+
+    def visit():
+        barrier.wait()
+        sessions.append(database.get_session("s1"))
+
+    threads = [threading.Thread(target=visit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sessions == [("s1", 0)] * 8
+    database.update_meeting_count("s1")
+    assert database.get_session("s1") == ("s1", 1)
+
+
+CONTEXT = {"problem": "Sales have been declining despite increased marketing efforts.",
+           "persona": "Owner of a small retail business", "geography": "Lagos, Nigeria"}
+PANEL = ["Business Strategy Expert", "Financial Expert", "Marketing Specialist"]
+
+
+def test_transcripts_are_compressed_and_searchable(db):
+    discussion = "Financial Expert: Take a small loan and review pricing. " * 50
+    database.save_transcript("s1", "m1", CONTEXT, PANEL, discussion)
+    database.save_transcript("s1", "m2", dict(CONTEXT, problem="Our supplier keeps shipping late"),
+                             PANEL, "Operations Consultant: Find a second supplier.")
+    with database.get_pool().connection() as conn:
+        stored = conn.execute("SELECT discussion FROM meeting_transcripts WHERE meeting_id = 'm1'").fetchone()[0]
+    assert len(stored) < len(discussion) / 5
+    assert database.get_transcript("m1")["discussion"] == discussion
+
+    def found(text):
+        return [result["meeting_id"] for result in database.search_transcripts(text, session_id="s1")[0]]
+
+    assert found("pricing loan") == ["m1"]
+    assert found("supplier") == ["m2"]
+    assert found("Lagos") == ["m2", "m1"]
+    assert found("pricing supplier") == [] and found("!!") == []
+    # Saving a meeting again replaces its text in the index too
+    database.save_transcript("s1", "m1", CONTEXT, PANEL, "Legal Consultant: Register the trademark.")
+    assert found("pricing") == [] and found("trademark") == ["m1"]
+
+
+def test_transcript_search_pages_by_id(db):
+    for number in range(5):
+        database.save_transcript("s1", f"m{number}", CONTEXT, PANEL, f"Meeting {number} about churn")
+    database.save_transcript("s2", "other", CONTEXT, PANEL, "Another session's meeting about churn")
+    page, cursor = database.search_transcripts("churn", session_id="s1", limit=2)
+    seen = [result["meeting_id"] for result in page]
+    while cursor is not None:
+        page, cursor = database.search_transcripts("churn", session_id="s1", before=cursor, limit=2)
+        seen += [result["meeting_id"] for result in page]
+    assert seen == [f"m{number}" for number in range(4, -1, -1)]
+    assert [result["meeting_id"] for result in database.search_transcripts("churn", limit=1)[0]] == ["other"]
+
+
+def test_followups_are_kept_with_the_transcript(db):
+    assert not database.add_followup("missing", "Why?", "Because.")
+    database.save_transcript("s1", "m1", CONTEXT, PANEL, "Financial Expert: Review pricing.")
+    assert database.add_followup("m1", "What about rent?", "Renegotiate the lease.", "Financial Expert")
+    transcript = database.get_transcript("m1", parts=("followups",))
+    assert "discussion" not in transcript and transcript["experts"] == PANEL
+    assert transcript["followups"] == [{"question": "What about rent?", "answer": "Renegotiate the lease.",
+                                        "role": "Financial Expert"}]
+    assert database.latest_transcript("s1")["meeting_id"] == "m1"
+    assert database.latest_transcript("s2") is None
+    # Follow-ups are searchable like the meeting itself
+    assert [result["meeting_id"] for result in database.search_transcripts("lease")[0]] == ["m1"]
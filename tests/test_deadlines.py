@@ -0,0 +1,201 @@
+# tests/test_deadlines.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend import deadlines, llm_client, model_router
+from backend.deadlines import Cancelled, DeadlineExceeded
+from backend.singleflight import FlightGroup
+
+MESSAGES = [{"role": "user", "content": "How do I grow sales?"}]
+
+
+def test_nested_scopes_keep_the_earlier_expiry_and_share_cancellation():
+    assert deadlines.timeout(30) == 30 and not deadlines.stopped()
+    with deadlines.scope(5) as outer:
+        assert deadlines.timeout(30) <= 5
+        with deadlines.scope(60) as inner:
+            assert inner.expires == outer.expires
+            outer.cancel("Nobody is waiting.")
+            assert inner.cancelled and deadlines.stopped()
+            with pytest.raises(Cancelled):
+                deadlines.check()
+        assert outer.reason == "Nobody is waiting."
+    assert deadlines.current() is None
+
+
+def test_waits_stop_at_the_deadline_or_when_cancelled():
+    with deadlines.scope(0.05):
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            deadlines.sleep(5)
+        assert time.monotonic() - started < 1
+    with deadlines.scope() as deadline:
+        threading.Timer(0.05, deadline.cancel).start()
+        with pytest.raises(Cancelled):
+            deadlines.sleep(5)
+
+
+def test_requests_are_sent_with_the_time_left(fake_openai):
+    with deadlines.scope(5):
+        llm_client.complete(MESSAGES, call_site="followup")
+    assert fake_openai.requests[-1]["timeout"] <= 5
+
+
+def test_expert_turns_on_other_threads_see_the_meeting_deadline(fake_openai):
+    from backend import ai_processing
+
+    context = {"problem": "Sales have been declining despite increased marketing efforts."}
+    with deadlines.scope(7):
+        ai_processing.generate_expert_discussion(context, ["Financial Expert", "Marketing Specialist"],
+                                                 engine="map_reduce")
+    assert len(fake_openai.requests) == 3
+    assert all(request["timeout"] <= 7 for request in fake_openai.requests)
+
+
+def test_a_call_past_its_deadline_is_not_sent(fake_openai):
+    with deadlines.scope(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            llm_client.complete(MESSAGES, call_site="followup")
+    assert fake_openai.requests == []
+
+
+def test_a_cancelled_stream_stops_between_chunks(fake_openai):
+    fake_openai.reply = lambda messages: "word " * 50
+    chunks = []
+    with deadlines.scope() as deadline:
+        with pytest.raises(Cancelled):
+            for chunk in llm_client.stream(MESSAGES, call_site="expert_discussion"):
+                chunks.append(chunk)
+                if len(chunks) == 3:
+                    deadline.cancel()
+    assert len(chunks) == 3
+
+
+class _SlowResponse:
+    """A streamed response that yields a chunk every 50 ms until closed."""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+    def __iter__(self):
+        for number in range(20):
+            if self.closed.wait(0.05):
+                raise ConnectionError("closed")
+            yield number
+
+
+def _subscribe(group, responses, results, name, cancel_after=None):
+    def source():
+        response = _SlowResponse()
+        responses.append(response)
+        with deadlines.on_cancel(response.close):
+            yield from response
+
+    chunks = []
+    with deadlines.scope(30) as deadline:
+        if cancel_after:
+            threading.Timer(cancel_after, deadline.cancel).start()
+        try:
+            for chunk in group.subscribe("key", source):
+                chunks.append(chunk)
+        except Exception as e:
+            chunks.append(type(e).__name__)
+    results[name] = chunks
+
+
+def _run_subscribers(*cancel_afters):
+    group, responses, results = FlightGroup(), [], {}
+    threads = [threading.Thread(target=_subscribe, args=(group, responses, results, name, cancel_after))
+               for name, cancel_after in enumerate(cancel_afters)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    return results, responses
+
+
+def test_cancelling_one_subscriber_leaves_the_shared_stream_open():
+    results, responses = _run_subscribers(0.2, None)
+    assert len(responses) == 1
+    assert results[0][-1] == "Cancelled"
+    assert results[1] == list(range(20))
+    assert not responses[0].closed.is_set()
+
+
+def test_shared_stream_closes_when_the_last_subscriber_leaves():
+    results, responses = _run_subscribers(0.2, 0.3)
+    assert results[0][-1] == "Cancelled" and results[1][-1] == "Cancelled"
+    assert responses[0].closed.is_set()
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    """Hedges every call after 50 ms."""
+    monkeypatch.setattr(llm_client, "_hedge_delay", lambda route: 0.05)
+    return model_router.route("select_experts")
+
+
+def test_a_slow_call_is_hedged_and_the_slow_copy_cancelled(hedging):
+    calls, stopped = [], []
+
+    def call():
+        calls.append(deadlines.current())
+        if len(calls) == 1:
+            try:
+                deadlines.sleep(5)
+            except Cancelled:
+                stopped.append(True)
+                raise
+        return f"answer {len(calls)}"
+
+    before = model_router.stats()["routes"].get("select_experts", {}).get("hedge_wins", 0)
+    started = time.monotonic()
+    assert llm_client._hedged(hedging, call) == "answer 2"
+    assert time.monotonic() - started < 1
+    for _ in range(50):
+        if stopped:
+            break
+        time.sleep(0.01)
+    assert stopped and calls[0].cancelled
+    assert model_router.stats()["routes"]["select_experts"]["hedge_wins"] == before + 1
+
+
+def test_a_fast_call_is_not_hedged(hedging):
+    calls = []
+
+    def call():
+        calls.append(1)
+        return "answer"
+
+    assert llm_client._hedged(hedging, call) == "answer"
+    assert calls == [1]
+
+
+def test_async_hedge_cancels_the_slower_task(hedging):
+    cancelled = []
+
+    async def main():
+        calls = []
+
+        async def call():
+            calls.append(1)
+            if len(calls) == 1:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+            return f"answer {len(calls)}"
+
+        return await llm_client._ahedged(hedging, call)
+
+    assert asyncio.run(main()) == "answer 2"
+    assert cancelled == [True]
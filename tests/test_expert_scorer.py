@@ -0,0 +1,51 @@
+# tests/test_expert_scorer.py
+import json
+
+from backend.expert_manager import EXPERT_CATEGORIES
+from backend.expert_scorer import ExpertScorer
+
+
+def test_scorer_ranks_the_categories_the_context_is_about():
+    scorer = ExpertScorer(EXPERT_CATEGORIES)
+    experts, confidence = scorer.select({"problem": "We need a loan to cover a cash flow gap and our debt is growing",
+                                         "objective": "Fix our pricing and margin, and grow marketing",
+                                         "constraints": "Small team and a tight deadline"})
+    assert experts[0] == "Financial Expert"
+    assert 3 <= len(experts) <= 5
+    assert confidence >= 0.5
+
+
+def test_scorer_has_no_confidence_without_a_full_panel():
+    scorer = ExpertScorer(EXPERT_CATEGORIES)
+    assert scorer.select({"problem": "Hello there"}) == ([], 0.0)
+    assert scorer.select({"problem": "We need a loan"}) == (["Financial Expert"], 0.0)
+
+
+def _history(term, expert, rows=6):
+    # `term` always comes with `expert`; the other rows are about something else
+    history = [(json.dumps({"problem": f"Our {term} keeps failing"}), f"{expert}, Financial Expert, Technical Expert")
+               for _ in range(rows)]
+    history += [(json.dumps({"problem": "Cash is short"}), "Financial Expert, Business Strategy Expert, Legal Consultant")
+                for _ in range(rows)]
+    return history
+
+
+def test_tuning_learns_terms_by_lift():
+    scorer = ExpertScorer(EXPERT_CATEGORIES)
+    assert scorer.rank({"problem": "kiln"})[0] == []
+    assert scorer.tune(_history("kiln", "Operations Consultant")) == 12
+    ranked, scores, hits = scorer.rank({"problem": "kiln"})
+    # Operations Consultant only ever appears with "kiln"; Financial Expert appears everywhere (no lift)
+    assert "Operations Consultant" in ranked and "Financial Expert" not in ranked
+    assert hits == 1
+
+
+def test_tuning_ignores_rare_terms_and_is_repeatable():
+    scorer = ExpertScorer(EXPERT_CATEGORIES)
+    scorer.tune(_history("kiln", "Operations Consultant", rows=2))
+    assert scorer.rank({"problem": "kiln"})[0] == []
+    history = _history("kiln", "Operations Consultant")
+    scorer.tune(history)
+    first = scorer.rank({"problem": "kiln"})
+    scorer.tune(history)
+    assert scorer.rank({"problem": "kiln"}) == first
@@ -0,0 +1,42 @@
+# tests/test_experts.py
+import pytest
+
+from backend import expert_manager
+from backend.expert_scorer import ExpertScorer
+
+# Plenty of keyword evidence, so the local scorer is confident
+CLEAR = {"problem": "We need a loan to cover a cash flow gap and our debt is growing",
+         "objective": "Fix our pricing and margin, and grow marketing",
+         "constraints": "Small team and a tight deadline"}
+VAGUE = {"problem": "Things are not going well with the shop"}
+
+
+@pytest.fixture(autouse=True)
+def scorer(monkeypatch):
+    """An untuned scorer, so results do not depend on the selection history."""
+    monkeypatch.setattr(expert_manager, "_scorer", ExpertScorer(expert_manager.EXPERT_CATEGORIES))
+
+
+def test_confident_local_pick_skips_the_model(fake_openai):
+    experts = expert_manager.select_experts(CLEAR)
+    assert experts[0] == "Financial Expert" and len(experts) >= 3
+    assert fake_openai.requests == []
+
+
+def test_low_confidence_asks_the_model_and_parses_a_list(fake_openai):
+    fake_openai.reply = lambda messages: "Here is the panel:\n1. Operations Consultant\n- **Legal Consultant**\nSomeone else"
+    experts = expert_manager.select_experts(VAGUE)
+    assert len(fake_openai.requests) == 1
+    assert experts[:2] == ["Operations Consultant", "Legal Consultant"] and len(experts) == 3
+
+
+def test_failed_model_call_falls_back_to_a_default_panel(fake_openai):
+    fake_openai.fail = True
+    assert expert_manager.select_experts(VAGUE) == expert_manager.DEFAULT_EXPERTS
+
+
+def test_panel_of_a_similar_past_context_is_reused(fake_openai, monkeypatch):
+    panel = ["Legal Consultant", "Operations Consultant", "Technical Expert"]
+    monkeypatch.setattr(expert_manager, "find_similar_panel", lambda context, db_name: panel)
+    assert expert_manager.select_experts(VAGUE) == panel
+    assert fake_openai.requests == []
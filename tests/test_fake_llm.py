@@ -0,0 +1,88 @@
+# tests/test_fake_llm.py
+import time
+
+import httpx
+import openai
+import pytest
+
+from backend import ai_processing, fake_llm, llm_client
+from backend.fake_llm import FakeLLMConfig, canned_reply, start_server
+from config import settings
+
+CONTEXT = {"problem": "Sales have been declining despite increased marketing efforts.",
+           "persona": "Owner of a small retail business", "objective": "Increase sales"}
+PANEL = ["Business Strategy Expert", "Financial Expert", "Marketing Specialist"]
+
+
+@pytest.fixture
+def server():
+    config = FakeLLMConfig(seed=1)
+    server, base_url = start_server(config=config)
+    yield config, base_url
+    server.shutdown()
+    server.server_close()
+
+
+def _client(base_url):
+    return openai.OpenAI(api_key="sk-fake", base_url=base_url, max_retries=0)
+
+
+def test_replies_are_shaped_like_each_call_site():
+    selection = canned_reply([{"content": "Please select between 3 to 5 experts for this problem"}])
+    assert selection.splitlines() == PANEL
+    turn = canned_reply([{"content": "You are the Financial Expert on a panel of advisors"}])
+    assert turn.endswith("(Financial Expert)")
+    assert canned_reply([{"content": "Answer the follow-up question"}]).startswith("Financial Expert:")
+    assert "Meeting Resolutions:" in canned_reply([{"content": "Hold the meeting"}])
+
+
+def test_blocking_and_streamed_completions_match(server):
+    _, base_url = server
+    client = _client(base_url)
+    messages = [{"role": "user", "content": "Hold the meeting"}]
+    response = client.chat.completions.create(model="gpt-4", messages=messages)
+    assert response.choices[0].message.content == canned_reply(messages)
+    assert response.usage.completion_tokens > 0
+    streamed = client.chat.completions.create(model="gpt-4", messages=messages, stream=True)
+    deltas = [chunk.choices[0].delta.content for chunk in streamed if chunk.choices[0].delta.content]
+    assert len(deltas) > 1 and "".join(deltas) == canned_reply(messages)
+
+
+def test_injected_failures_use_the_configured_status(server):
+    config, base_url = server
+    config.failure_rate = 1.0
+    config.failure_status = 429
+    with pytest.raises(openai.RateLimitError):
+        _client(base_url).chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "hi"}])
+    assert config.requests == config.failures == 1
+
+
+def test_latency_and_token_rate_are_applied(server):
+    config, base_url = server
+    config.latency = 0.05
+    config.reply = lambda messages: "one two three four five"
+    config.tokens_per_second = 100
+    started = time.perf_counter()
+    _client(base_url).chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "hi"}])
+    assert time.perf_counter() - started >= 0.05 + 5 / 100
+
+
+def test_requests_on_a_kept_alive_connection_are_not_delayed(server):
+    _, base_url = server
+    client = _client(base_url)
+    messages = [{"role": "user", "content": "hi"}]
+    client.chat.completions.create(model="gpt-4", messages=messages)
+    started = time.perf_counter()
+    for _ in range(5):
+        client.chat.completions.create(model="gpt-4", messages=messages)
+    # A delayed ACK behind Nagle's algorithm costs about 40 ms per request
+    assert (time.perf_counter() - started) / 5 < 0.03
+
+
+def test_the_app_runs_a_meeting_against_the_server(server, monkeypatch):
+    _, base_url = server
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", base_url)
+    monkeypatch.setattr(llm_client, "_sync_client", None)
+    discussion = ai_processing.generate_expert_discussion(CONTEXT, PANEL)
+    assert discussion == fake_llm._DISCUSSION_REPLY
+    assert httpx.get(base_url + "/models").json()["data"][0]["id"] == "gpt-4"
@@ -0,0 +1,173 @@
+# tests/test_jobs.py
+import os
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from backend import admission, jobs
+from backend.database import get_pool, get_transcript, initialize_db
+
+CONTEXT = {"problem": "Sales have been declining despite increased marketing efforts.",
+           "persona": "Owner of a small retail business", "geography": "Lagos, Nigeria"}
+PANEL = ["Business Strategy Expert", "Financial Expert", "Marketing Specialist"]
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """An empty job queue with short leases."""
+    initialize_db()
+    with get_pool().connection() as conn:
+        conn.execute("DELETE FROM meeting_jobs")
+    monkeypatch.setattr(jobs, "LEASE_SECONDS", 0.3)
+    monkeypatch.setattr(jobs, "LEASE_RENEW_INTERVAL", 0.05)
+    monkeypatch.setattr(jobs, "ABANDON_SECONDS", 0)
+    return jobs
+
+
+def _session():
+    return f"session-{uuid.uuid4()}"
+
+
+def test_enqueue_is_deduplicated_per_session(queue):
+    session_id = _session()
+    job_id, queued = queue.enqueue(session_id, CONTEXT)
+    assert queued
+    assert queue.enqueue(session_id, CONTEXT) == (job_id, False)
+    assert queue.enqueue(_session(), CONTEXT)[0] != job_id
+    job = queue.claim("worker-1")
+    assert queue.finish(job.id, "worker-1", {"experts": PANEL, "discussion": "Done."})
+    # A finished job no longer holds the session
+    next_id, queued = queue.enqueue(session_id, CONTEXT)
+    assert queued and next_id != job_id
+
+
+def test_each_job_is_claimed_once(queue):
+    job_ids = {queue.enqueue(_session(), CONTEXT)[0] for _ in range(6)}
+    claimed = []
+    lock = threading.Lock()
+
+    def claim_all(worker_id):
+        while (job := queue.claim(worker_id)) is not None:
+            with lock:
+                claimed.append(job.id)
+
+    workers = [threading.Thread(target=claim_all, args=(f"worker-{i}",)) for i in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(claimed) == sorted(job_ids)
+
+
+def test_expired_lease_requeues_then_fails(queue):
+    job_id, _ = queue.enqueue(_session(), CONTEXT)
+    first = queue.claim("worker-1")
+    assert first.id == job_id and queue.claim("worker-2") is None
+    time.sleep(0.4)
+    second = queue.claim("worker-2")
+    assert second.id == job_id and second.attempts == 2
+    with pytest.raises(jobs.LeaseLost):
+        queue.report_progress(job_id, "worker-1", {"text": "stale"})
+    with pytest.raises(jobs.LeaseLost):
+        queue.renew_lease(job_id, "worker-1")
+    assert not queue.finish(job_id, "worker-1", {"discussion": "stale"})
+    time.sleep(0.4)
+    # JOB_MAX_ATTEMPTS (2) are used up
+    assert queue.claim("worker-3") is None
+    assert queue.get_job(job_id).status == jobs.FAILED
+
+
+def test_quiet_meeting_keeps_its_lease(queue, monkeypatch, fake_openai):
+    from backend import expert_manager
+
+    def slow_selection(context):
+        time.sleep(1.0)
+        return PANEL
+
+    monkeypatch.setattr(expert_manager, "select_experts", slow_selection)
+    job_id, _ = queue.enqueue(_session(), CONTEXT)
+    job = queue.claim("worker-1")
+    runner = threading.Thread(target=queue.run_job, args=(job, "worker-1"))
+    runner.start()
+    time.sleep(0.6)
+    # Nothing has been written yet, but the heartbeat renewed the lease
+    assert queue.claim("worker-2") is None
+    runner.join()
+    finished = queue.get_job(job_id)
+    assert finished.status == jobs.DONE and finished.attempts == 1
+    assert finished.result["experts"] == PANEL and finished.result["discussion"]
+
+
+def test_failed_meeting_is_refunded_to_the_key_it_was_charged_to(queue, fake_openai):
+    fake_openai.fail = True
+    quota_key = f"client:{uuid.uuid4()}"
+    admission.admit(quota_key)
+    job_id, _ = queue.enqueue(_session(), CONTEXT, experts=PANEL, quota_key=quota_key)
+    queue.run_job(queue.claim("worker-1"), "worker-1")
+    job = queue.get_job(job_id)
+    assert job.status == jobs.FAILED
+    assert admission.gate.meeting_count(quota_key) == 0
+    assert get_transcript(job.meeting_id) is None
+
+
+def test_finished_meeting_is_stored_as_a_transcript(queue, fake_openai):
+    job_id, _ = queue.enqueue(_session(), CONTEXT, experts=PANEL)
+    queue.run_job(queue.claim("worker-1"), "worker-1")
+    job = queue.get_job(job_id)
+    transcript = get_transcript(job.meeting_id)
+    assert transcript["session_id"] == job.session_id and transcript["experts"] == PANEL
+    assert transcript["discussion"] == job.result["discussion"]
+
+
+def test_meeting_nobody_polls_is_cancelled_and_refunded(queue, monkeypatch, fake_openai):
+    fake_openai.reply = lambda messages: "word " * 200
+    monkeypatch.setattr(jobs, "ABANDON_SECONDS", 0.1)
+    quota_key = f"client:{uuid.uuid4()}"
+    admission.admit(quota_key)
+    job_id, _ = queue.enqueue(_session(), CONTEXT, experts=PANEL, quota_key=quota_key)
+    time.sleep(0.2)
+    queue.run_job(queue.claim("worker-1"), "worker-1")
+    job = queue.get_job(job_id)
+    assert job.status == jobs.FAILED and job.error == "Nobody is waiting for this meeting any more."
+    assert admission.gate.meeting_count(quota_key) == 0
+
+
+def test_polled_meeting_runs_to_the_end(queue, monkeypatch, fake_openai):
+    monkeypatch.setattr(jobs, "ABANDON_SECONDS", 0.1)
+    job_id, _ = queue.enqueue(_session(), CONTEXT, experts=PANEL)
+    time.sleep(0.2)
+    assert queue.poll(job_id).status == jobs.QUEUED
+    queue.run_job(queue.claim("worker-1"), "worker-1")
+    assert queue.get_job(job_id).status == jobs.DONE
+
+
+def test_autostarted_pool_logs_under_the_log_dir(queue, monkeypatch):
+    import subprocess
+
+    started = []
+
+    def popen(args, **kwargs):
+        started.append((args, kwargs))
+        return SimpleNamespace(pid=4242)
+
+    monkeypatch.setattr(subprocess, "Popen", popen)
+    monkeypatch.setattr(jobs.settings, "JOB_AUTOSTART_WORKERS", True)
+    monkeypatch.setattr(jobs, "_autostarted_at", 0.0)
+    monkeypatch.setattr(jobs, "live_workers", lambda: 0)
+    assert jobs.ensure_workers()
+    # Within the cooldown, a second page does not start another pool
+    assert not jobs.ensure_workers()
+    (args, kwargs), = started
+    assert args[-2:] == ["--log-file", jobs.AUTOSTART_LOG]
+    assert kwargs["start_new_session"] and kwargs["stdout"] is kwargs["stderr"]
+    assert kwargs["stdout"].name == os.path.join(jobs.settings.LOG_DIR, jobs.AUTOSTART_LOG)
+    with open(kwargs["stdout"].name) as log:
+        assert "stop it with kill 4242" in log.read()
+
+
+def test_autostart_is_off_by_default(queue):
+    assert not jobs.settings.MEETING_JOBS and not jobs.settings.JOB_AUTOSTART_WORKERS
+    assert not jobs.ensure_workers()
@@ -0,0 +1,84 @@
+# tests/test_llm_cache.py
+import sqlite3
+import time
+
+import pytest
+
+from backend import llm_cache, llm_client
+from backend.llm_cache import CALL_SITE_TTLS, CompletionCache, make_key
+
+MESSAGES = [{"role": "system", "content": "Pick the experts for:\n  a bakery   in Lagos"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CompletionCache(path=str(tmp_path / "llm_cache.sqlite"), enabled=True)
+
+
+def _stored(cache, key, column):
+    with sqlite3.connect(cache.path) as conn:
+        return conn.execute(f"SELECT {column} FROM completions WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_key_ignores_whitespace_but_not_model_or_params():
+    key = make_key("gpt-4", MESSAGES, {})
+    assert make_key("gpt-4", [{"role": "system", "content": "Pick the experts for: a bakery in Lagos "}], {}) == key
+    assert make_key("gpt-4o-mini", MESSAGES, {}) != key
+    assert make_key("gpt-4", MESSAGES, {"max_tokens": 400}) != key
+    assert make_key("gpt-4", [dict(MESSAGES[0], role="user")], {}) != key
+
+
+def test_entries_expire_after_their_call_site_ttl(cache):
+    cache.set("experts", "Financial Expert", call_site="select_experts")
+    cache.set("followup", "Financial Expert: yes", call_site="followup")
+    now = time.time()
+    assert _stored(cache, "experts", "expires_at") == pytest.approx(now + CALL_SITE_TTLS["select_experts"], abs=5)
+    assert _stored(cache, "followup", "expires_at") == pytest.approx(now + CALL_SITE_TTLS["followup"], abs=5)
+    cache.set("stale", "old answer", ttl=-1)
+    assert cache.get("stale") is None
+    assert cache.get("experts") == "Financial Expert"
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 2}
+
+
+def test_least_recently_used_entries_are_evicted(cache, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_EVICT_EVERY", 1)
+    monkeypatch.setattr(llm_cache, "ACCESS_REFRESH_SECONDS", 0)
+    cache.max_entries = 3
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+        time.sleep(0.01)
+    assert cache.get("a") == "A"
+    time.sleep(0.01)
+    cache.set("d", "D")
+    assert [cache.get(key) for key in ("a", "b", "c", "d")] == ["A", None, "C", "D"]
+
+
+def test_a_hit_only_rewrites_an_old_access_time(cache, monkeypatch):
+    cache.set("key", "value")
+    written = _stored(cache, "key", "last_access")
+    assert cache.get("key") == "value"
+    assert _stored(cache, "key", "last_access") == written
+    monkeypatch.setattr(llm_cache, "ACCESS_REFRESH_SECONDS", 0)
+    assert cache.get("key") == "value"
+    assert _stored(cache, "key", "last_access") > written
+
+
+def test_client_answers_repeats_from_the_cache(fake_openai, cache, monkeypatch):
+    monkeypatch.setattr(llm_client, "cache", cache)
+    text = llm_client.complete(MESSAGES, call_site="select_experts")
+    assert llm_client.complete(MESSAGES, call_site="select_experts") == text
+    assert list(llm_client.stream(MESSAGES, call_site="select_experts")) == [text]
+    assert len(fake_openai.requests) == 1
+    llm_client.complete(MESSAGES, call_site="select_experts", use_cache=False)
+    assert len(fake_openai.requests) == 2
+
+
+def test_only_a_fully_read_stream_is_cached(fake_openai, cache, monkeypatch):
+    monkeypatch.setattr(llm_client, "cache", cache)
+    chunks = llm_client.stream(MESSAGES, call_site="expert_discussion")
+    next(chunks)
+    chunks.close()
+    full = "".join(llm_client.stream(MESSAGES, call_site="expert_discussion"))
+    assert len(fake_openai.requests) == 2
+    assert llm_client.complete(MESSAGES, call_site="expert_discussion") == full
+    assert len(fake_openai.requests) == 2
@@ -0,0 +1,56 @@
+# tests/test_llm_client.py
+import asyncio
+import threading
+
+from backend import llm_client
+
+MESSAGES = [{"role": "user", "content": "How do I raise prices without losing customers?"}]
+
+
+def test_sync_client_is_built_once(monkeypatch):
+    monkeypatch.setattr(llm_client, "_sync_client", None)
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(llm_client.get_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(client) for client in clients}) == 1
+
+
+def test_each_event_loop_gets_its_own_async_client():
+    async def clients():
+        return llm_client.get_async_client(), llm_client.get_async_client()
+
+    first, again = asyncio.run(clients())
+    assert first is again
+    assert asyncio.run(clients())[0] is not first
+
+
+def test_concurrent_requests_are_capped(fake_openai, monkeypatch):
+    monkeypatch.setattr(llm_client, "_sync_slots", threading.BoundedSemaphore(2))
+    fake_openai.delay = 0.05
+    # Distinct requests, so none of them is coalesced into another
+    threads = [threading.Thread(target=llm_client.complete, args=([{"role": "user", "content": f"Question {n}"}],))
+               for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fake_openai.requests) == 6
+    assert fake_openai.peak_in_flight == 2
+
+
+def test_stream_and_complete_return_the_same_text(fake_openai):
+    chunks = list(llm_client.stream(MESSAGES))
+    assert len(chunks) > 1
+    assert "".join(chunks) == llm_client.complete(MESSAGES)
+
+
+def test_async_calls_match_the_sync_ones(fake_openai):
+    async def run():
+        streamed = [chunk async for chunk in llm_client.astream(MESSAGES)]
+        return await llm_client.acomplete(MESSAGES), streamed
+
+    text, chunks = asyncio.run(run())
+    assert text == "".join(chunks) == llm_client.complete(MESSAGES)
@@ -0,0 +1,56 @@
+# tests/test_meeting_memory.py
+from backend import meeting_memory
+from backend.fake_llm import _DISCUSSION_REPLY
+from backend.meeting_memory import MeetingMemory
+from backend.prompts import count_tokens
+
+CONTEXT = {"problem": "Sales have been declining despite increased marketing efforts."}
+PANEL = ["Business Strategy Expert", "Financial Expert", "Marketing Specialist"]
+
+DISCUSSION = """Financial Expert: Cash is tight, and the main risk is running out of runway before sales recover.
+
+Meeting Resolutions:
+"Here are our recommendations for approaches to help you achieve your goal:
+   1. **Focus on your most profitable customer segment**
+   2. Partner with a complementary local business
+   3. Pilot a low-cost digital channel
+   4. Open a second store
+
+Preferred option: Focus on your most profitable customer segment, because it needs the least capital.
+A partnership could fail if the partner's customers do not overlap with yours.
+"""
+
+
+def test_digest_holds_the_options_preferred_choice_and_risks():
+    memory = MeetingMemory.from_discussion(CONTEXT, PANEL, DISCUSSION)
+    assert memory.options == ["Focus on your most profitable customer segment",
+                              "Partner with a complementary local business",
+                              "Pilot a low-cost digital channel"]
+    assert memory.preferred.startswith("Focus on your most profitable customer segment, because")
+    assert memory.risks[0].startswith("Financial Expert: Cash is tight, and the main risk")
+    assert any("could fail" in risk for risk in memory.risks)
+    assert memory.excerpt is None
+    assert memory.digest.startswith("Options discussed:\n1. Focus on your most profitable customer segment")
+    assert "Preferred: Focus" in memory.digest and "Key risks:\n- " in memory.digest
+
+
+def test_digest_fits_its_token_budget():
+    long_option = "Invest in a long and detailed programme " * 20
+    discussion = "Meeting Resolutions:\n" + "\n".join(f"{n}. {long_option}" for n in range(1, 4))
+    discussion += "\nRecommendation: " + long_option + "\n" + ("The risk is that it fails badly. " * 10)
+    memory = MeetingMemory.from_discussion(CONTEXT, PANEL, discussion)
+    assert all(count_tokens(option) <= meeting_memory.LINE_TOKEN_LIMIT for option in memory.options)
+    assert count_tokens(memory.digest) <= meeting_memory.DIGEST_TOKEN_BUDGET
+    # The same risk sentence is only kept once
+    assert len(memory.risks) == 1
+
+
+def test_unstructured_discussion_falls_back_to_an_excerpt():
+    memory = MeetingMemory.from_discussion(CONTEXT, PANEL, "We talked   about\nmany things.")
+    assert memory.options == [] and memory.preferred is None
+    assert memory.digest == "Discussion excerpt: We talked about many things."
+
+
+def test_fake_server_discussion_has_a_digest():
+    memory = MeetingMemory.from_discussion(CONTEXT, PANEL, _DISCUSSION_REPLY)
+    assert len(memory.options) == 3 and memory.preferred
@@ -0,0 +1,97 @@
+# tests/test_meeting_report.py
+import json
+
+import pytest
+
+from backend import ai_processing
+from backend.meeting_memory import MeetingMemory
+from backend.meeting_report import ExpertTurn, MeetingReport, ReportStreamParser, StrategicOption
+
+CONTEXT = {"problem": "Sales have been declining despite increased marketing efforts."}
+PANEL = ["Financial Expert", "Marketing Specialist"]
+
+DOCUMENT = {
+    "turns": [
+        {"expert": "Financial Expert", "text": "Protect cash first; a {braced} aside and a \"quote\"."},
+        {"expert": "Marketing Specialist", "text": "Double down on loyal customers, even at 20% off."},
+    ],
+    "decision_type": "strategic",
+    "options": [
+        {"title": "Focus on loyal customers", "description": "Loyalty offers", "upside": "Cheap",
+         "downside": "Slow", "fails_if": "They are price sensitive", "impact": "high", "risk": "low"},
+        {"title": "Open online", "description": "A web shop", "upside": "Reach", "downside": "Costly",
+         "fails_if": "Delivery is too slow", "impact": "HIGH", "risk": "extreme"},
+    ],
+    "preferred_option": "Focus on loyal customers",
+    "recommendation": "Start this month.",
+}
+TEXT = json.dumps(DOCUMENT, indent=1)
+
+
+def _stream(text, size):
+    parser = ReportStreamParser()
+    items = []
+    for start in range(0, len(text), size):
+        items.append(parser.feed(text[start:start + size]))
+    return items, parser.finish()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(TEXT)])
+def test_items_come_out_whatever_the_chunk_boundaries(size):
+    batches, report = _stream(TEXT, size)
+    items = [item for batch in batches for item in batch]
+    assert items == report.turns + report.options
+    assert [type(item) for item in items] == [ExpertTurn, ExpertTurn, StrategicOption, StrategicOption]
+    assert report == MeetingReport.from_dict(DOCUMENT)
+
+
+def test_each_item_is_handed_back_as_soon_as_it_closes():
+    # The brace inside the first turn's text does not close it
+    first_turn_end = TEXT.index("}", TEXT.index("quote")) + 1
+    parser = ReportStreamParser()
+    assert parser.feed(TEXT[:first_turn_end - 1]) == []
+    assert parser.feed(TEXT[first_turn_end - 1:first_turn_end]) == [ExpertTurn.from_dict(DOCUMENT["turns"][0])]
+
+
+def test_strings_that_look_like_keys_do_not_confuse_the_parser():
+    document = {"recommendation": "\"turns\": [{\"expert\": \"x\"}]", "turns": [], "options": []}
+    batches, report = _stream(json.dumps(document), 5)
+    assert [item for batch in batches for item in batch] == []
+    assert report.recommendation == document["recommendation"]
+
+
+def test_report_round_trips_through_json_and_normalizes_levels():
+    report = MeetingReport.from_json("```json\n" + TEXT + "\n```")
+    assert MeetingReport.from_json(report.to_json()) == report
+    assert (report.options[1].impact, report.options[1].risk) == ("high", "high")
+    assert report.quadrant()[("high", "low")] == ["Focus on loyal customers"]
+
+
+def test_text_rendering_keeps_the_plain_meeting_shape():
+    text = MeetingReport.from_dict(DOCUMENT).to_text()
+    assert text.startswith("Financial Expert: Protect cash first")
+    assert "Meeting Resolutions:\n" in text and "   1. Focus on loyal customers\n" in text
+    assert "\nPreferred option: Focus on loyal customers\n" in text
+    assert MeetingReport(error="Error generating expert discussion: boom").to_text().startswith("Error")
+
+
+def test_memory_is_taken_from_the_report_fields():
+    memory = MeetingMemory.from_report(CONTEXT, PANEL, MeetingReport.from_dict(DOCUMENT))
+    assert memory.options == ["Focus on loyal customers", "Open online"]
+    assert memory.preferred == "Focus on loyal customers. Start this month."
+    assert memory.risks[0] == "Focus on loyal customers. Fails if: They are price sensitive"
+
+
+def test_streamed_report_matches_the_blocking_one(fake_openai):
+    fake_openai.reply = lambda messages: TEXT
+    items = list(ai_processing.stream_meeting_report(CONTEXT, PANEL))
+    report = items[-1]
+    assert items[:-1] == report.turns + report.options
+    assert report == ai_processing.generate_expert_discussion(CONTEXT, PANEL, structured=True)
+    assert fake_openai.requests[0]["response_format"]["type"] == "json_schema"
+
+
+def test_failed_report_carries_only_the_error(fake_openai):
+    fake_openai.reply = lambda messages: "Sorry, I cannot help with that."
+    report, = list(ai_processing.stream_meeting_report(CONTEXT, PANEL))
+    assert report.error.startswith("Error generating expert discussion") and report.options == []
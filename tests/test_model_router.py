@@ -0,0 +1,97 @@
+# tests/test_model_router.py
+import pytest
+
+from backend import llm_client, model_router, resilience
+from backend.model_router import ModelRouter
+
+TIERS = "fast=gpt-4o-mini/20/5,premium=gpt-4/120/10"
+ROUTES = "select_experts=fast,expert_turn=premium,expert_discussion=premium"
+MESSAGES = [{"role": "user", "content": "How do I raise prices without losing customers?"}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_router.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _router(**options):
+    options = dict(dict(tiers=TIERS, routes=ROUTES, fallbacks="premium=fast", default_tier="premium",
+                        min_calls=5, downgrade_seconds=60, slos="expert_discussion=180"), **options)
+    return ModelRouter(**options)
+
+
+def test_call_sites_are_routed_to_their_tiers():
+    router = _router()
+    fast, premium, other = router.route("select_experts"), router.route("expert_turn"), router.route(None)
+    assert (fast.tier, fast.model, fast.timeout) == ("fast", "gpt-4o-mini", 20.0)
+    assert (premium.model, premium.downgraded_from) == ("gpt-4", None)
+    assert other.tier == "premium"
+
+
+@pytest.mark.parametrize("options, error", [
+    ({"tiers": "fast=gpt-4o-mini/slow"}, "Bad LLM_TIERS entry"),
+    ({"routes": "select_experts=cheap"}, "LLM_ROUTES names tier 'cheap'"),
+    ({"fallbacks": "premium=standard"}, "LLM_TIER_FALLBACKS names tier 'standard'"),
+    ({"slos": "expert_discussion=soon"}, "Bad LLM_SLOS"),
+])
+def test_bad_settings_are_rejected(options, error):
+    with pytest.raises(ValueError, match=error):
+        _router(**options)
+
+
+def test_a_slow_tier_is_downgraded_until_it_recovers(clock):
+    router = _router()
+    for _ in range(5):
+        router.observe(router.route("expert_turn"), 30.0)
+    route = router.route("expert_turn")
+    assert (route.tier, route.model, route.downgraded_from) == ("fast", "gpt-4o-mini", "premium")
+    assert router.stats()["degraded_tiers"] == ["premium"] and router.stats()["downgrades"] == 1
+
+    clock[0] += 60
+    # Back on the tier, which has to breach its target again on fresh calls
+    assert router.route("expert_turn").tier == "premium"
+    router.observe(router.route("expert_turn"), 30.0)
+    assert router.route("expert_turn").tier == "premium"
+
+
+def test_latency_is_judged_per_call_site(clock):
+    router = _router()
+    # Whole streamed reports take far longer than the tier's 10 s target, but meet their own
+    for _ in range(20):
+        router.observe(router.route("expert_discussion"), 90.0)
+        router.observe(router.route("expert_turn"), 2.0)
+    assert router.route("expert_turn").tier == "premium"
+    assert router.stats()["downgrades"] == 0
+
+    for _ in range(20):
+        router.observe(router.route("expert_discussion"), 200.0)
+    assert router.route("expert_turn").downgraded_from == "premium"
+
+
+def test_an_open_circuit_downgrades_the_tier(monkeypatch):
+    router = _router()
+    breaker = resilience.CircuitBreaker("gpt-4", failures=1)
+    monkeypatch.setattr(model_router.resilience, "breaker",
+                        lambda model: breaker if model == "gpt-4" else resilience.CircuitBreaker(model))
+    breaker.on_failure()
+    assert router.route("expert_turn").model == "gpt-4o-mini"
+
+
+def test_route_stats_report_calls_models_and_tokens():
+    router = _router()
+    router.observe(router.route("select_experts"), 0.5, 100, 20)
+    router.observe(router.route("select_experts"), 1.5, failed=True)
+    stats = router.stats()["routes"]["select_experts"]
+    assert (stats["calls"], stats["failures"], stats["models"]) == (2, 1, {"gpt-4o-mini": 2})
+    assert (stats["prompt_tokens"], stats["completion_tokens"], stats["p95_seconds"]) == (100, 20, 1.5)
+
+
+def test_client_calls_use_their_call_sites_model(fake_openai, monkeypatch):
+    monkeypatch.setattr(model_router, "router", _router())
+    llm_client.complete(MESSAGES, call_site="select_experts")
+    llm_client.complete(MESSAGES, model="gpt-4o", call_site="select_experts")
+    assert [request["model"] for request in fake_openai.requests] == ["gpt-4o-mini", "gpt-4o"]
+    # A pinned model is measured but never downgraded
+    assert model_router.router.stats()["routes"]["select_experts"]["models"] == {"gpt-4o-mini": 1, "gpt-4o": 1}
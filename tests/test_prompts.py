@@ -0,0 +1,62 @@
+# tests/test_prompts.py
+from backend import prompts
+from backend.prompts import ELLIPSIS, PromptTemplate, compact_context, count_tokens, truncate
+
+TEMPLATE = PromptTemplate("test", system="You are a panel of experts.",
+                          user="The user's context is:\n{context}\n\nQuestion: {question}", budget=200)
+
+
+def test_truncate_keeps_the_beginning_and_cuts_at_a_sentence():
+    text = "Sales fell last year. " * 5 + "Marketing spend doubled without any effect on revenue at all."
+    cut = truncate(text, 30)
+    assert count_tokens(cut) <= 30 and cut.endswith("." + ELLIPSIS)
+    assert text.startswith(cut[:-len(ELLIPSIS)])
+    assert truncate("Short enough.", 30) == "Short enough."
+
+
+def test_truncate_falls_back_to_a_word_boundary():
+    assert truncate("one two three four five six seven eight nine ten", 6) == "one two three four" + ELLIPSIS
+
+
+def test_compact_context_is_one_line_per_nonempty_field():
+    context = {"problem": "Sales  are\n down.", "persona": "", "objective": "Grow"}
+    assert compact_context(context) == "problem: Sales are down.\nobjective: Grow"
+
+
+def test_compact_context_caps_each_field():
+    context = {"problem": "word " * 500, "objective": "Grow"}
+    lines = compact_context(context, field_limit=40).splitlines()
+    assert count_tokens(lines[0]) <= 40 and lines[1] == "objective: Grow"
+
+
+def test_budget_trims_the_longest_fields_first():
+    context = {"problem": "Our sales are down. " * 30, "persona": "Owner of a shop", "objective": "Grow sales"}
+    block = compact_context(context, max_tokens=80, field_limit=None)
+    assert count_tokens(block) <= 80
+    lines = block.splitlines()
+    # Short fields keep their full text
+    assert lines[1:] == ["persona: Owner of a shop", "objective: Grow sales"]
+    assert lines[0].startswith("problem: Our sales are down.") and lines[0].endswith(ELLIPSIS)
+
+
+def test_no_field_is_trimmed_below_the_minimum():
+    context = {field: "a longer answer with several words in it " * 5 for field in ("a", "b", "c")}
+    block = compact_context(context, max_tokens=10, field_limit=None)
+    # The budget alone would leave about 3 tokens per field
+    assert all(10 < count_tokens(line) <= prompts.MIN_FIELD_TOKENS for line in block.splitlines())
+
+
+def test_template_keeps_a_static_system_prefix():
+    first = TEMPLATE.render({"problem": "Sales are down."}, question="Cut prices?")
+    second = TEMPLATE.render({"problem": "Cofounder quit."}, question="Hire?")
+    assert first[0] is second[0] and first[0] == {"role": "system", "content": "You are a panel of experts."}
+    assert first[1]["content"] == "The user's context is:\nproblem: Sales are down.\n\nQuestion: Cut prices?"
+
+
+def test_template_fits_the_context_into_its_budget():
+    question = "Should I take a loan to cover the gap?"
+    messages = TEMPLATE.render({"problem": "Sales are down. " * 200, "objective": "Grow"}, question=question)
+    assert count_tokens(messages[0]["content"]) + count_tokens(messages[1]["content"]) <= 200
+    # The other parts are never trimmed
+    assert messages[1]["content"].endswith(f"Question: {question}")
+    assert "objective: Grow" in messages[1]["content"]
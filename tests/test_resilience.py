@@ -0,0 +1,175 @@
+# tests/test_resilience.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend import llm_client, resilience
+from backend.fake_llm import FakeLLMConfig, start_server
+from backend.resilience import CircuitBreaker, CircuitOpenError, RateLimiter, RateLimitTimeout, UpstreamUnavailable
+from config import settings
+
+
+class ServerError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+@pytest.fixture
+def fast(monkeypatch):
+    """No backoff, three retries and a fresh breaker per model."""
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(resilience, "MAX_RETRIES", 3)
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "limiter", RateLimiter(rpm=0, tpm=0, overrides=""))
+
+
+def _flaky(failures, error=lambda: ServerError(503)):
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error()
+        return "ok"
+
+    return attempt, calls
+
+
+def test_failures_are_classified():
+    assert resilience.is_transient(ServerError(429)) and resilience.is_transient(ServerError(502))
+    assert not resilience.is_transient(ServerError(400))
+    timeout = type("APITimeoutError", (Exception,), {})
+    assert resilience.is_transient(type("ReadTimeout", (timeout,), {})())
+    assert not resilience.is_transient(ValueError("bad request"))
+
+
+def test_transient_failures_are_retried(fast):
+    attempt, calls = _flaky(2)
+    before = resilience.stats()["retries"]
+    assert resilience.call("gpt-4", 10, attempt) == "ok"
+    assert len(calls) == 3 and resilience.stats()["retries"] - before == 2
+
+
+def test_exhausted_retries_raise_upstream_unavailable(fast):
+    attempt, calls = _flaky(10)
+    with pytest.raises(UpstreamUnavailable, match="did not answer after 4 attempts") as raised:
+        resilience.call("gpt-4", 10, attempt)
+    assert len(calls) == 4 and isinstance(raised.value.__cause__, ServerError)
+
+
+def test_other_errors_are_raised_at_once(fast):
+    attempt, calls = _flaky(10, lambda: ServerError(400))
+    with pytest.raises(ServerError):
+        resilience.call("gpt-4", 10, attempt)
+    assert len(calls) == 1 and resilience.breaker("gpt-4").state == "closed"
+
+
+def test_retry_after_is_honoured(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY", 0)
+    assert resilience._retry_delay(ServerError(429, retry_after="2"), 0) == 2.0
+    assert resilience._retry_delay(ServerError(429, retry_after="600"), 0) == resilience.RETRY_MAX_DELAY
+    assert resilience._retry_delay(ServerError(429, retry_after="soon"), 0) == 0
+
+
+def test_breaker_opens_fails_fast_and_probes(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    circuit = CircuitBreaker("gpt-4", failures=2, reset_seconds=30)
+    circuit.on_failure()
+    circuit.before_call()
+    circuit.on_failure()
+    assert circuit.state == "open"
+    with pytest.raises(CircuitOpenError):
+        circuit.before_call()
+
+    now[0] += 30
+    circuit.before_call()
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        circuit.before_call()
+    circuit.on_failure()
+    assert circuit.state == "open"
+
+    now[0] += 30
+    circuit.before_call()
+    circuit.on_success()
+    assert circuit.state == "closed"
+    circuit.before_call()
+
+
+def test_cancelled_probe_lets_another_call_probe(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    circuit = CircuitBreaker("gpt-4", failures=1, reset_seconds=1)
+    circuit.on_failure()
+    now[0] += 1
+    circuit.before_call()
+    circuit.cancel()
+    circuit.before_call()
+
+
+def test_limiter_queues_and_rejects_bursts(monkeypatch):
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: 100.0)
+    limiter = RateLimiter(rpm=60, tpm=0, overrides="", max_wait=2)
+    assert [limiter.reserve("gpt-4", 10) for _ in range(60)] == [0.0] * 60
+    # One request a second refills the bucket
+    assert limiter.reserve("gpt-4", 10) == pytest.approx(1.0)
+    assert limiter.reserve("gpt-4", 10) == pytest.approx(2.0)
+    with pytest.raises(RateLimitTimeout):
+        limiter.reserve("gpt-4", 10)
+    # A rejected call reserves nothing, and other models have their own buckets
+    assert limiter._buckets["gpt-4"][0].level == pytest.approx(-2.0)
+    assert limiter.reserve("gpt-4o-mini", 10) == 0.0
+
+
+def test_token_budget_and_overrides(monkeypatch):
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: 100.0)
+    limiter = RateLimiter(rpm=0, tpm=0, overrides="gpt-4=0/6000", max_wait=60)
+    assert limiter.reserve("gpt-4", 6000) == 0.0
+    assert limiter.reserve("gpt-4", 1000) == pytest.approx(10.0)
+    assert limiter.reserve("gpt-4o-mini", 10 ** 6) == 0.0
+    with pytest.raises(ValueError, match="Bad LLM_RATE_LIMITS entry"):
+        RateLimiter(overrides="gpt-4=fast")
+
+
+def test_rate_limits_are_split_across_processes(monkeypatch):
+    limiter = resilience.RateLimiter(rpm=60, tpm=0, overrides="", shares=3)
+    assert [limiter.reserve("gpt-4", 10) for _ in range(20)] == [0.0] * 20
+    assert limiter.reserve("gpt-4", 10) > 0
+    monkeypatch.setattr(resilience.settings, "LLM_RATE_LIMIT_SHARES", 0)
+    monkeypatch.setattr(resilience.settings, "MEETING_JOBS", True)
+    monkeypatch.setattr(resilience.settings, "JOB_WORKER_PROCESSES", 2)
+    assert resilience.process_shares() == 3
+    monkeypatch.setattr(resilience.settings, "MEETING_JOBS", False)
+    assert resilience.process_shares() == 1
+
+
+def test_async_calls_retry_without_blocking(fast):
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ServerError(500)
+        return "ok"
+
+    assert asyncio.run(resilience.acall("gpt-4", 10, attempt)) == "ok" and len(calls) == 3
+
+
+def test_client_retries_server_errors_then_gives_up(fast, monkeypatch):
+    config = FakeLLMConfig(failure_rate=1.0, failure_status=503)
+    server, base_url = start_server(config=config)
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", base_url)
+    monkeypatch.setattr(llm_client, "_sync_client", None)
+    try:
+        with pytest.raises(UpstreamUnavailable):
+            llm_client.complete([{"role": "user", "content": "hi"}], use_cache=False)
+        # The SDK's own retries are off, so every attempt is one of ours
+        assert config.requests == 4
+        config.failure_rate = 0.0
+        assert llm_client.complete([{"role": "user", "content": "hi"}], use_cache=False)
+    finally:
+        server.shutdown()
@@ -0,0 +1,34 @@
+# tests/test_secretary.py
+import json
+
+from backend.secretary import Secretary
+
+ONE_SHOT_MESSAGE = ("I'm the owner of a small retail shop in Lagos, Nigeria. Sales have been declining since a "
+                    "competitor opened last year. I want to increase sales and customer engagement, but my "
+                    "budget is limited.")
+
+
+def test_secretary_skips_answered_questions_and_says_so():
+    secretary = Secretary(use_model=False)
+    response = secretary.analyze_input(ONE_SHOT_MESSAGE)
+    assert response["status"] == "complete"
+    assert secretary.turns_saved == 5
+    assert "location: Lagos, Nigeria" in response["noted"]
+
+
+def test_secretary_still_asks_what_it_could_not_tell():
+    secretary = Secretary(use_model=False)
+    response = secretary.analyze_input("Most of our leads come from Instagram and they stopped converting")
+    assert response["extracted"] == [] and response["noted"] == ""
+    for field in ("persona", "objective", "scenario"):
+        assert response["missing_field"] == field
+        response = secretary.analyze_input("Something else", field_being_answered=field)
+    assert response["missing_field"] == "geography"
+
+
+def test_secretary_asks_the_model_for_what_the_heuristics_missed(fake_openai):
+    fake_openai.reply = lambda messages: json.dumps({"persona": "Shop owner"})
+    secretary = Secretary(use_model=True)
+    response = secretary.analyze_input("Most of our leads come from Instagram and they stopped converting this year")
+    assert response["extracted"] == ["persona"] and secretary.context["persona"] == "Shop owner"
+    assert response["missing_field"] == "objective"
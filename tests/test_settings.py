@@ -0,0 +1,50 @@
+# tests/test_settings.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+from backend import llm_client
+from config import settings
+
+from conftest import REPO_ROOT
+
+
+def test_env_helpers_parse_the_environment(monkeypatch):
+    monkeypatch.setenv("SETTINGS_TEST_FLAG", " Yes ")
+    monkeypatch.setenv("SETTINGS_TEST_INT", "12")
+    monkeypatch.setenv("SETTINGS_TEST_FLOAT", "0.25")
+    assert settings._env_bool("SETTINGS_TEST_FLAG") is True
+    assert settings._env_bool("SETTINGS_TEST_MISSING", default=True) is True
+    assert settings._env_int("SETTINGS_TEST_INT", 3) == 12
+    assert settings._env_int("SETTINGS_TEST_MISSING", 3) == 3
+    assert settings._env_float("SETTINGS_TEST_FLOAT", 1.0) == 0.25
+    monkeypatch.setenv("SETTINGS_TEST_FLAG", "off")
+    assert settings._env_bool("SETTINGS_TEST_FLAG", default=True) is False
+
+
+def test_file_logger_writes_under_log_dir_with_one_handler(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOG_DIR", str(tmp_path / "logs"))
+    logger = settings.get_file_logger("settings_test", "settings_test.log")
+    assert settings.get_file_logger("settings_test", "settings_test.log") is logger
+    assert len(logger.handlers) == 1
+    logger.info("hello")
+    logger.handlers[0].flush()
+    assert "hello" in (tmp_path / "logs" / "settings_test.log").read_text()
+
+
+def test_missing_api_key_is_reported_on_first_use(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+    monkeypatch.setattr(llm_client, "_sync_client", None)
+    with pytest.raises(ValueError, match="OPENAI_API_KEY is not set"):
+        llm_client.get_client()
+
+
+def test_importing_the_app_has_no_side_effects(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = REPO_ROOT
+    result = subprocess.run([sys.executable, "-c", "import backend.expert_manager, backend.ai_processing, main"],
+                            cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,114 @@
+# tests/test_similarity_index.py
+import json
+import sqlite3
+
+import pytest
+
+from backend import database, similarity_index
+from backend.similarity_index import SimilarContextIndex, signature
+
+CONTEXT = {
+    "problem": "Sales have been declining despite increased marketing efforts.",
+    "persona": "Owner of a small retail business",
+    "objective": "Increase sales and customer engagement",
+    "scenario": "The business is located in a competitive urban area",
+    "geography": "Lagos, Nigeria",
+    "constraints": "Limited budget and staffing",
+}
+PANEL = ["Business Strategy Expert", "Financial Expert", "Marketing Specialist"]
+
+
+def _index_with(context, panel=PANEL):
+    index = SimilarContextIndex()
+    index.add(*signature(context), panel)
+    return index
+
+
+def test_similar_context_reuses_the_panel():
+    index = _index_with(CONTEXT)
+    reworded = dict(CONTEXT, problem="Sales are declining despite increased marketing efforts.")
+    panel, slots, distance = index.nearest(*signature(reworded))
+    assert panel == PANEL and slots >= index.min_slots
+    # The JSON form stored in expert_selections gives the same signature
+    assert signature(json.dumps(CONTEXT)) == signature(CONTEXT)
+
+
+def test_different_problem_or_objective_is_not_similar():
+    index = _index_with(CONTEXT)
+    assert index.nearest(*signature(dict(CONTEXT, problem="My cofounder quit."))) is None
+    assert index.nearest(*signature(dict(CONTEXT, objective="Sell the company to a competitor"))) is None
+
+
+def test_different_other_fields_are_not_similar():
+    index = _index_with(CONTEXT)
+    other = dict(CONTEXT, persona="Chief engineer of a software startup", geography="Berlin, Germany",
+                 scenario="We just closed a funding round", constraints="Strict data protection rules")
+    assert index.nearest(*signature(other)) is None
+
+
+def test_context_without_a_problem_is_never_matched():
+    index = _index_with({"objective": "Grow"})
+    assert len(index) == 0
+    assert index.nearest(*signature({"objective": "Grow"})) is None
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "app.sqlite")
+    monkeypatch.setattr(database, "DB_NAME", path)
+    database.initialize_db()
+    return path
+
+
+def _save_selection(db, context, panel=PANEL):
+    with sqlite3.connect(db) as conn:
+        conn.execute("INSERT INTO expert_selections (session_id, user_input, selected_experts) VALUES (?, ?, ?)",
+                     ("s1", json.dumps(context), ", ".join(panel)))
+
+
+def test_sync_persists_signatures_and_reloads_them(db, monkeypatch):
+    _save_selection(db, CONTEXT)
+    index = SimilarContextIndex()
+    assert index.sync_from_db(db, force=True) == 1
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM context_signatures").fetchone() == (1,)
+    # Nothing new to add until another selection is saved
+    assert index.sync_from_db(db, force=True) == 0
+
+    # A fresh index loads the stored signature instead of hashing the context again
+    monkeypatch.setattr(similarity_index, "signature", lambda context: pytest.fail("rehashed a stored context"))
+    reloaded = SimilarContextIndex()
+    assert reloaded.sync_from_db(db, force=True) == 1
+    assert reloaded.nearest(*signature(CONTEXT))[0] == PANEL
+
+
+def test_sync_is_throttled(db):
+    index = SimilarContextIndex()
+    index.sync_from_db(db, force=True)
+    _save_selection(db, CONTEXT)
+    assert index.sync_from_db(db) == 0
+    assert index.sync_from_db(db, force=True) == 1
+
+
+def test_find_similar_panel_reads_past_selections(db, monkeypatch):
+    monkeypatch.setattr(similarity_index, "_index", None)
+    _save_selection(db, CONTEXT)
+    assert similarity_index.find_similar_panel(json.dumps(CONTEXT), db) == PANEL
+    monkeypatch.setattr(similarity_index, "_index", None)
+    assert similarity_index.find_similar_panel(dict(CONTEXT, problem="My cofounder quit."), db) is None
+
+
+def test_old_fingerprints_table_is_dropped_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE context_fingerprints (selection_id INTEGER PRIMARY KEY, fingerprint INTEGER)")
+        conn.execute(f"PRAGMA user_version = {database.MIGRATIONS.index(database._drop_context_fingerprints)}")
+    conn.close()
+    monkeypatch.setattr(database, "DB_NAME", path)
+    database.initialize_db()
+    with sqlite3.connect(path) as conn:
+        tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "context_fingerprints" not in tables and "context_signatures" in tables
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(database.MIGRATIONS)
+    conn.close()
+    database.get_pool(path).close()
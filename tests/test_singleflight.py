@@ -0,0 +1,172 @@
+# tests/test_singleflight.py
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from backend import llm_client, singleflight
+from backend.singleflight import FlightGroup
+from conftest import REPO_ROOT
+
+MESSAGES = [{"role": "user", "content": "How do I raise prices without losing customers?"}]
+# Two keys on the same lock slot (0x1000 and 0x2000 are both 0 modulo 4096) with different tags
+KEY = "00001000aaaaaaaa" + "0" * 48
+COLLIDING_KEY = "00002000bbbbbbbb" + "0" * 48
+
+
+def _source(chunks, closed=None, delay=0.0):
+    def produce():
+        try:
+            for chunk in chunks:
+                time.sleep(delay)
+                yield chunk
+        finally:
+            if closed is not None:
+                closed.append(True)
+
+    return produce
+
+
+def test_identical_streams_share_one_call(fake_openai):
+    fake_openai.delay = 0.1
+    results = []
+
+    def read():
+        results.append("".join(llm_client.stream(MESSAGES)))
+
+    threads = [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fake_openai.requests) == 1
+    assert len(set(results)) == 1 and results[0]
+
+
+def test_a_subscriber_that_stops_early_does_not_disturb_the_others():
+    group = FlightGroup()
+    closed = []
+    factory = _source(["a", "b", "c"], closed)
+    first = group.subscribe("k", factory)
+    second = group.subscribe("k", factory)
+    assert next(first) == "a"
+    assert next(second) == "a"
+    first.close()
+    assert list(second) == ["b", "c"]
+    assert closed == [True] and group.stats()["coalesced"] == 1
+
+
+def test_the_last_subscriber_to_leave_closes_the_upstream_call():
+    group = FlightGroup()
+    closed = []
+    subscriber = group.subscribe("k", _source(["a", "b"], closed))
+    assert next(subscriber) == "a"
+    subscriber.close()
+    assert closed == [True]
+    # A new subscriber starts a fresh flight
+    assert list(group.subscribe("k", _source(["x"]))) == ["x"]
+
+
+def test_identical_async_streams_share_one_call(fake_openai):
+    fake_openai.delay = 0.05
+
+    async def read():
+        return [chunk async for chunk in llm_client.astream(MESSAGES)]
+
+    async def run():
+        return await asyncio.gather(read(), read(), read())
+
+    results = asyncio.run(run())
+    assert len(fake_openai.requests) == 1
+    assert results[0] == results[1] == results[2] and len(results[0]) > 1
+
+
+def test_identical_async_completions_share_one_call(fake_openai):
+    fake_openai.delay = 0.05
+
+    async def run():
+        return await asyncio.gather(*(llm_client.acomplete(MESSAGES) for _ in range(3)))
+
+    assert len(set(asyncio.run(run()))) == 1 and len(fake_openai.requests) == 1
+
+
+def test_a_cancelled_async_subscriber_leaves_the_flight_running():
+    group = FlightGroup()
+
+    async def produce():
+        for chunk in ["a", "b", "c"]:
+            await asyncio.sleep(0.02)
+            yield chunk
+
+    async def read(stop_after=None):
+        chunks = []
+        async for chunk in group.subscribe_async("k", produce):
+            chunks.append(chunk)
+            if len(chunks) == stop_after:
+                await asyncio.sleep(10)
+        return chunks
+
+    async def run():
+        stuck = asyncio.ensure_future(read(stop_after=1))
+        reader = asyncio.ensure_future(read())
+        await asyncio.sleep(0.03)
+        stuck.cancel()
+        return await reader
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+    assert group.stats()["flights"] == 1 and not group._async_flights
+
+
+def _hold_slot(key, lock_file, seconds):
+    code = ("import sys, time\n"
+            "from backend import singleflight\n"
+            f"with singleflight.cross_process({key!r}):\n"
+            "    print('held', flush=True)\n"
+            f"    time.sleep({seconds})\n")
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, LLM_COALESCE_LOCK_FILE=lock_file)
+    holder = subprocess.Popen([sys.executable, "-c", code], env=env, stdout=subprocess.PIPE, text=True)
+    assert holder.stdout.readline().strip() == "held"
+    return holder
+
+
+@pytest.fixture
+def lock_file(monkeypatch, tmp_path):
+    if singleflight.fcntl is None:
+        pytest.skip("cross-process coalescing needs POSIX locks")
+    path = str(tmp_path / "coalesce.lock")
+    monkeypatch.setattr(singleflight, "LOCK_FILE", path)
+    monkeypatch.setattr(singleflight, "_lock_fd", None)
+    monkeypatch.setattr(singleflight, "_held_slots", {})
+    return path
+
+
+def test_another_process_running_the_same_call_is_waited_for(lock_file):
+    holder = _hold_slot(KEY, lock_file, 0.3)
+    try:
+        started = time.monotonic()
+        with singleflight.cross_process(KEY) as waited:
+            assert waited and time.monotonic() - started >= 0.2
+    finally:
+        holder.wait()
+
+
+def test_an_unrelated_key_on_the_same_slot_is_not_waited_for(lock_file):
+    holder = _hold_slot(COLLIDING_KEY, lock_file, 5)
+    try:
+        started = time.monotonic()
+        with singleflight.cross_process(KEY) as waited:
+            assert not waited
+        assert time.monotonic() - started < 1
+
+        async def enter():
+            async with singleflight.across_process(KEY) as waited:
+                return waited
+
+        assert asyncio.run(enter()) is False
+    finally:
+        holder.kill()
+        holder.wait()
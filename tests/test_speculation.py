@@ -0,0 +1,88 @@
+# tests/test_speculation.py
+import threading
+
+from backend.speculation import SpeculativeExpertSelector
+
+PANEL = ["Business Strategy Expert", "Financial Expert", "Marketing Specialist"]
+EARLY = {"problem": "Sales have been declining despite increased marketing efforts.",
+         "persona": "Owner of a small retail business"}
+FINAL = dict(EARLY, objective="Increase sales", scenario="A competitor opened next door last year",
+             geography="Lagos, Nigeria", constraints="We must comply with new regulation before we can sell "
+                                                      "anything, and cannot hire or raise capital this year")
+
+
+class _Selections:
+    """A select_experts stand-in that records the contexts it was asked about; it blocks until released."""
+
+    def __init__(self):
+        self.contexts = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, context):
+        self.contexts.append(dict(context))
+        self.release.wait(5)
+        return list(PANEL)
+
+
+def test_speculation_waits_for_problem_and_persona():
+    select = _Selections()
+    speculator = SpeculativeExpertSelector(select=select)
+    speculator.observe({"problem": EARLY["problem"]})
+    assert speculator.started == 0
+    speculator.observe(EARLY)
+    assert speculator.started == 1
+    assert speculator.commit(FINAL) == PANEL
+    assert select.contexts == [EARLY]
+
+
+def test_answers_during_a_running_selection_do_not_start_another():
+    select = _Selections()
+    select.release.clear()
+    speculator = SpeculativeExpertSelector(select=select)
+    speculator.observe(EARLY)
+    for field in ("objective", "scenario", "geography"):
+        speculator.observe({**EARLY, **{key: FINAL[key] for key in FINAL if key <= field}})
+    assert (speculator.started, speculator.restarts) == (1, 0)
+    select.release.set()
+    # Every field added since does not invalidate a panel based on the problem and persona
+    assert speculator.commit(FINAL) == PANEL
+    assert select.contexts == [EARLY]
+
+
+def test_a_finished_selection_is_refined_with_the_answers_since():
+    select = _Selections()
+    speculator = SpeculativeExpertSelector(select=select)
+    speculator.observe(EARLY)
+    speculator.commit(EARLY)
+    speculator.observe(FINAL)
+    assert (speculator.started, speculator.restarts) == (2, 0)
+    assert speculator.commit(FINAL) == PANEL
+    assert select.contexts == [EARLY, FINAL]
+    # Nothing new was answered, so nothing new starts
+    speculator.observe(FINAL)
+    assert speculator.started == 2
+
+
+def test_a_changed_problem_restarts_the_selection():
+    select = _Selections()
+    select.release.clear()
+    speculator = SpeculativeExpertSelector(select=select)
+    speculator.observe(EARLY)
+    changed = dict(EARLY, problem="Our only supplier went bankrupt and we have no stock")
+    speculator.observe(changed)
+    assert (speculator.started, speculator.restarts) == (2, 1)
+    select.release.set()
+    assert speculator.commit(changed) == PANEL
+    assert select.contexts[-1] == changed
+
+
+def test_commit_selects_afresh_when_the_speculation_no_longer_matches():
+    select = _Selections()
+    speculator = SpeculativeExpertSelector(select=select)
+    speculator.observe(EARLY)
+    speculator.commit(EARLY)
+    final = dict(FINAL, persona="Chief financial officer of a hospital group")
+    assert speculator.commit(final) == PANEL
+    assert select.contexts == [EARLY, final]
+    assert speculator.started == 1
@@ -0,0 +1,126 @@
+# tests/test_tracing.py
+import contextvars
+import json
+import threading
+
+import httpx
+import pytest
+
+from backend import ai_processing, database, llm_client, tracing
+from backend.fake_llm import FakeLLMConfig, start_server
+from config import settings
+
+CONTEXT = {"problem": "Sales have been declining despite increased marketing efforts.",
+           "persona": "Owner of a small retail business", "objective": "Increase sales"}
+PANEL = ["Business Strategy Expert", "Financial Expert", "Marketing Specialist"]
+
+
+class Collector:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def named(self, name):
+        return [span for span in self.spans if span.name == name]
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    """Turns tracing on with only a collecting exporter."""
+    monkeypatch.setattr(tracing, "_exporters", [])
+    return tracing.add_exporter(Collector())
+
+
+def test_tracing_is_off_without_exporters(monkeypatch):
+    monkeypatch.setattr(tracing, "_exporters", [])
+    assert not tracing.enabled()
+    with tracing.span("stage") as span:
+        tracing.record(llm_calls=1)
+    assert span is tracing._NOOP_SPAN
+
+
+def test_child_counters_roll_up_into_the_stage(collector):
+    with tracing.meeting("m1"), tracing.span("discussion", engine="single") as stage:
+        with tracing.span("llm.expert_turn"):
+            tracing.record(llm_calls=1, attempts=3)
+            tracing.record_usage("gpt-4", 1000, 500)
+        tracing.record(cache_hits=1)
+    child, parent = collector.spans
+    assert (child.name, parent.name) == ("llm.expert_turn", "discussion")
+    assert child.parent is stage and child.meeting_id == parent.meeting_id == "m1"
+    assert child.retries == 2 and child.cost_usd == pytest.approx(0.03 + 0.03)
+    assert (parent.llm_calls, parent.attempts, parent.cache_hits) == (1, 3, 1)
+    assert parent.prompt_tokens == 1000 and parent.attrs == {"engine": "single"}
+    assert tracing.current_meeting() is None
+
+
+def test_failed_stage_records_the_error(collector):
+    with pytest.raises(RuntimeError):
+        with tracing.span("followup"):
+            raise RuntimeError("boom")
+    span, = collector.spans
+    assert span.error == "RuntimeError: boom" and span.errors == 1 and span.duration is not None
+
+
+def test_work_on_another_thread_counts_in_the_callers_span(collector):
+    with tracing.meeting("m2"), tracing.span("selection"):
+        context = contextvars.copy_context()
+        worker = threading.Thread(target=context.run, args=(tracing.record,), kwargs={"db_calls": 1})
+        worker.start()
+        worker.join()
+    assert collector.named("selection")[0].db_calls == 1
+
+
+def test_jsonl_exporter_appends_one_line_per_span(collector, tmp_path):
+    tracing.add_exporter(tracing.JsonLinesExporter(str(tmp_path / "traces" / "spans.jsonl")))
+    with tracing.meeting("m3"), tracing.span("discussion", engine="single"):
+        with tracing.span("llm.expert_discussion"):
+            tracing.record(llm_calls=1)
+    child, parent = [json.loads(line) for line in (tmp_path / "traces" / "spans.jsonl").read_text().splitlines()]
+    assert child["parent_id"] == parent["span_id"] and child["meeting_id"] == parent["meeting_id"] == "m3"
+    assert parent["name"] == "discussion" and parent["llm_calls"] == 1 and parent["attrs"] == {"engine": "single"}
+
+
+def test_prometheus_exporter_serves_per_stage_metrics(collector):
+    exporter = tracing.add_exporter(tracing.PrometheusExporter())
+    for _ in range(2):
+        with tracing.span("discussion"):
+            tracing.record(llm_calls=1)
+    server = exporter.serve()
+    try:
+        text = httpx.get(f"http://127.0.0.1:{server.server_address[1]}/metrics").text
+    finally:
+        server.shutdown()
+    assert 'meeting_stage_seconds_count{stage="discussion"} 2' in text
+    assert 'meeting_stage_seconds_bucket{stage="discussion",le="+Inf"} 2' in text
+    assert 'meeting_stage_llm_calls_total{stage="discussion"} 2' in text
+
+
+def test_unknown_exporter_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_EXPORTERS", "statsd")
+    with pytest.raises(ValueError, match="Unknown trace exporter"):
+        tracing._configure()
+
+
+def test_meeting_stages_record_tokens_attempts_and_db_time(collector, monkeypatch, tmp_path):
+    server, base_url = start_server(config=FakeLLMConfig())
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", base_url)
+    monkeypatch.setattr(llm_client, "_sync_client", None)
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "app.sqlite"))
+    try:
+        database.initialize_db()
+        with tracing.meeting():
+            with tracing.span("session"):
+                database.get_session("s1")
+            "".join(ai_processing.stream_expert_discussion(CONTEXT, PANEL))
+    finally:
+        server.shutdown()
+    call, = collector.named("llm.expert_discussion")
+    assert call.llm_calls == call.attempts == 1 and call.retries == 0
+    # The fake server sends a final usage chunk when asked for one
+    assert call.prompt_tokens > 0 and call.completion_tokens > 0
+    assert collector.named("discussion")[0].completion_tokens == call.completion_tokens
+    session, = collector.named("session")
+    assert session.db_calls == 1 and session.db_time > 0
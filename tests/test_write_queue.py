@@ -0,0 +1,107 @@
+# tests/test_write_queue.py
+import sqlite3
+import threading
+
+import pytest
+
+from backend import write_queue
+from backend.database import get_pool
+from backend.write_queue import WriteBehindQueue
+
+INSERT = "INSERT INTO events (name) VALUES (?)"
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "events.sqlite")
+    with get_pool(path).connection() as conn:
+        conn.execute("CREATE TABLE events (name TEXT UNIQUE)")
+    return path
+
+
+def _names(db):
+    with get_pool(db).connection() as conn:
+        return [name for name, in conn.execute("SELECT name FROM events ORDER BY rowid")]
+
+
+@pytest.fixture
+def make_queue(db, tmp_path):
+    queues = []
+
+    def make(**kwargs):
+        kwargs.setdefault("spill_path", str(tmp_path / "spill.jsonl"))
+        queue = WriteBehindQueue(db, **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def test_events_are_written_in_batches_in_order(db, make_queue):
+    queue = make_queue(batch_size=10, flush_interval=5)
+    for i in range(25):
+        queue.submit(INSERT, (f"e{i}",))
+    # Two full batches go out at once; the last five wait for the interval or a close
+    queue.close()
+    assert _names(db) == [f"e{i}" for i in range(25)]
+    stats = queue.stats()
+    assert stats["written"] == 25 and stats["batches"] == 3 and stats["sync_fallbacks"] == 0
+
+
+def test_flush_interval_writes_a_partial_batch(db, make_queue):
+    queue = make_queue(batch_size=100, flush_interval=0.05)
+    queue.submit(INSERT, ("only",))
+    queue.flush()
+    assert _names(db) == ["only"]
+
+
+def test_constraint_violation_drops_only_the_bad_row(db, make_queue):
+    queue = make_queue(batch_size=3, flush_interval=5)
+    for name in ("a", "a", "b"):
+        queue.submit(INSERT, (name,))
+    queue.flush()
+    assert _names(db) == ["a", "b"]
+    assert queue.stats()["dropped"] == 1 and queue.stats()["written"] == 2
+
+
+def test_full_queue_makes_the_caller_write_synchronously(db, make_queue):
+    queue = make_queue(max_pending=1, put_timeout=0.01, batch_size=1)
+    release = threading.Event()
+    execute = queue._execute
+
+    def stalled(batch):
+        # Only the background writer is stalled
+        if threading.current_thread().name == "write-behind":
+            release.wait()
+        execute(batch)
+
+    queue._execute = stalled
+    queue.submit(INSERT, ("taken by the writer",))
+    while queue.stats()["pending"]:
+        pass
+    queue.submit(INSERT, ("queued",))
+    queue.submit(INSERT, ("written by the caller",))
+    assert _names(db) == ["written by the caller"]
+    assert queue.stats()["sync_fallbacks"] == 1
+    release.set()
+    queue.flush()
+    assert sorted(_names(db)) == ["queued", "taken by the writer", "written by the caller"]
+
+
+def test_failed_batches_are_spilled_and_replayed_on_the_next_start(db, make_queue, monkeypatch):
+    monkeypatch.setattr(write_queue, "FLUSH_RETRIES", 1)
+    broken = make_queue(batch_size=2, flush_interval=5)
+    broken._execute = lambda batch: (_ for _ in ()).throw(sqlite3.OperationalError("disk I/O error"))
+    broken.submit(INSERT, ("x",))
+    broken.submit(INSERT, ("y",))
+    broken.close()
+    assert broken.stats()["spilled"] == 2 and _names(db) == []
+
+    replaying = make_queue(spill_path=broken.spill_path)
+    replaying.start()
+    assert _names(db) == ["x", "y"]
+    # The spill file is gone once replayed, so a third queue writes nothing twice
+    make_queue(spill_path=broken.spill_path).start()
+    assert _names(db) == ["x", "y"]